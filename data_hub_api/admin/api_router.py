@@ -0,0 +1,109 @@
+import logging
+import secrets
+from typing import Callable, Dict, Mapping, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from data_hub_api.utils.cache_metrics import SingleObjectCacheMetricsRegistry
+from data_hub_api.utils.quarantine import QuarantinedQueryResult
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def create_admin_router(
+    cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+    refresh_fn_by_name: Optional[Mapping[str, Callable[[], int]]] = None,
+    admin_api_token: Optional[str] = None,
+    quarantined_query_results_fn_by_name: Optional[
+        Mapping[str, Callable[[], Sequence[QuarantinedQueryResult]]]
+    ] = None
+) -> APIRouter:
+    router = APIRouter()
+    if refresh_fn_by_name is None:
+        refresh_fn_by_name = {}
+    if quarantined_query_results_fn_by_name is None:
+        quarantined_query_results_fn_by_name = {}
+
+    def verify_admin_api_token(
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(
+            HTTPBearer(auto_error=False)
+        )
+    ) -> None:
+        if not admin_api_token:
+            raise HTTPException(
+                status_code=403,
+                detail='Admin API token not configured'
+            )
+        if credentials is None or not secrets.compare_digest(
+            credentials.credentials.encode('utf-8'),
+            admin_api_token.encode('utf-8')
+        ):
+            raise HTTPException(
+                status_code=401,
+                detail='Invalid admin API token',
+                headers={'WWW-Authenticate': 'Bearer'}
+            )
+
+    # the stats include the last load errors, which are not public
+    @router.get("/cache/stats", dependencies=[Depends(verify_admin_api_token)])
+    def get_cache_stats():
+        return {'caches': cache_metrics_registry.get_stats_list()}
+
+    # the quarantined query results include the load errors, which are not public
+    @router.get("/quarantine", dependencies=[Depends(verify_admin_api_token)])
+    def get_quarantined_query_results(name: Optional[str] = None):
+        assert quarantined_query_results_fn_by_name is not None
+        if name is not None and name not in quarantined_query_results_fn_by_name:
+            raise HTTPException(
+                status_code=404,
+                detail='Provider not found'
+            )
+        names = (
+            [name] if name is not None else list(quarantined_query_results_fn_by_name.keys())
+        )
+        providers = []
+        for provider_name in names:
+            quarantined_query_results = quarantined_query_results_fn_by_name[provider_name]()
+            providers.append({
+                'name': provider_name,
+                'quarantined_count': len(quarantined_query_results),
+                'quarantined_query_results': [
+                    quarantined_query_result.to_dict()
+                    for quarantined_query_result in quarantined_query_results
+                ]
+            })
+        return {'providers': providers}
+
+    @router.post(
+        "/cache/refresh",
+        status_code=202,
+        dependencies=[Depends(verify_admin_api_token)]
+    )
+    def refresh_caches(name: Optional[str] = None):
+        assert refresh_fn_by_name is not None
+        if name is not None and name not in refresh_fn_by_name:
+            raise HTTPException(
+                status_code=404,
+                detail='Cache not found'
+            )
+        names = [name] if name is not None else list(refresh_fn_by_name.keys())
+        LOGGER.info('Requested refresh of caches: %r', names)
+        # caches may share the same refresh function (e.g. providers sharing a data source)
+        generation_by_refresh_fn: Dict[Callable[[], int], int] = {}
+        for cache_name in names:
+            refresh_fn = refresh_fn_by_name[cache_name]
+            if refresh_fn not in generation_by_refresh_fn:
+                generation_by_refresh_fn[refresh_fn] = refresh_fn()
+        return {
+            'caches': [
+                {
+                    'name': cache_name,
+                    'generation': generation_by_refresh_fn[refresh_fn_by_name[cache_name]]
+                }
+                for cache_name in names
+            ]
+        }
+
+    return router
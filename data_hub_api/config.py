@@ -1,3 +1,6 @@
+import os
+
+
 ADDITIONAL_MANUSCRIPT_IDS = (
     '80494',
     '80984',
@@ -12,3 +15,58 @@ DOI_ROOT_URL = 'https://doi.org/'
 ELIFE_FIRST_PUBLICATION_YEAR = 2011
 
 ELECTRONIC_ARTICLE_IDENTIFIER_PREFIX = 'RP'
+
+# when set, loaded cache values are persisted so that a restart can start with a warm cache
+CACHE_SNAPSHOT_DIR = os.getenv('DATA_HUB_API_CACHE_SNAPSHOT_DIR')
+
+MAX_CACHE_SNAPSHOT_AGE_IN_SECONDS = 24 * 60 * 60  # 1 day
+
+# when set, worker processes share cache snapshots and only one of them loads the data
+# (the docmaps of the v2 snapshot are memory mapped, the other caches are copied by each worker)
+SHARED_CACHE_SNAPSHOT_DIR = os.getenv('DATA_HUB_API_SHARED_CACHE_SNAPSHOT_DIR')
+
+CACHE_WARM_UP_TIMEOUT_IN_SECONDS = 10 * 60  # 10 minutes
+
+# required to use the admin routes that change state (e.g. refreshing caches)
+ADMIN_API_TOKEN = os.getenv('DATA_HUB_API_ADMIN_API_TOKEN')
+
+# estimated in-memory size of the data of each provider cache above which a warning is logged
+MEMORY_BUDGET_IN_MB_BY_CACHE_NAME = {
+    'docmaps_v1': 2048,
+    'enhanced_preprints_docmaps_v2': 1024,
+    'kotahi_docmaps_v1': 512
+}
+
+# when enabled, loads exceeding the memory budget fail and the previous value keeps being served
+REFUSE_LOADS_EXCEEDING_MEMORY_BUDGET = (
+    os.getenv('DATA_HUB_API_REFUSE_LOADS_EXCEEDING_MEMORY_BUDGET', '').lower() == 'true'
+)
+
+# when enabled, the v1 and v2 docmaps are generated when first requested rather than on load
+LAZY_DOCMAPS = os.getenv('DATA_HUB_API_LAZY_DOCMAPS', '').lower() == 'true'
+
+# when set to more than one, docmaps are generated by a pool of worker processes on load
+DOCMAP_GENERATION_PROCESS_COUNT = int(
+    os.getenv('DATA_HUB_API_DOCMAP_GENERATION_PROCESS_COUNT', '0')
+)
+
+# number of query result rows sent to a worker process at a time
+DOCMAP_GENERATION_CHUNK_SIZE = int(os.getenv('DATA_HUB_API_DOCMAP_GENERATION_CHUNK_SIZE', '100'))
+
+# fewer rows of a load (e.g. only the changed rows on refresh) are generated serially
+DOCMAP_GENERATION_MIN_PARALLEL_ROW_COUNT = 1000
+
+# number of query result rows kept in memory at a time while preparing the data on load
+# (when generating docmaps in parallel, the batches of a load share one process pool)
+QUERY_RESULT_BATCH_SIZE = int(os.getenv('DATA_HUB_API_QUERY_RESULT_BATCH_SIZE', '1000'))
+
+# when enabled, query results whose docmap fails to generate are skipped and listed by the
+# admin API, rather than failing the whole load (or request)
+QUARANTINE_FAILED_QUERY_RESULTS = (
+    os.getenv('DATA_HUB_API_QUARANTINE_FAILED_QUERY_RESULTS', '').lower() == 'true'
+)
+
+# maximum number of manuscript ids that can be requested at once from the bulk lookup routes
+MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT = int(
+    os.getenv('DATA_HUB_API_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT', '1000')
+)
@@ -1,21 +1,40 @@
+from datetime import datetime
 import logging
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Query
 
 from data_hub_api.docmaps.v1.provider import DocmapsProviderV1
+from data_hub_api.utils.bulk_lookup import (
+    DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT,
+    get_bulk_lookup_response_or_raise_http_exception
+)
+from data_hub_api.utils.pagination import InvalidCursorError
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 def create_docmaps_router(
-    docmaps_provider: DocmapsProviderV1
+    docmaps_provider: DocmapsProviderV1,
+    max_bulk_lookup_manuscript_id_count: int = DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
 ) -> APIRouter:
     router = APIRouter()
 
     @router.get("/v1/index")
-    def get_enhanced_preprints_docmaps_index():
-        return docmaps_provider.get_docmaps_index()
+    def get_enhanced_preprints_docmaps_index(
+        limit: Optional[int] = Query(default=None, ge=1),
+        cursor: Optional[str] = None,
+        updated_since: Optional[datetime] = None
+    ):
+        try:
+            return docmaps_provider.get_docmaps_index(
+                limit=limit,
+                cursor=cursor,
+                updated_since=updated_since
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail='Invalid cursor') from exc
 
     @router.get("/v1/by-publisher/elife/get-by-manuscript-id")
     def get_enhanced_preprints_docmaps_by_manuscript_id_by_publisher_elife(manuscript_id: str):
@@ -28,4 +47,14 @@ def create_docmaps_router(
         assert len(docmaps) == 1
         return docmaps[0]
 
+    @router.post("/v1/by-publisher/elife/get-by-manuscript-ids")
+    def get_enhanced_preprints_docmaps_by_manuscript_ids_by_publisher_elife(
+        manuscript_ids: List[str] = Body(embed=True)
+    ):
+        return get_bulk_lookup_response_or_raise_http_exception(
+            manuscript_ids,
+            docmaps_by_manuscript_ids_fn=docmaps_provider.get_docmaps_by_manuscript_ids_map,
+            max_manuscript_id_count=max_bulk_lookup_manuscript_id_count
+        )
+
     return router
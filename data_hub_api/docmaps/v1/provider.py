@@ -1,9 +1,22 @@
+from dataclasses import dataclass
 import logging
 from pathlib import Path
+from datetime import datetime
 from time import monotonic
-from typing import Iterable, Optional, Sequence, Tuple, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast
+)
 
-import objsize
 from data_hub_api.docmaps.v1.codecs.docmaps import get_docmap_item_for_query_result_item
 from data_hub_api.docmaps.v1.api_input_typing import ApiInput
 
@@ -14,77 +27,325 @@ from data_hub_api.docmaps.v1.docmap_typing import (
 from data_hub_api.utils.bigquery import (
     iter_dict_from_bq_query
 )
-from data_hub_api.utils.cache import SingleObjectCache, DummySingleObjectCache
+from data_hub_api.utils.cache import (
+    ContentHashMemo,
+    DummySingleObjectCache,
+    LazyMemoizedMapping,
+    SingleObjectCache
+)
+from data_hub_api.utils.docmaps_provider_data import (
+    DEFAULT_QUERY_RESULT_BATCH_SIZE,
+    DocmapsProviderData,
+    create_docmaps_provider_data_by_key
+)
+from data_hub_api.utils.pagination import get_key_page
+from data_hub_api.utils.parallel import ParallelMapConfig, ProcessPoolMapper
+from data_hub_api.utils.quarantine import (
+    QuarantinedQueryResult,
+    get_value_or_quarantined_query_result
+)
+from data_hub_api.utils.memory import (
+    BYTES_PER_MB,
+    MemoryBudget,
+    check_memory_budget,
+    estimate_deep_size,
+    log_exact_deep_size_if_debug_enabled
+)
 from data_hub_api.docmaps.v1.sql import get_sql_path
 
 
 LOGGER = logging.getLogger(__name__)
 
 
-class DocmapsProviderV1:
+def get_docmap_for_query_result(query_result: dict) -> Docmap:
+    return get_docmap_item_for_query_result_item(cast(ApiInput, query_result))
+
+
+def get_docmap_or_quarantined_query_result(
+    query_result: dict
+) -> Union[Docmap, QuarantinedQueryResult]:
+    return get_value_or_quarantined_query_result(get_docmap_for_query_result, query_result)
+
+
+def get_sql_values_list(values: Iterable[str]) -> str:
+    return '(' + ', '.join(f"'{value}'" for value in values) + ')'
+
+
+@dataclass(frozen=True)
+class DocmapsQueryResultFilter:
+    only_include_reviewed_preprint_type: bool = True
+    only_include_evaluated_preprints: bool = False
+    additionally_include_manuscript_ids: Tuple[str, ...] = ()
+
+    def get_sql_condition(self) -> Optional[str]:
+        if self.only_include_evaluated_preprints:
+            return 'has_evaluations'
+        if not self.only_include_reviewed_preprint_type:
+            return None
+        condition = 'is_reviewed_preprint_type AND is_or_was_under_review'
+        if self.additionally_include_manuscript_ids:
+            condition = (
+                f'({condition})'
+                ' OR result.manuscript_id IN '
+                + get_sql_values_list(self.additionally_include_manuscript_ids)
+            )
+        return condition
+
+    def is_included(self, query_result: dict) -> bool:
+        # equivalent to the SQL condition
+        if self.only_include_evaluated_preprints:
+            return bool(query_result['has_evaluations'])
+        if not self.only_include_reviewed_preprint_type:
+            return True
+        return bool(
+            (query_result['is_reviewed_preprint_type'] and query_result['is_or_was_under_review'])
+            or query_result['manuscript_id'] in self.additionally_include_manuscript_ids
+        )
+
+
+def get_docmaps_index_query_for_filters(
+    query_result_filters: Sequence[DocmapsQueryResultFilter]
+) -> str:
+    query = Path(get_sql_path('docmaps_index.sql')).read_text(encoding='utf-8')
+    conditions = [
+        query_result_filter.get_sql_condition()
+        for query_result_filter in query_result_filters
+    ]
+    if not conditions or None in conditions:
+        return query
+    return query + '\nWHERE ' + '\nOR '.join(f'({condition})' for condition in conditions)
+
+
+def create_docmaps_provider_data_by_filter(
+    query_results: Iterable[dict],
+    query_result_filters: Sequence[DocmapsQueryResultFilter],
+    lazy_docmaps: bool = False,
+    docmap_memo: Optional[ContentHashMemo[Union[Docmap, QuarantinedQueryResult]]] = None,
+    batch_size: int = DEFAULT_QUERY_RESULT_BATCH_SIZE,
+    quarantine_failed_query_results: bool = False,
+    map_fn: Optional[Callable[[Callable[[Any], Any], Sequence[Any]], Sequence[Any]]] = None
+) -> Mapping[DocmapsQueryResultFilter, DocmapsProviderData[Docmap]]:
+    return create_docmaps_provider_data_by_key(
+        query_results,
+        {
+            query_result_filter: query_result_filter.is_included
+            for query_result_filter in query_result_filters
+        },
+        get_docmap_for_query_result,
+        lazy_docmaps=lazy_docmaps,
+        docmap_memo=docmap_memo,
+        batch_size=batch_size,
+        quarantine_failed_query_results=quarantine_failed_query_results,
+        map_fn=map_fn,
+        # the v1 docmaps are not looked up by secondary identifiers
+        index_manuscript_ids=False
+    )
+
+
+class DocmapsDataSourceV1:
+    """
+    Loads the query results for one or more DocmapsProviderV1 (e.g. enhanced preprints and
+    public reviews) with a single query, and prepares the data of each query result filter
+    from the same query results. Query result filters need to be added before the first load.
+    """
     def __init__(
         self,
         gcp_project_name: str = 'elife-data-pipeline',
-        query_results_cache: Optional[SingleObjectCache[Sequence[dict]]] = None,
-        only_include_reviewed_preprint_type: bool = True,
-        only_include_evaluated_preprints: bool = False,
-        additionally_include_manuscript_ids: Optional[Tuple[str]] = None
+        data_cache: Optional[
+            SingleObjectCache[Mapping[DocmapsQueryResultFilter, DocmapsProviderData[Docmap]]]
+        ] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        lazy_docmaps: bool = False,
+        parallel_map_config: Optional[ParallelMapConfig] = None,
+        query_result_batch_size: int = DEFAULT_QUERY_RESULT_BATCH_SIZE,
+        quarantine_failed_query_results: bool = False
     ) -> None:
+        self.query_result_filters: List[DocmapsQueryResultFilter] = []
         self.gcp_project_name = gcp_project_name
-        self.docmaps_index_query = (
-            Path(get_sql_path('docmaps_index.sql')).read_text(encoding='utf-8')
-        )
-        assert not (only_include_reviewed_preprint_type and only_include_evaluated_preprints)
-        assert not (additionally_include_manuscript_ids and not only_include_reviewed_preprint_type)
-        if only_include_reviewed_preprint_type:
-            self.docmaps_index_query += (
-                '\nWHERE is_reviewed_preprint_type AND is_or_was_under_review'
-            )
-        if only_include_reviewed_preprint_type and additionally_include_manuscript_ids:
-            self.docmaps_index_query += (
-                f'\nOR result.manuscript_id IN {additionally_include_manuscript_ids}'
+        self.memory_budget = memory_budget
+        self.lazy_docmaps = lazy_docmaps
+        self.query_result_batch_size = query_result_batch_size
+        if data_cache is None:
+            data_cache = DummySingleObjectCache[
+                Mapping[DocmapsQueryResultFilter, DocmapsProviderData[Docmap]]
+            ]()
+        self._data_cache = data_cache
+        self.quarantine_failed_query_results = quarantine_failed_query_results
+        self.parallel_map_config = parallel_map_config
+        self._docmap_memo = ContentHashMemo[Union[Docmap, QuarantinedQueryResult]](
+            value_fn=(
+                get_docmap_or_quarantined_query_result
+                if quarantine_failed_query_results
+                else get_docmap_for_query_result
             )
-        if only_include_evaluated_preprints:
-            self.docmaps_index_query += '\nWHERE has_evaluations'
-        if query_results_cache is None:
-            query_results_cache = DummySingleObjectCache[Sequence[dict]]()
-        self._query_results_cache = query_results_cache
-
-    def _load_query_results_from_bq(self) -> Sequence[dict]:
-        LOGGER.info('Loading query results from BigQuery...')
+        )
+
+    def add_query_result_filter(self, query_result_filter: DocmapsQueryResultFilter) -> None:
+        if query_result_filter not in self.query_result_filters:
+            self.query_result_filters.append(query_result_filter)
+
+    @property
+    def docmaps_index_query(self) -> str:
+        return get_docmaps_index_query_for_filters(self.query_result_filters)
+
+    def _load_data(self) -> Mapping[DocmapsQueryResultFilter, DocmapsProviderData[Docmap]]:
+        LOGGER.info('Loading query results from BigQuery and generating docmaps...')
         start_time = monotonic()
-        result = list(iter_dict_from_bq_query(
-            self.gcp_project_name,
-            self.docmaps_index_query
-        ))
+        # the query results are streamed, rather than loaded into memory all at once
+        # (the process pool, if any, is shared by all batches of the load)
+        with ProcessPoolMapper(self.parallel_map_config) as process_pool_mapper:
+            data_by_filter = create_docmaps_provider_data_by_filter(
+                iter_dict_from_bq_query(self.gcp_project_name, self.docmaps_index_query),
+                self.query_result_filters,
+                lazy_docmaps=self.lazy_docmaps,
+                docmap_memo=self._docmap_memo,
+                batch_size=self.query_result_batch_size,
+                quarantine_failed_query_results=self.quarantine_failed_query_results,
+                map_fn=process_pool_mapper.map
+            )
         end_time = monotonic()
-        LOGGER.info(
-            'Loaded query results from BigQuery, rows=%d, approx_size=%.3fMB, time=%.3f seconds',
-            len(result),
-            objsize.get_deep_size(result) / 1024 / 1024,
-            (end_time - start_time)
+        if self.lazy_docmaps:
+            # docmaps are generated on first request, the memory use grows accordingly
+            estimated_size = sum(
+                estimate_deep_size(
+                    cast(LazyMemoizedMapping, data.docmaps_by_manuscript_id).source_by_key
+                )
+                for data in data_by_filter.values()
+            )
+            LOGGER.info(
+                'Loaded query results, manuscripts=%r, approx_size=%.3fMB, time=%.3f seconds',
+                [len(data.docmaps_by_manuscript_id) for data in data_by_filter.values()],
+                estimated_size / BYTES_PER_MB,
+                (end_time - start_time)
+            )
+        else:
+            estimated_size = sum(estimate_deep_size(data) for data in data_by_filter.values())
+            LOGGER.info(
+                (
+                    'Generated docmaps, docmaps=%r, reused=%d, rebuilt=%d, quarantined=%r,'
+                    ' approx_size=%.3fMB, time=%.3f seconds'
+                ),
+                [len(data.docmaps) for data in data_by_filter.values()],
+                self._docmap_memo.reused_count,
+                self._docmap_memo.created_count,
+                [len(data.quarantined_query_results) for data in data_by_filter.values()],
+                estimated_size / BYTES_PER_MB,
+                (end_time - start_time)
+            )
+        log_exact_deep_size_if_debug_enabled(LOGGER, data_by_filter, 'docmaps data')
+        check_memory_budget(self.memory_budget, estimated_size)
+        return data_by_filter
+
+    def get_data(
+        self,
+        query_result_filter: DocmapsQueryResultFilter
+    ) -> DocmapsProviderData[Docmap]:
+        return self._data_cache.get_or_load(load_fn=self._load_data)[query_result_filter]
+
+    def preload(self) -> None:
+        self._data_cache.get_or_load(load_fn=self._load_data)
+
+    def refresh(self) -> int:
+        return self._data_cache.request_refresh(load_fn=self._load_data)
+
+
+class DocmapsProviderV1:
+    def __init__(  # pylint: disable=too-many-positional-arguments
+        self,
+        gcp_project_name: str = 'elife-data-pipeline',
+        query_results_cache: Optional[
+            SingleObjectCache[Mapping[DocmapsQueryResultFilter, DocmapsProviderData[Docmap]]]
+        ] = None,
+        only_include_reviewed_preprint_type: bool = True,
+        only_include_evaluated_preprints: bool = False,
+        additionally_include_manuscript_ids: Optional[Tuple[str, ...]] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        lazy_docmaps: bool = False,
+        data_source: Optional[DocmapsDataSourceV1] = None
+    ) -> None:
+        assert not (only_include_reviewed_preprint_type and only_include_evaluated_preprints)
+        assert not (additionally_include_manuscript_ids and not only_include_reviewed_preprint_type)
+        self.query_result_filter = DocmapsQueryResultFilter(
+            only_include_reviewed_preprint_type=only_include_reviewed_preprint_type,
+            only_include_evaluated_preprints=only_include_evaluated_preprints,
+            additionally_include_manuscript_ids=tuple(additionally_include_manuscript_ids or ())
         )
-        return result
+        if data_source is None:
+            data_source = DocmapsDataSourceV1(
+                gcp_project_name=gcp_project_name,
+                data_cache=query_results_cache,
+                memory_budget=memory_budget,
+                lazy_docmaps=lazy_docmaps
+            )
+        data_source.add_query_result_filter(self.query_result_filter)
+        self.data_source = data_source
+
+    @property
+    def docmaps_index_query(self) -> str:
+        return self.data_source.docmaps_index_query
+
+    def _get_data(self) -> DocmapsProviderData[Docmap]:
+        return self.data_source.get_data(self.query_result_filter)
+
+    def preload(self) -> None:
+        self._get_data()
+
+    def refresh(self) -> int:
+        return self.data_source.refresh()
+
+    def get_quarantined_query_results(self) -> Sequence[QuarantinedQueryResult]:
+        return list(self._get_data().quarantined_query_results)
 
     def iter_docmaps_by_manuscript_id(
         self,
         manuscript_id: Optional[str] = None
     ) -> Iterable[Docmap]:
-        bq_result_list = self._query_results_cache.get_or_load(
-            load_fn=self._load_query_results_from_bq
-        )
+        data = self._get_data()
         if manuscript_id:
-            bq_result_list = [
-                bq_result
-                for bq_result in bq_result_list
-                if bq_result['manuscript_id'] == manuscript_id
-            ]
-        for bq_result in bq_result_list:
-            yield get_docmap_item_for_query_result_item(cast(ApiInput, bq_result))
+            return data.docmaps_by_manuscript_id.get(manuscript_id, [])
+        return data.docmaps
 
     def get_docmaps_by_manuscript_id(self, manuscript_id: str) -> Sequence[Docmap]:
         return list(self.iter_docmaps_by_manuscript_id(manuscript_id))
 
-    def get_docmaps_index(self) -> dict:
-        article_docmaps_list = list(self.iter_docmaps_by_manuscript_id())
-        return {'docmaps': article_docmaps_list}
+    def get_docmaps_by_manuscript_ids_map(
+        self,
+        manuscript_ids: Iterable[str]
+    ) -> Mapping[str, Sequence[Docmap]]:
+        # only includes the manuscript ids with docmaps, all from the same generation
+        data = self._get_data()
+        docmaps_by_manuscript_id: Dict[str, Sequence[Docmap]] = {}
+        for manuscript_id in manuscript_ids:
+            docmaps = data.docmaps_by_manuscript_id.get(manuscript_id)
+            if docmaps:
+                docmaps_by_manuscript_id[manuscript_id] = list(docmaps)
+        return docmaps_by_manuscript_id
+
+    def get_docmaps_index(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        updated_since: Optional[datetime] = None
+    ) -> dict:
+        if limit is None and cursor is None and updated_since is None:
+            article_docmaps_list = list(self.iter_docmaps_by_manuscript_id())
+            return {'docmaps': article_docmaps_list}
+        data = self._get_data()
+        manuscript_ids = (
+            data.manuscript_timestamp_indexes.get_sorted_manuscript_ids_since(
+                updated_since=updated_since
+            )
+            if updated_since is not None
+            else data.sorted_manuscript_ids
+        )
+        # in lazy mode, only the docmaps of the requested page are generated
+        page = get_key_page(manuscript_ids, limit=limit, cursor=cursor)
+        return {
+            'docmaps': [
+                docmap
+                for manuscript_id in page.keys
+                # quarantined query results are indexed, but have no docmaps
+                for docmap in data.docmaps_by_manuscript_id.get(manuscript_id, [])
+            ],
+            'next_cursor': page.next_cursor
+        }
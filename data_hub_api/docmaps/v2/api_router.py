@@ -1,21 +1,45 @@
+from datetime import datetime
 import logging
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Query, Response
 
 from data_hub_api.docmaps.v2.provider import DocmapsProvider
+from data_hub_api.utils.bulk_lookup import (
+    DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT,
+    get_bulk_lookup_response_or_raise_http_exception
+)
+from data_hub_api.utils.pagination import InvalidCursorError
+from data_hub_api.utils.single_lookup import get_single_docmap_or_raise_http_exception
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 def create_docmaps_router(
-    docmaps_provider: DocmapsProvider
+    docmaps_provider: DocmapsProvider,
+    max_bulk_lookup_manuscript_id_count: int = DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
 ) -> APIRouter:
     router = APIRouter()
 
     @router.get("/v2/index")
-    def get_enhanced_preprints_docmaps_index():
-        return docmaps_provider.get_docmaps_index()
+    def get_enhanced_preprints_docmaps_index(
+        limit: Optional[int] = Query(default=None, ge=1),
+        cursor: Optional[str] = None,
+        updated_since: Optional[datetime] = None,
+        published_since: Optional[datetime] = None
+    ):
+        try:
+            # serialized by the provider, which may serve the JSON of a shared snapshot as is
+            docmaps_index_json_bytes = docmaps_provider.get_docmaps_index_json_bytes(
+                limit=limit,
+                cursor=cursor,
+                updated_since=updated_since,
+                published_since=published_since
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail='Invalid cursor') from exc
+        return Response(content=docmaps_index_json_bytes, media_type='application/json')
 
     @router.get("/v2/by-publisher/elife/get-by-manuscript-id")
     def get_enhanced_preprints_docmaps_by_manuscript_id_by_publisher_elife(manuscript_id: str):
@@ -28,4 +52,39 @@ def create_docmaps_router(
         assert len(docmaps) == 1
         return docmaps[0]
 
+    @router.post("/v2/by-publisher/elife/get-by-manuscript-ids")
+    def get_enhanced_preprints_docmaps_by_manuscript_ids_by_publisher_elife(
+        manuscript_ids: List[str] = Body(embed=True)
+    ):
+        return get_bulk_lookup_response_or_raise_http_exception(
+            manuscript_ids,
+            docmaps_by_manuscript_ids_fn=docmaps_provider.get_docmaps_by_manuscript_ids_map,
+            max_manuscript_id_count=max_bulk_lookup_manuscript_id_count
+        )
+
+    @router.get("/v2/by-publisher/elife/get-by-elife-doi")
+    def get_enhanced_preprints_docmaps_by_elife_doi_by_publisher_elife(elife_doi: str):
+        return get_single_docmap_or_raise_http_exception(
+            docmaps_provider.get_docmaps_by_elife_doi(elife_doi),
+            identifier_description='eLife DOI'
+        )
+
+    @router.get("/v2/by-publisher/elife/get-by-preprint-doi")
+    def get_enhanced_preprints_docmaps_by_preprint_doi_by_publisher_elife(preprint_doi: str):
+        return get_single_docmap_or_raise_http_exception(
+            docmaps_provider.get_docmaps_by_preprint_doi(preprint_doi),
+            identifier_description='preprint DOI'
+        )
+
+    @router.get("/v2/by-publisher/elife/get-by-long-manuscript-identifier")
+    def get_enhanced_preprints_docmaps_by_long_manuscript_identifier_by_publisher_elife(
+        long_manuscript_identifier: str
+    ):
+        return get_single_docmap_or_raise_http_exception(
+            docmaps_provider.get_docmaps_by_long_manuscript_identifier(
+                long_manuscript_identifier
+            ),
+            identifier_description='long manuscript identifier'
+        )
+
     return router
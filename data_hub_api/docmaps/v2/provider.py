@@ -1,9 +1,9 @@
 import logging
 from pathlib import Path
+from datetime import datetime
 from time import monotonic
-from typing import Iterable, Optional, Sequence, cast
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Union, cast
 
-import objsize
 from data_hub_api.docmaps.v2.codecs.docmaps import get_docmap_item_for_query_result_item
 from data_hub_api.docmaps.v2.api_input_typing import ApiInput
 
@@ -14,62 +14,279 @@ from data_hub_api.docmaps.v2.docmap_typing import (
 from data_hub_api.utils.bigquery import (
     iter_dict_from_bq_query
 )
-from data_hub_api.utils.cache import SingleObjectCache, DummySingleObjectCache
+from data_hub_api.utils.cache import (
+    ContentHashMemo,
+    DummySingleObjectCache,
+    LazyMemoizedMapping,
+    SingleObjectCache
+)
+from data_hub_api.utils.docmaps_provider_data import (
+    DEFAULT_QUERY_RESULT_BATCH_SIZE,
+    DocmapsProviderData,
+    create_docmaps_provider_data
+)
+from data_hub_api.utils.mapped_json import get_json_bytes, get_json_list_items_bytes_by_key
+from data_hub_api.utils.pagination import KeyPage, get_key_page
+from data_hub_api.utils.parallel import ParallelMapConfig, ProcessPoolMapper
+from data_hub_api.utils.quarantine import (
+    QuarantinedQueryResult,
+    get_value_or_quarantined_query_result
+)
+from data_hub_api.utils.memory import (
+    BYTES_PER_MB,
+    MemoryBudget,
+    check_memory_budget,
+    estimate_deep_size,
+    log_exact_deep_size_if_debug_enabled
+)
 from data_hub_api.docmaps.v2.sql import get_sql_path
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+DOCMAPS_INDEX_TABLE_ID = 'elife-data-pipeline.prod.mv_docmaps_index'
+
+
+def get_docmap_for_query_result(query_result: dict) -> Docmap:
+    return get_docmap_item_for_query_result_item(cast(ApiInput, query_result))
+
+
+def get_docmap_or_quarantined_query_result(
+    query_result: dict
+) -> Union[Docmap, QuarantinedQueryResult]:
+    return get_value_or_quarantined_query_result(get_docmap_for_query_result, query_result)
+
+
 class DocmapsProvider:
     def __init__(
         self,
         gcp_project_name: str = 'elife-data-pipeline',
-        query_results_cache: Optional[SingleObjectCache[Sequence[dict]]] = None,
+        query_results_cache: Optional[SingleObjectCache[DocmapsProviderData[Docmap]]] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        lazy_docmaps: bool = False,
+        parallel_map_config: Optional[ParallelMapConfig] = None,
+        query_result_batch_size: int = DEFAULT_QUERY_RESULT_BATCH_SIZE,
+        quarantine_failed_query_results: bool = False
     ) -> None:
         self.gcp_project_name = gcp_project_name
+        self.memory_budget = memory_budget
+        self.lazy_docmaps = lazy_docmaps
+        self.query_result_batch_size = query_result_batch_size
         self.docmaps_index_query = (
             Path(get_sql_path('docmaps_index.sql')).read_text(encoding='utf-8')
         )
         if query_results_cache is None:
-            query_results_cache = DummySingleObjectCache[Sequence[dict]]()
+            query_results_cache = DummySingleObjectCache[DocmapsProviderData[Docmap]]()
         self._query_results_cache = query_results_cache
+        self.quarantine_failed_query_results = quarantine_failed_query_results
+        self.parallel_map_config = parallel_map_config
+        self._docmap_memo = ContentHashMemo[Union[Docmap, QuarantinedQueryResult]](
+            value_fn=(
+                get_docmap_or_quarantined_query_result
+                if quarantine_failed_query_results
+                else get_docmap_for_query_result
+            )
+        )
 
-    def _load_query_results_from_bq(self) -> Sequence[dict]:
-        LOGGER.info('Loading query results from BigQuery...')
+    def _load_data(self) -> DocmapsProviderData[Docmap]:
+        LOGGER.info('Loading query results from BigQuery and generating docmaps...')
         start_time = monotonic()
-        result = list(iter_dict_from_bq_query(
-            self.gcp_project_name,
-            self.docmaps_index_query
-        ))
+        # the query results are streamed, rather than loaded into memory all at once
+        # (the process pool, if any, is shared by all batches of the load)
+        with ProcessPoolMapper(self.parallel_map_config) as process_pool_mapper:
+            data = create_docmaps_provider_data(
+                iter_dict_from_bq_query(self.gcp_project_name, self.docmaps_index_query),
+                get_docmap_for_query_result,
+                lazy_docmaps=self.lazy_docmaps,
+                docmap_memo=self._docmap_memo,
+                batch_size=self.query_result_batch_size,
+                quarantine_failed_query_results=self.quarantine_failed_query_results,
+                map_fn=process_pool_mapper.map
+            )
         end_time = monotonic()
-        LOGGER.info(
-            'Loaded query results from BigQuery, rows=%d, approx_size=%.3fMB, time=%.3f seconds',
-            len(result),
-            objsize.get_deep_size(result) / 1024 / 1024,
-            (end_time - start_time)
-        )
-        return result
+        if self.lazy_docmaps:
+            # docmaps are generated on first request, the memory use grows accordingly
+            estimated_size = estimate_deep_size(
+                cast(LazyMemoizedMapping, data.docmaps_by_manuscript_id).source_by_key
+            )
+            LOGGER.info(
+                'Loaded query results, manuscripts=%d, approx_size=%.3fMB, time=%.3f seconds',
+                len(data.docmaps_by_manuscript_id),
+                estimated_size / BYTES_PER_MB,
+                (end_time - start_time)
+            )
+        else:
+            estimated_size = estimate_deep_size(data)
+            LOGGER.info(
+                (
+                    'Generated docmaps, docmaps=%d, reused=%d, rebuilt=%d, quarantined=%d,'
+                    ' approx_size=%.3fMB, time=%.3f seconds'
+                ),
+                len(data.docmaps),
+                self._docmap_memo.reused_count,
+                self._docmap_memo.created_count,
+                len(data.quarantined_query_results),
+                estimated_size / BYTES_PER_MB,
+                (end_time - start_time)
+            )
+        log_exact_deep_size_if_debug_enabled(LOGGER, data, 'docmaps data')
+        check_memory_budget(self.memory_budget, estimated_size)
+        return data
+
+    def _get_data(self) -> DocmapsProviderData[Docmap]:
+        return self._query_results_cache.get_or_load(load_fn=self._load_data)
+
+    def preload(self) -> None:
+        self._get_data()
+
+    def refresh(self) -> int:
+        return self._query_results_cache.request_refresh(load_fn=self._load_data)
+
+    def get_quarantined_query_results(self) -> Sequence[QuarantinedQueryResult]:
+        return list(self._get_data().quarantined_query_results)
 
     def iter_docmaps_by_manuscript_id(
         self,
         manuscript_id: Optional[str] = None
     ) -> Iterable[Docmap]:
-        bq_result_list = self._query_results_cache.get_or_load(
-            load_fn=self._load_query_results_from_bq
-        )
+        data = self._get_data()
         if manuscript_id:
-            bq_result_list = [
-                bq_result
-                for bq_result in bq_result_list
-                if bq_result['manuscript_id'] == manuscript_id
-            ]
-        for bq_result in bq_result_list:
-            yield get_docmap_item_for_query_result_item(cast(ApiInput, bq_result))
+            return data.docmaps_by_manuscript_id.get(manuscript_id, [])
+        return data.docmaps
 
     def get_docmaps_by_manuscript_id(self, manuscript_id: str) -> Sequence[Docmap]:
         return list(self.iter_docmaps_by_manuscript_id(manuscript_id))
 
-    def get_docmaps_index(self) -> dict:
-        article_docmaps_list = list(self.iter_docmaps_by_manuscript_id())
-        return {'docmaps': article_docmaps_list}
+    def get_docmaps_by_manuscript_ids_map(
+        self,
+        manuscript_ids: Iterable[str]
+    ) -> Mapping[str, Sequence[Docmap]]:
+        # only includes the manuscript ids with docmaps, all from the same generation
+        data = self._get_data()
+        docmaps_by_manuscript_id: Dict[str, Sequence[Docmap]] = {}
+        for manuscript_id in manuscript_ids:
+            docmaps = data.docmaps_by_manuscript_id.get(manuscript_id)
+            if docmaps:
+                docmaps_by_manuscript_id[manuscript_id] = list(docmaps)
+        return docmaps_by_manuscript_id
+
+    def _get_docmaps_by_manuscript_ids(
+        self,
+        data: DocmapsProviderData[Docmap],
+        manuscript_ids: Iterable[str]
+    ) -> Sequence[Docmap]:
+        return [
+            docmap
+            for manuscript_id in manuscript_ids
+            for docmap in data.docmaps_by_manuscript_id.get(manuscript_id, [])
+        ]
+
+    def get_docmaps_by_elife_doi(self, elife_doi: str) -> Sequence[Docmap]:
+        data = self._get_data()
+        return self._get_docmaps_by_manuscript_ids(
+            data,
+            data.manuscript_id_indexes.get_manuscript_ids_by_elife_doi(elife_doi)
+        )
+
+    def get_docmaps_by_preprint_doi(self, preprint_doi: str) -> Sequence[Docmap]:
+        data = self._get_data()
+        return self._get_docmaps_by_manuscript_ids(
+            data,
+            data.manuscript_id_indexes.get_manuscript_ids_by_preprint_doi(preprint_doi)
+        )
+
+    def get_docmaps_by_long_manuscript_identifier(
+        self,
+        long_manuscript_identifier: str
+    ) -> Sequence[Docmap]:
+        data = self._get_data()
+        return self._get_docmaps_by_manuscript_ids(
+            data,
+            data.manuscript_id_indexes.get_manuscript_ids_by_long_manuscript_identifier(
+                long_manuscript_identifier
+            )
+        )
+
+    def _get_docmaps_index_page(
+        self,
+        data: DocmapsProviderData[Docmap],
+        limit: Optional[int],
+        cursor: Optional[str],
+        updated_since: Optional[datetime],
+        published_since: Optional[datetime]
+    ) -> KeyPage:
+        manuscript_ids = (
+            data.manuscript_timestamp_indexes.get_sorted_manuscript_ids_since(
+                updated_since=updated_since,
+                published_since=published_since
+            )
+            if updated_since is not None or published_since is not None
+            else data.sorted_manuscript_ids
+        )
+        return get_key_page(manuscript_ids, limit=limit, cursor=cursor)
+
+    def get_docmaps_index(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        updated_since: Optional[datetime] = None,
+        published_since: Optional[datetime] = None
+    ) -> dict:
+        if limit is None and cursor is None and updated_since is None and published_since is None:
+            article_docmaps_list = list(self.iter_docmaps_by_manuscript_id())
+            return {'docmaps': article_docmaps_list}
+        data = self._get_data()
+        # in lazy mode, only the docmaps of the requested page are generated
+        page = self._get_docmaps_index_page(
+            data,
+            limit=limit,
+            cursor=cursor,
+            updated_since=updated_since,
+            published_since=published_since
+        )
+        return {
+            'docmaps': [
+                docmap
+                for manuscript_id in page.keys
+                # quarantined query results are indexed, but have no docmaps
+                for docmap in data.docmaps_by_manuscript_id.get(manuscript_id, [])
+            ],
+            'next_cursor': page.next_cursor
+        }
+
+    def get_docmaps_index_json_bytes(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        updated_since: Optional[datetime] = None,
+        published_since: Optional[datetime] = None
+    ) -> bytes:
+        """
+        Returns the docmaps index like get_docmaps_index, serialized as JSON.
+        The JSON of docmaps read from a shared cache snapshot is returned as is.
+        """
+        data = self._get_data()
+        if limit is None and cursor is None and updated_since is None and published_since is None:
+            manuscript_ids: Iterable[str] = data.docmaps_by_manuscript_id.keys()
+            next_cursor_json_bytes = b''
+        else:
+            page = self._get_docmaps_index_page(
+                data,
+                limit=limit,
+                cursor=cursor,
+                updated_since=updated_since,
+                published_since=published_since
+            )
+            manuscript_ids = page.keys
+            next_cursor_json_bytes = b',"next_cursor":' + get_json_bytes(page.next_cursor)
+        docmaps_json_bytes = b','.join(
+            docmaps_json_bytes
+            for manuscript_id in manuscript_ids
+            for docmaps_json_bytes in [
+                get_json_list_items_bytes_by_key(data.docmaps_by_manuscript_id, manuscript_id)
+            ]
+            # quarantined query results are indexed, but have no docmaps
+            if docmaps_json_bytes
+        )
+        return b'{"docmaps":[' + docmaps_json_bytes + b']' + next_cursor_json_bytes + b'}'
@@ -1,22 +1,42 @@
+from datetime import datetime
 import logging
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Body, HTTPException, Query
 from fastapi.responses import HTMLResponse
 
 from data_hub_api.kotahi_docmaps.v1.provider import DocmapsProvider
+from data_hub_api.utils.bulk_lookup import (
+    DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT,
+    get_bulk_lookup_response_or_raise_http_exception
+)
+from data_hub_api.utils.pagination import InvalidCursorError
+from data_hub_api.utils.single_lookup import get_single_docmap_or_raise_http_exception
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 def create_docmaps_router(
-    docmaps_provider: DocmapsProvider
+    docmaps_provider: DocmapsProvider,
+    max_bulk_lookup_manuscript_id_count: int = DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
 ) -> APIRouter:
     router = APIRouter()
 
     @router.get("/v1/index")
-    def get_kotahi_docmaps_index():
-        return docmaps_provider.get_docmaps_index()
+    def get_kotahi_docmaps_index(
+        limit: Optional[int] = Query(default=None, ge=1),
+        cursor: Optional[str] = None,
+        updated_since: Optional[datetime] = None
+    ):
+        try:
+            return docmaps_provider.get_docmaps_index(
+                limit=limit,
+                cursor=cursor,
+                updated_since=updated_since
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail='Invalid cursor') from exc
 
     @router.get("/v1/by-publisher/elife/get-by-manuscript-id")
     def get_kotahi_docmap_by_manuscript_id_by_publisher_elife(manuscript_id: str):
@@ -29,6 +49,41 @@ def create_docmaps_router(
         assert len(docmaps) == 1
         return docmaps[0]
 
+    @router.post("/v1/by-publisher/elife/get-by-manuscript-ids")
+    def get_kotahi_docmaps_by_manuscript_ids_by_publisher_elife(
+        manuscript_ids: List[str] = Body(embed=True)
+    ):
+        return get_bulk_lookup_response_or_raise_http_exception(
+            manuscript_ids,
+            docmaps_by_manuscript_ids_fn=docmaps_provider.get_docmaps_by_manuscript_ids_map,
+            max_manuscript_id_count=max_bulk_lookup_manuscript_id_count
+        )
+
+    @router.get("/v1/by-publisher/elife/get-by-elife-doi")
+    def get_kotahi_docmap_by_elife_doi_by_publisher_elife(elife_doi: str):
+        return get_single_docmap_or_raise_http_exception(
+            docmaps_provider.get_docmaps_by_elife_doi(elife_doi),
+            identifier_description='eLife DOI'
+        )
+
+    @router.get("/v1/by-publisher/elife/get-by-preprint-doi")
+    def get_kotahi_docmap_by_preprint_doi_by_publisher_elife(preprint_doi: str):
+        return get_single_docmap_or_raise_http_exception(
+            docmaps_provider.get_docmaps_by_preprint_doi(preprint_doi),
+            identifier_description='preprint DOI'
+        )
+
+    @router.get("/v1/by-publisher/elife/get-by-long-manuscript-identifier")
+    def get_kotahi_docmap_by_long_manuscript_identifier_by_publisher_elife(
+        long_manuscript_identifier: str
+    ):
+        return get_single_docmap_or_raise_http_exception(
+            docmaps_provider.get_docmaps_by_long_manuscript_identifier(
+                long_manuscript_identifier
+            ),
+            identifier_description='long manuscript identifier'
+        )
+
     @router.get("/v1/evaluation/get-by-evaluation-id", response_class=HTMLResponse)
     def get_evaluation_text_by_evaluation_id(evaluation_id: str):
         evaluation_text = docmaps_provider.get_evaluation_html_by_evaluation_id(evaluation_id)
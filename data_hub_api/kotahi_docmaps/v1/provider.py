@@ -1,11 +1,12 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cached_property, partial
 import logging
 from pathlib import Path
 from time import monotonic
-from typing import Iterable, Mapping, Optional, Sequence, cast
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union, cast
 
 from data_hub_api.utils.html import convert_plain_text_to_html
-import objsize
 from data_hub_api.kotahi_docmaps.v1.codecs.docmaps import get_docmap_item_for_query_result_item
 from data_hub_api.kotahi_docmaps.v1.api_input_typing import ApiInput
 from data_hub_api.kotahi_docmaps.v1.codecs.evaluation import iter_evaluation_id_and_text
@@ -17,16 +18,66 @@ from data_hub_api.utils.bigquery import (
     iter_dict_from_bq_query
 )
 from data_hub_api.utils.cache import SingleObjectCache, DummySingleObjectCache
+from data_hub_api.utils.iterables import iter_batches
+from data_hub_api.utils.manuscript_id_index import ManuscriptIdIndexes
+from data_hub_api.utils.manuscript_timestamp_index import ManuscriptTimestampIndexes
+from data_hub_api.utils.pagination import get_key_page
+from data_hub_api.utils.parallel import ParallelMapConfig, ProcessPoolMapper
+from data_hub_api.utils.quarantine import (
+    QuarantinedQueryResult,
+    get_value_or_quarantined_query_result
+)
+from data_hub_api.utils.memory import (
+    BYTES_PER_MB,
+    MemoryBudget,
+    check_memory_budget,
+    estimate_deep_size,
+    log_exact_deep_size_if_debug_enabled
+)
 from data_hub_api.kotahi_docmaps.v1.sql import get_sql_path
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+DEFAULT_QUERY_RESULT_BATCH_SIZE = 1000
+
+
 @dataclass(frozen=True)
 class DocmapsProviderData:
     docmap_by_manuscript_id_map: Mapping[str, Docmap]
     evaluation_text_by_evaluation_id_map: Mapping[str, str]
+    # query results whose docmap failed to generate, in quarantine mode
+    quarantined_query_results: Sequence[QuarantinedQueryResult] = field(default_factory=list)
+    manuscript_id_indexes: ManuscriptIdIndexes = field(default_factory=ManuscriptIdIndexes)
+    manuscript_timestamp_indexes: ManuscriptTimestampIndexes = field(
+        default_factory=ManuscriptTimestampIndexes
+    )
+
+    @cached_property
+    def sorted_manuscript_ids(self) -> Sequence[str]:
+        # the stable order used to paginate the index, fixed for each generation
+        return sorted(self.docmap_by_manuscript_id_map.keys())
+
+
+def get_evaluation_text_by_evaluation_id_for_query_result(
+    bq_result: ApiInput
+) -> Mapping[str, str]:
+    evaluation_map = {}
+    for manuscript_version in bq_result['manuscript_versions']:
+        for evaluation_id, evaluation_text in iter_evaluation_id_and_text(manuscript_version):
+            evaluation_map[evaluation_id] = evaluation_text
+    return evaluation_map
+
+
+def get_docmap_and_evaluation_text_by_evaluation_id_for_query_result(
+    bq_result: ApiInput
+) -> Tuple[Docmap, Mapping[str, str]]:
+    # both are created together, so that a malformed query result is quarantined as a whole
+    return (
+        get_docmap_item_for_query_result_item(bq_result),
+        get_evaluation_text_by_evaluation_id_for_query_result(bq_result)
+    )
 
 
 class DocmapsProvider:
@@ -34,8 +85,16 @@ class DocmapsProvider:
         self,
         gcp_project_name: str = 'elife-data-pipeline',
         data_cache: Optional[SingleObjectCache[DocmapsProviderData]] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        parallel_map_config: Optional[ParallelMapConfig] = None,
+        query_result_batch_size: int = DEFAULT_QUERY_RESULT_BATCH_SIZE,
+        quarantine_failed_query_results: bool = False
     ) -> None:
         self.gcp_project_name = gcp_project_name
+        self.memory_budget = memory_budget
+        self.parallel_map_config = parallel_map_config
+        self.query_result_batch_size = query_result_batch_size
+        self.quarantine_failed_query_results = quarantine_failed_query_results
         self.docmaps_index_query = (
             Path(get_sql_path('docmaps_index.sql')).read_text(encoding='utf-8')
         )
@@ -43,69 +102,89 @@ class DocmapsProvider:
             data_cache = DummySingleObjectCache[DocmapsProviderData]()
         self._data_cache = data_cache
 
-    def _load_query_results_from_bq(self) -> Sequence[ApiInput]:
-        LOGGER.info('Loading query results from BigQuery...')
-        start_time = monotonic()
-        result = list(iter_dict_from_bq_query(
-            self.gcp_project_name,
-            self.docmaps_index_query
-        ))
-        end_time = monotonic()
-        LOGGER.info(
-            'Loaded query results from BigQuery, rows=%d, approx_size=%.3fMB, time=%.3f seconds',
-            len(result),
-            objsize.get_deep_size(result) / 1024 / 1024,
-            (end_time - start_time)
-        )
-        return cast(Sequence[ApiInput], result)
-
     def _load_data(self) -> DocmapsProviderData:
-        bq_result_list = self._load_query_results_from_bq()
-        LOGGER.info('Preparing data from query results...')
+        LOGGER.info('Loading query results from BigQuery and preparing data...')
         start_time = monotonic()
+        docmap_by_manuscript_id_map: Dict[str, Docmap] = {}
+        evaluation_text_by_evaluation_id_map: Dict[str, str] = {}
+        quarantined_query_results: List[QuarantinedQueryResult] = []
+        manuscript_id_indexes = ManuscriptIdIndexes()
+        manuscript_timestamp_indexes = ManuscriptTimestampIndexes()
+        # the query results are streamed, only one batch is kept in memory at a time
+        # (the process pool, if any, is shared by all batches of the load)
+        with ProcessPoolMapper(self.parallel_map_config) as process_pool_mapper:
+            for bq_result_batch in iter_batches(
+                iter_dict_from_bq_query(self.gcp_project_name, self.docmaps_index_query),
+                self.query_result_batch_size
+            ):
+                bq_result_list = cast(Sequence[ApiInput], bq_result_batch)
+                for bq_result, docmap_and_evaluation_texts in zip(
+                    bq_result_list,
+                    self.create_docmap_and_evaluation_texts_list(
+                        bq_result_list,
+                        process_pool_mapper=process_pool_mapper
+                    )
+                ):
+                    if isinstance(docmap_and_evaluation_texts, QuarantinedQueryResult):
+                        quarantined_query_results.append(docmap_and_evaluation_texts)
+                        continue
+                    docmap, evaluation_text_by_evaluation_id = docmap_and_evaluation_texts
+                    docmap_by_manuscript_id_map[bq_result['manuscript_id']] = docmap
+                    evaluation_text_by_evaluation_id_map.update(evaluation_text_by_evaluation_id)
+                    manuscript_id_indexes.add_query_result(bq_result)
+                    manuscript_timestamp_indexes.add_query_result(bq_result)
         data = DocmapsProviderData(
-            docmap_by_manuscript_id_map=self.create_docmap_by_manuscript_id_map(
-                bq_result_list
-            ),
-            evaluation_text_by_evaluation_id_map=self.create_evaluation_text_by_evaluation_id_map(
-                bq_result_list
-            )
+            docmap_by_manuscript_id_map=docmap_by_manuscript_id_map,
+            evaluation_text_by_evaluation_id_map=evaluation_text_by_evaluation_id_map,
+            quarantined_query_results=quarantined_query_results,
+            manuscript_id_indexes=manuscript_id_indexes,
+            manuscript_timestamp_indexes=manuscript_timestamp_indexes
         )
         end_time = monotonic()
+        estimated_size = estimate_deep_size(data)
         LOGGER.info(
-            'Prepared data from query results, approx_size=%.3fMB, time=%.3f seconds',
-            objsize.get_deep_size(data) / 1024 / 1024,
+            (
+                'Prepared data from query results, docmaps=%d, quarantined=%d,'
+                ' approx_size=%.3fMB, time=%.3f seconds'
+            ),
+            len(docmap_by_manuscript_id_map),
+            len(quarantined_query_results),
+            estimated_size / BYTES_PER_MB,
             (end_time - start_time)
         )
+        log_exact_deep_size_if_debug_enabled(LOGGER, data, 'prepared data')
+        check_memory_budget(self.memory_budget, estimated_size)
         return data
 
     def _get_data(self) -> DocmapsProviderData:
         return self._data_cache.get_or_load(load_fn=self._load_data)
 
-    def create_docmap_by_manuscript_id_map(
+    def preload(self) -> None:
+        self._get_data()
+
+    def refresh(self) -> int:
+        return self._data_cache.request_refresh(load_fn=self._load_data)
+
+    def create_docmap_and_evaluation_texts_list(
         self,
-        bq_results: Iterable[ApiInput]
-    ) -> Mapping[str, Docmap]:
-        return {
-            bq_result['manuscript_id']: get_docmap_item_for_query_result_item(
-                cast(ApiInput, bq_result)
+        bq_results: Sequence[ApiInput],
+        process_pool_mapper: ProcessPoolMapper
+    ) -> Sequence[Union[Tuple[Docmap, Mapping[str, str]], QuarantinedQueryResult]]:
+        if not self.quarantine_failed_query_results:
+            return process_pool_mapper.map(
+                get_docmap_and_evaluation_text_by_evaluation_id_for_query_result,
+                bq_results
             )
-            for bq_result in bq_results
-        }
+        return process_pool_mapper.map(
+            partial(
+                get_value_or_quarantined_query_result,
+                get_docmap_and_evaluation_text_by_evaluation_id_for_query_result
+            ),
+            bq_results
+        )
 
-    def create_evaluation_text_by_evaluation_id_map(
-        self,
-        bq_results: Iterable[ApiInput]
-    ) -> Mapping[str, str]:
-        evaluation_map = {}
-        for bq_result in bq_results:
-            manuscript_versions = bq_result['manuscript_versions']
-            for manuscript_version in manuscript_versions:
-                for evaluation_id, evaluation_text in iter_evaluation_id_and_text(
-                    manuscript_version
-                ):
-                    evaluation_map[evaluation_id] = evaluation_text
-        return evaluation_map
+    def get_quarantined_query_results(self) -> Sequence[QuarantinedQueryResult]:
+        return list(self._get_data().quarantined_query_results)
 
     def iter_docmaps_by_manuscript_id(
         self,
@@ -122,9 +201,80 @@ class DocmapsProvider:
     def get_docmaps_by_manuscript_id(self, manuscript_id: str) -> Sequence[Docmap]:
         return list(self.iter_docmaps_by_manuscript_id(manuscript_id))
 
-    def get_docmaps_index(self) -> dict:
-        article_docmaps_list = list(self.iter_docmaps_by_manuscript_id())
-        return {'docmaps': article_docmaps_list}
+    def get_docmaps_by_manuscript_ids_map(
+        self,
+        manuscript_ids: Iterable[str]
+    ) -> Mapping[str, Sequence[Docmap]]:
+        # only includes the manuscript ids with docmaps, all from the same generation
+        docmap_by_manuscript_id_map = self._get_data().docmap_by_manuscript_id_map
+        return {
+            manuscript_id: [docmap_by_manuscript_id_map[manuscript_id]]
+            for manuscript_id in manuscript_ids
+            if docmap_by_manuscript_id_map.get(manuscript_id)
+        }
+
+    def _get_docmaps_by_manuscript_ids(
+        self,
+        data: DocmapsProviderData,
+        manuscript_ids: Iterable[str]
+    ) -> Sequence[Docmap]:
+        return [
+            data.docmap_by_manuscript_id_map[manuscript_id]
+            for manuscript_id in manuscript_ids
+            if manuscript_id in data.docmap_by_manuscript_id_map
+        ]
+
+    def get_docmaps_by_elife_doi(self, elife_doi: str) -> Sequence[Docmap]:
+        data = self._get_data()
+        return self._get_docmaps_by_manuscript_ids(
+            data,
+            data.manuscript_id_indexes.get_manuscript_ids_by_elife_doi(elife_doi)
+        )
+
+    def get_docmaps_by_preprint_doi(self, preprint_doi: str) -> Sequence[Docmap]:
+        data = self._get_data()
+        return self._get_docmaps_by_manuscript_ids(
+            data,
+            data.manuscript_id_indexes.get_manuscript_ids_by_preprint_doi(preprint_doi)
+        )
+
+    def get_docmaps_by_long_manuscript_identifier(
+        self,
+        long_manuscript_identifier: str
+    ) -> Sequence[Docmap]:
+        data = self._get_data()
+        return self._get_docmaps_by_manuscript_ids(
+            data,
+            data.manuscript_id_indexes.get_manuscript_ids_by_long_manuscript_identifier(
+                long_manuscript_identifier
+            )
+        )
+
+    def get_docmaps_index(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        updated_since: Optional[datetime] = None
+    ) -> dict:
+        if limit is None and cursor is None and updated_since is None:
+            article_docmaps_list = list(self.iter_docmaps_by_manuscript_id())
+            return {'docmaps': article_docmaps_list}
+        data = self._get_data()
+        manuscript_ids = (
+            data.manuscript_timestamp_indexes.get_sorted_manuscript_ids_since(
+                updated_since=updated_since
+            )
+            if updated_since is not None
+            else data.sorted_manuscript_ids
+        )
+        page = get_key_page(manuscript_ids, limit=limit, cursor=cursor)
+        return {
+            'docmaps': [
+                data.docmap_by_manuscript_id_map[manuscript_id]
+                for manuscript_id in page.keys
+            ],
+            'next_cursor': page.next_cursor
+        }
 
     def get_evaluation_text_by_evaluation_id(self, evaluation_id: str) -> Optional[str]:
         assert evaluation_id
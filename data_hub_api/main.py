@@ -1,49 +1,297 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager
+from functools import partial
 import logging
+import os
+from time import monotonic
+from typing import Callable, Mapping, Optional
 
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
-from data_hub_api.config import ADDITIONAL_MANUSCRIPT_IDS
+from data_hub_api.admin.api_router import create_admin_router
+from data_hub_api.config import (
+    ADDITIONAL_MANUSCRIPT_IDS,
+    ADMIN_API_TOKEN,
+    CACHE_SNAPSHOT_DIR,
+    CACHE_WARM_UP_TIMEOUT_IN_SECONDS,
+    DOCMAP_GENERATION_CHUNK_SIZE,
+    DOCMAP_GENERATION_MIN_PARALLEL_ROW_COUNT,
+    DOCMAP_GENERATION_PROCESS_COUNT,
+    LAZY_DOCMAPS,
+    MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT,
+    MAX_CACHE_SNAPSHOT_AGE_IN_SECONDS,
+    MEMORY_BUDGET_IN_MB_BY_CACHE_NAME,
+    QUARANTINE_FAILED_QUERY_RESULTS,
+    QUERY_RESULT_BATCH_SIZE,
+    REFUSE_LOADS_EXCEEDING_MEMORY_BUDGET,
+    SHARED_CACHE_SNAPSHOT_DIR
+)
 from data_hub_api.docmaps.v1.api_router import create_docmaps_router as create_docmaps_router_v1
 from data_hub_api.docmaps.v2.api_router import create_docmaps_router
 from data_hub_api.kotahi_docmaps.v1.api_router import (
     create_docmaps_router as create_docmaps_router_for_kotahi
 )
 
-from data_hub_api.utils.cache import InMemorySingleObjectCache
-from data_hub_api.docmaps.v1.provider import DocmapsProviderV1
-from data_hub_api.docmaps.v2.provider import DocmapsProvider
+from data_hub_api.utils.bigquery import get_bq_table_last_modified_time
+from data_hub_api.utils.cache import (
+    InMemorySingleObjectCache,
+    MaxAgeRefreshPolicy,
+    RefreshPolicy,
+    SharedSnapshotFileSingleObjectCache,
+    SingleObjectCache,
+    SnapshotCodec,
+    SnapshotFileSingleObjectCache,
+    SourceLastModifiedRefreshPolicy
+)
+from data_hub_api.utils.cache_metrics import (
+    SingleObjectCacheMetrics,
+    SingleObjectCacheMetricsRegistry
+)
+from data_hub_api.utils.docmaps_provider_data import DocmapsProviderDataSnapshotCodec
+from data_hub_api.utils.memory import BYTES_PER_MB, MemoryBudget, estimate_deep_size
+from data_hub_api.utils.parallel import (
+    ParallelMapConfig,
+    warn_if_batch_size_limits_parallelism
+)
+from data_hub_api.docmaps.v1.provider import DocmapsDataSourceV1, DocmapsProviderV1
+from data_hub_api.docmaps.v2.provider import DOCMAPS_INDEX_TABLE_ID, DocmapsProvider
 from data_hub_api.kotahi_docmaps.v1.provider import DocmapsProvider as KotahiDocmapsProvider
 
 
 LOGGER = logging.getLogger(__name__)
 
 
-def create_app():
-    app = FastAPI()
+MAX_AGE_IN_SECONDS = 60 * 60  # 1 hour
+
+MIN_REFRESH_INTERVAL_IN_SECONDS = 5 * 60  # 5 minutes
+
+# spread reloads of the caches (and worker processes) over time
+MAX_AGE_JITTER_IN_SECONDS = 5 * 60  # 5 minutes
+REFRESH_STAGGER_INTERVAL_IN_SECONDS = 5 * 60  # 5 minutes
+
+
+def create_single_object_cache(
+    cache_name: str,
+    cache_metrics_registry: Optional[SingleObjectCacheMetricsRegistry] = None,
+    refresh_policy: Optional[RefreshPolicy] = None,
+    initial_refresh_offset_in_seconds: float = 0,
+    snapshot_codec: Optional[SnapshotCodec] = None
+) -> SingleObjectCache:
+    if cache_metrics_registry is not None:
+        metrics = cache_metrics_registry.create_metrics(
+            cache_name,
+            estimate_size_fn=estimate_deep_size
+        )
+    else:
+        metrics = SingleObjectCacheMetrics(cache_name)
+    if refresh_policy is None:
+        refresh_policy = MaxAgeRefreshPolicy(
+            max_age_in_seconds=MAX_AGE_IN_SECONDS,
+            max_jitter_in_seconds=MAX_AGE_JITTER_IN_SECONDS,
+            initial_offset_in_seconds=initial_refresh_offset_in_seconds
+        )
+    if SHARED_CACHE_SNAPSHOT_DIR:
+        return SharedSnapshotFileSingleObjectCache(
+            max_age_in_seconds=MAX_AGE_IN_SECONDS,
+            snapshot_path=os.path.join(SHARED_CACHE_SNAPSHOT_DIR, f'{cache_name}.snapshot'),
+            refresh_in_background=True,
+            refresh_policy=refresh_policy,
+            snapshot_codec=snapshot_codec,
+            metrics=metrics
+        )
+    if CACHE_SNAPSHOT_DIR:
+        return SnapshotFileSingleObjectCache(
+            max_age_in_seconds=MAX_AGE_IN_SECONDS,
+            snapshot_path=os.path.join(CACHE_SNAPSHOT_DIR, f'{cache_name}.pickle'),
+            max_snapshot_age_in_seconds=MAX_CACHE_SNAPSHOT_AGE_IN_SECONDS,
+            refresh_in_background=True,
+            refresh_policy=refresh_policy,
+            metrics=metrics
+        )
+    return InMemorySingleObjectCache(
+        max_age_in_seconds=MAX_AGE_IN_SECONDS,
+        refresh_in_background=True,
+        refresh_policy=refresh_policy,
+        metrics=metrics
+    )
+
+
+def create_memory_budget(cache_name: str) -> Optional[MemoryBudget]:
+    max_size_in_mb = MEMORY_BUDGET_IN_MB_BY_CACHE_NAME.get(cache_name)
+    if max_size_in_mb is None:
+        return None
+    return MemoryBudget(
+        name=cache_name,
+        max_size_in_bytes=max_size_in_mb * BYTES_PER_MB,
+        refuse_if_exceeded=REFUSE_LOADS_EXCEEDING_MEMORY_BUDGET
+    )
+
+
+def create_bq_table_last_modified_refresh_policy(
+    table_id: str,
+    initial_refresh_offset_in_seconds: float = 0
+) -> RefreshPolicy:
+    return SourceLastModifiedRefreshPolicy(
+        get_last_modified_time_fn=partial(
+            get_bq_table_last_modified_time,
+            project_name='elife-data-pipeline',
+            table_id=table_id
+        ),
+        min_refresh_interval_in_seconds=MIN_REFRESH_INTERVAL_IN_SECONDS,
+        max_refresh_interval_in_seconds=MAX_AGE_IN_SECONDS,
+        # the caches refresh in background, requests should not wait for BigQuery either
+        poll_in_background=True,
+        max_jitter_in_seconds=MAX_AGE_JITTER_IN_SECONDS,
+        initial_offset_in_seconds=initial_refresh_offset_in_seconds
+    )
+
 
-    max_age_in_seconds = 60 * 60  # 1 hour
+def _preload_and_log_time(name: str, preload_fn: Callable[[], None]) -> None:
+    start_time = monotonic()
+    try:
+        preload_fn()
+    except Exception:
+        LOGGER.exception(
+            'Failed to warm up cache: %r, time=%.3f seconds',
+            name,
+            (monotonic() - start_time)
+        )
+        raise
+    LOGGER.info(
+        'Warmed up cache: %r, time=%.3f seconds',
+        name,
+        (monotonic() - start_time)
+    )
+
+
+def warm_up_caches(
+    preload_fn_by_name: Mapping[str, Callable[[], None]],
+    timeout_in_seconds: float
+) -> bool:
+    LOGGER.info('Warming up caches: %r', list(preload_fn_by_name.keys()))
+    start_time = monotonic()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, len(preload_fn_by_name)),
+        thread_name_prefix='cache-warm-up'
+    )
+    try:
+        futures = [
+            executor.submit(_preload_and_log_time, name, preload_fn)
+            for name, preload_fn in preload_fn_by_name.items()
+        ]
+        done, not_done = wait(futures, timeout=timeout_in_seconds)
+    finally:
+        # don't wait for timed out loads, they will still populate the caches once complete
+        executor.shutdown(wait=False)
+    failed_count = sum(1 for future in done if future.exception() is not None)
+    if not_done:
+        LOGGER.warning(
+            'Cache warm up timed out, pending=%d, failed=%d, time=%.3f seconds',
+            len(not_done),
+            failed_count,
+            (monotonic() - start_time)
+        )
+        return False
+    LOGGER.info(
+        'Cache warm up complete, failed=%d, time=%.3f seconds',
+        failed_count,
+        (monotonic() - start_time)
+    )
+    return failed_count == 0
+
+
+def create_app():  # pylint: disable=too-many-locals
+    cache_metrics_registry = SingleObjectCacheMetricsRegistry()
+
+    docmap_generation_parallel_map_config = ParallelMapConfig(
+        process_count=DOCMAP_GENERATION_PROCESS_COUNT,
+        chunk_size=DOCMAP_GENERATION_CHUNK_SIZE,
+        min_parallel_item_count=DOCMAP_GENERATION_MIN_PARALLEL_ROW_COUNT
+    )
+    warn_if_batch_size_limits_parallelism(
+        docmap_generation_parallel_map_config,
+        batch_size=QUERY_RESULT_BATCH_SIZE
+    )
+
+    # the enhanced preprints and public reviews v1 docmaps are loaded with a single query
+    docmaps_data_source_v1 = DocmapsDataSourceV1(
+        data_cache=create_single_object_cache(
+            'docmaps_v1',
+            cache_metrics_registry=cache_metrics_registry,
+            initial_refresh_offset_in_seconds=0
+        ),
+        memory_budget=create_memory_budget('docmaps_v1'),
+        lazy_docmaps=LAZY_DOCMAPS,
+        parallel_map_config=docmap_generation_parallel_map_config,
+        query_result_batch_size=QUERY_RESULT_BATCH_SIZE,
+        quarantine_failed_query_results=QUARANTINE_FAILED_QUERY_RESULTS
+    )
 
     enhanced_preprints_docmaps_provider_v1 = DocmapsProviderV1(
         only_include_reviewed_preprint_type=True,
         only_include_evaluated_preprints=False,
         additionally_include_manuscript_ids=ADDITIONAL_MANUSCRIPT_IDS,
-        query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=max_age_in_seconds)
+        data_source=docmaps_data_source_v1
     )
 
     enhanced_preprints_docmaps_provider = DocmapsProvider(
-        query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=max_age_in_seconds)
+        query_results_cache=create_single_object_cache(
+            'enhanced_preprints_docmaps_v2',
+            cache_metrics_registry=cache_metrics_registry,
+            refresh_policy=create_bq_table_last_modified_refresh_policy(
+                DOCMAPS_INDEX_TABLE_ID,
+                initial_refresh_offset_in_seconds=2 * REFRESH_STAGGER_INTERVAL_IN_SECONDS
+            ),
+            # the docmaps JSON of a shared snapshot is memory mapped, rather than copied
+            snapshot_codec=DocmapsProviderDataSnapshotCodec()
+        ),
+        memory_budget=create_memory_budget('enhanced_preprints_docmaps_v2'),
+        lazy_docmaps=LAZY_DOCMAPS,
+        parallel_map_config=docmap_generation_parallel_map_config,
+        query_result_batch_size=QUERY_RESULT_BATCH_SIZE,
+        quarantine_failed_query_results=QUARANTINE_FAILED_QUERY_RESULTS
     )
 
     kotahi_docmaps_provider = KotahiDocmapsProvider(
-        data_cache=InMemorySingleObjectCache(max_age_in_seconds=max_age_in_seconds)
+        data_cache=create_single_object_cache(
+            'kotahi_docmaps_v1',
+            cache_metrics_registry=cache_metrics_registry,
+            initial_refresh_offset_in_seconds=REFRESH_STAGGER_INTERVAL_IN_SECONDS
+        ),
+        memory_budget=create_memory_budget('kotahi_docmaps_v1'),
+        parallel_map_config=docmap_generation_parallel_map_config,
+        query_result_batch_size=QUERY_RESULT_BATCH_SIZE,
+        quarantine_failed_query_results=QUARANTINE_FAILED_QUERY_RESULTS
     )
 
     public_reviews_docmaps_provider = DocmapsProviderV1(
         only_include_reviewed_preprint_type=False,
         only_include_evaluated_preprints=True,
-        query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=max_age_in_seconds)
+        data_source=docmaps_data_source_v1
     )
 
+    provider_by_name = {
+        'enhanced_preprints_docmaps_v1': enhanced_preprints_docmaps_provider_v1,
+        'enhanced_preprints_docmaps_v2': enhanced_preprints_docmaps_provider,
+        'kotahi_docmaps_v1': kotahi_docmaps_provider,
+        'public_reviews_docmaps_v1': public_reviews_docmaps_provider
+    }
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI):
+        await asyncio.to_thread(
+            warm_up_caches,
+            preload_fn_by_name={
+                name: provider.preload
+                for name, provider in provider_by_name.items()
+            },
+            timeout_in_seconds=CACHE_WARM_UP_TIMEOUT_IN_SECONDS
+        )
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+
     @app.get("/")
     def get_root():
         with open("data_hub_api/index.html", "r", encoding='utf-8') as file:
@@ -52,30 +300,54 @@ def create_app():
 
     app.include_router(
         create_docmaps_router_v1(
-            enhanced_preprints_docmaps_provider_v1
+            enhanced_preprints_docmaps_provider_v1,
+            max_bulk_lookup_manuscript_id_count=MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
         ),
         prefix='/enhanced-preprints/docmaps'
     )
 
     app.include_router(
         create_docmaps_router(
-            enhanced_preprints_docmaps_provider
+            enhanced_preprints_docmaps_provider,
+            max_bulk_lookup_manuscript_id_count=MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
         ),
         prefix='/enhanced-preprints/docmaps'
     )
 
     app.include_router(
         create_docmaps_router_for_kotahi(
-            kotahi_docmaps_provider
+            kotahi_docmaps_provider,
+            max_bulk_lookup_manuscript_id_count=MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
         ),
         prefix='/kotahi/docmaps'
     )
 
     app.include_router(
         create_docmaps_router_v1(
-            public_reviews_docmaps_provider
+            public_reviews_docmaps_provider,
+            max_bulk_lookup_manuscript_id_count=MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
         ),
         prefix='/public-reviews/docmaps'
     )
 
+    app.include_router(
+        create_admin_router(
+            cache_metrics_registry,
+            refresh_fn_by_name={
+                **{
+                    name: provider.refresh
+                    for name, provider in provider_by_name.items()
+                },
+                'enhanced_preprints_docmaps_v1': docmaps_data_source_v1.refresh,
+                'public_reviews_docmaps_v1': docmaps_data_source_v1.refresh
+            },
+            quarantined_query_results_fn_by_name={
+                name: provider.get_quarantined_query_results
+                for name, provider in provider_by_name.items()
+            },
+            admin_api_token=ADMIN_API_TOKEN
+        ),
+        prefix='/admin'
+    )
+
     return app
@@ -1,3 +1,4 @@
+from datetime import datetime
 import logging
 from typing import Any, Iterable, Optional, Sequence
 
@@ -11,6 +12,15 @@ def get_bq_client(project_name: str) -> bigquery.Client:
     return bigquery.Client(project=project_name)
 
 
+def get_bq_table_last_modified_time(
+    project_name: str,
+    table_id: str
+) -> Optional[datetime]:
+    client = get_bq_client(project_name=project_name)
+    table = client.get_table(table_id)  # Only fetches the table metadata
+    return table.modified
+
+
 def get_bq_result_from_bq_query(
     project_name: str,
     query: str,
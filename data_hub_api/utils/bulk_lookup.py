@@ -0,0 +1,37 @@
+from typing import Any, Callable, List, Mapping, Sequence
+
+from fastapi import HTTPException
+
+
+DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT = 1000
+
+
+def get_unique_manuscript_ids(manuscript_ids: Sequence[str]) -> List[str]:
+    # preserves the requested order
+    return list(dict.fromkeys(manuscript_ids))
+
+
+def get_bulk_lookup_response_or_raise_http_exception(
+    manuscript_ids: Sequence[str],
+    docmaps_by_manuscript_ids_fn: Callable[[Sequence[str]], Mapping[str, Sequence[Any]]],
+    max_manuscript_id_count: int = DEFAULT_MAX_BULK_LOOKUP_MANUSCRIPT_ID_COUNT
+) -> dict:
+    unique_manuscript_ids = get_unique_manuscript_ids(manuscript_ids)
+    if len(unique_manuscript_ids) > max_manuscript_id_count:
+        raise HTTPException(
+            status_code=400,
+            detail=f'Too many manuscript ids requested (max: {max_manuscript_id_count})'
+        )
+    docmaps_by_manuscript_id = docmaps_by_manuscript_ids_fn(unique_manuscript_ids)
+    return {
+        'docmaps': [
+            docmap
+            for manuscript_id in unique_manuscript_ids
+            for docmap in docmaps_by_manuscript_id.get(manuscript_id, [])
+        ],
+        'missing_manuscript_ids': [
+            manuscript_id
+            for manuscript_id in unique_manuscript_ids
+            if not docmaps_by_manuscript_id.get(manuscript_id)
+        ]
+    }
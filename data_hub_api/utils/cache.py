@@ -1,45 +1,1048 @@
-from time import monotonic
-from threading import Lock
-from typing import Callable, Optional,  Protocol, TypeVar
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+import fcntl
+import itertools
+import logging
+import math
+import os
+from pathlib import Path
+import pickle
+import random
+import struct
+from time import monotonic, time, time_ns
+from threading import Lock, Thread
+from typing import (
+    Any, BinaryIO, Callable, Dict, Generic, Iterator, List, Mapping, Optional, Protocol,
+    Sequence, TypeVar, Union
+)
+
+from data_hub_api.utils.cache_metrics import SingleObjectCacheMetrics
+from data_hub_api.utils.json import get_json_content_hash
+from data_hub_api.utils.parallel import map_serially
+
+
+LOGGER = logging.getLogger(__name__)
 
 
 T = TypeVar('T')
 
 
+@dataclass(frozen=True)
+class SingleObjectCacheEntry(Generic[T]):
+    value: T
+    last_updated_time: float
+    generation: int = 0
+
+
+@dataclass(frozen=True)
+class SingleObjectCacheLoadFailure:
+    error: BaseException
+    failure_time: float
+    failure_count: int
+    next_retry_time: float
+
+
+class RefreshPolicy(Protocol):
+    def on_load_started(self) -> None:
+        pass
+
+    def is_refresh_required(self, last_updated_time: float, now: float) -> bool:
+        pass
+
+
+class MaxAgeRefreshPolicy(RefreshPolicy):
+    """
+    Refreshes once the max age is reached. Each load adds a random jitter of up to
+    max_jitter_in_seconds, and the initial_offset_in_seconds is added after the first load only.
+    Together they spread the reloads of multiple caches and worker processes over time.
+    """
+    def __init__(
+        self,
+        max_age_in_seconds: float,
+        max_jitter_in_seconds: float = 0,
+        initial_offset_in_seconds: float = 0
+    ) -> None:
+        self.max_age_in_seconds = max_age_in_seconds
+        self.max_jitter_in_seconds = max_jitter_in_seconds
+        self.initial_offset_in_seconds = initial_offset_in_seconds
+        self._current_max_age_in_seconds = max_age_in_seconds
+        self._load_count = 0
+
+    def on_load_started(self) -> None:
+        current_max_age_in_seconds = self.max_age_in_seconds
+        if self._load_count == 0:
+            current_max_age_in_seconds += self.initial_offset_in_seconds
+        if self.max_jitter_in_seconds:
+            current_max_age_in_seconds += random.uniform(0, self.max_jitter_in_seconds)
+        self._current_max_age_in_seconds = current_max_age_in_seconds
+        self._load_count += 1
+
+    def is_refresh_required(self, last_updated_time: float, now: float) -> bool:
+        return now - last_updated_time > self._current_max_age_in_seconds
+
+
+# pylint: disable-next=too-many-instance-attributes
+class SourceLastModifiedRefreshPolicy(RefreshPolicy):
+    """
+    Refreshes only once the last modified time of the source (e.g. a BigQuery table) advanced.
+    The source is polled at most every min_refresh_interval_in_seconds,
+    and a refresh is always required after max_refresh_interval_in_seconds.
+    With poll_in_background, the source is polled in a background thread (rather than by
+    the request checking the cache), and a refresh is required once that poll completed.
+    Like with the MaxAgeRefreshPolicy, a random jitter of up to max_jitter_in_seconds is added
+    to both intervals, and the initial_offset_in_seconds to the max interval after the first load.
+    """
+    def __init__(  # pylint: disable=too-many-positional-arguments
+        self,
+        get_last_modified_time_fn: Callable[[], Optional[datetime]],
+        min_refresh_interval_in_seconds: float,
+        max_refresh_interval_in_seconds: float,
+        poll_in_background: bool = False,
+        max_jitter_in_seconds: float = 0,
+        initial_offset_in_seconds: float = 0
+    ) -> None:
+        assert min_refresh_interval_in_seconds <= max_refresh_interval_in_seconds
+        self.get_last_modified_time_fn = get_last_modified_time_fn
+        self.min_refresh_interval_in_seconds = min_refresh_interval_in_seconds
+        self.max_refresh_interval_in_seconds = max_refresh_interval_in_seconds
+        self.poll_in_background = poll_in_background
+        self.max_jitter_in_seconds = max_jitter_in_seconds
+        self.initial_offset_in_seconds = initial_offset_in_seconds
+        self._current_min_refresh_interval_in_seconds = min_refresh_interval_in_seconds
+        self._current_max_refresh_interval_in_seconds = max_refresh_interval_in_seconds
+        self._load_count = 0
+        self._poll_lock = Lock()
+        self._poll_thread: Optional[Thread] = None
+        self._last_polled_time: Optional[float] = None
+        self._loaded_last_modified_time: Optional[datetime] = None
+        self._is_source_modified_by_background_poll = False
+
+    def _get_last_modified_time_or_none(self) -> Optional[datetime]:
+        try:
+            return self.get_last_modified_time_fn()
+        except Exception:  # pylint: disable=broad-exception-caught
+            LOGGER.warning('Failed to get last modified time of source', exc_info=True)
+            return None
+
+    def _get_jitter_in_seconds(self) -> float:
+        if not self.max_jitter_in_seconds:
+            return 0
+        return random.uniform(0, self.max_jitter_in_seconds)
+
+    def on_load_started(self) -> None:
+        current_max_refresh_interval_in_seconds = self.max_refresh_interval_in_seconds
+        if self._load_count == 0:
+            current_max_refresh_interval_in_seconds += self.initial_offset_in_seconds
+        self._current_max_refresh_interval_in_seconds = (
+            current_max_refresh_interval_in_seconds + self._get_jitter_in_seconds()
+        )
+        self._current_min_refresh_interval_in_seconds = (
+            self.min_refresh_interval_in_seconds + self._get_jitter_in_seconds()
+        )
+        self._load_count += 1
+        self._is_source_modified_by_background_poll = False
+        self._loaded_last_modified_time = self._get_last_modified_time_or_none()
+
+    def _poll_source(self) -> bool:
+        last_modified_time = self._get_last_modified_time_or_none()
+        LOGGER.debug(
+            'Source last modified time: %r (loaded: %r)',
+            last_modified_time,
+            self._loaded_last_modified_time
+        )
+        if last_modified_time is None:
+            return False
+        return (
+            self._loaded_last_modified_time is None
+            or last_modified_time > self._loaded_last_modified_time
+        )
+
+    def _poll_source_in_background(self) -> None:
+        try:
+            if self._poll_source():
+                self._is_source_modified_by_background_poll = True
+        finally:
+            self._poll_lock.release()
+
+    def _start_background_poll(self) -> None:
+        self._poll_thread = Thread(
+            target=self._poll_source_in_background,
+            name='source-last-modified-poll',
+            daemon=True
+        )
+        self._poll_thread.start()
+
+    def _is_source_modified(self, now: float) -> bool:
+        if not self._poll_lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            # another thread is already polling the source
+            return self._is_source_modified_by_background_poll
+        is_polling_in_background = False
+        try:
+            if (
+                self._last_polled_time is not None
+                and now - self._last_polled_time < self._current_min_refresh_interval_in_seconds
+            ):
+                return self._is_source_modified_by_background_poll
+            self._last_polled_time = now
+            # the next poll is jittered as well, to spread the polls of the worker processes
+            self._current_min_refresh_interval_in_seconds = (
+                self.min_refresh_interval_in_seconds + self._get_jitter_in_seconds()
+            )
+            if self.poll_in_background:
+                # the lock is released by the background poll once it completed
+                self._start_background_poll()
+                is_polling_in_background = True
+                return self._is_source_modified_by_background_poll
+            return self._poll_source()
+        finally:
+            if not is_polling_in_background:
+                self._poll_lock.release()
+
+    def is_refresh_required(self, last_updated_time: float, now: float) -> bool:
+        age = now - last_updated_time
+        if age < self._current_min_refresh_interval_in_seconds:
+            return False
+        if age > self._current_max_refresh_interval_in_seconds:
+            return True
+        return self._is_source_modified(now)
+
+
 class SingleObjectCache(Protocol[T]):
     def get_or_load(self, load_fn: Callable[[], T]) -> T:
         pass
 
+    def request_refresh(self, load_fn: Callable[[], T]) -> int:
+        pass
+
 
 class DummySingleObjectCache(SingleObjectCache[T]):
     def get_or_load(self, load_fn: Callable[[], T]) -> T:
         return load_fn()
 
+    def request_refresh(self, load_fn: Callable[[], T]) -> int:
+        # nothing is cached, the next request will load the value anyway
+        return 0
 
-class InMemorySingleObjectCache(SingleObjectCache[T]):
+
+class ExponentialBackoff:
     def __init__(
         self,
-        max_age_in_seconds: float
+        min_delay_in_seconds: float = 1,
+        max_delay_in_seconds: float = 5 * 60
+    ) -> None:
+        self.min_delay_in_seconds = min_delay_in_seconds
+        self.max_delay_in_seconds = max_delay_in_seconds
+
+    def get_delay_in_seconds(self, failure_count: int) -> float:
+        # with jitter, to avoid all instances retrying at the same time
+        delay = min(
+            self.max_delay_in_seconds,
+            self.min_delay_in_seconds * (2 ** (failure_count - 1))
+        )
+        return random.uniform(delay / 2, delay)
+
+
+# pylint: disable-next=too-many-instance-attributes
+class InMemorySingleObjectCache(SingleObjectCache[T]):
+    def __init__(  # pylint: disable=too-many-positional-arguments
+        self,
+        max_age_in_seconds: float,
+        refresh_in_background: bool = False,
+        refresh_policy: Optional[RefreshPolicy] = None,
+        retry_backoff: Optional[ExponentialBackoff] = None,
+        metrics: Optional[SingleObjectCacheMetrics] = None
     ) -> None:
         self.max_age_in_seconds = max_age_in_seconds
+        self.refresh_in_background = refresh_in_background
+        if refresh_policy is None:
+            refresh_policy = MaxAgeRefreshPolicy(max_age_in_seconds=max_age_in_seconds)
+        self.refresh_policy = refresh_policy
+        if retry_backoff is None:
+            retry_backoff = ExponentialBackoff()
+        self.retry_backoff = retry_backoff
+        if metrics is None:
+            metrics = SingleObjectCacheMetrics(name=type(self).__name__)
+        self.metrics = metrics
+        self.last_load_failure: Optional[SingleObjectCacheLoadFailure] = None
         self._lock = Lock()
-        self._value: Optional[T] = None
-        self._last_updated_time: Optional[float] = None
+        # the entry is only ever replaced as a whole, which allows reading it without the lock
+        self._entry: Optional[SingleObjectCacheEntry[T]] = None
+        self._generation_counter = itertools.count(1)
+        self._refresh_lock = Lock()
+        self._refresh_thread: Optional[Thread] = None
+        self._refresh_generation: Optional[int] = None
+        self._pending_refresh_generation: Optional[int] = None
 
-    def _is_max_age_reached(self, now: float) -> bool:
-        return bool(
-            self._last_updated_time is not None
-            and (now - self._last_updated_time > self.max_age_in_seconds)
+    @property
+    def name(self) -> str:
+        return self.metrics.name
+
+    @property
+    def generation(self) -> int:
+        entry = self._entry
+        return entry.generation if entry is not None else 0
+
+    @property
+    def last_error(self) -> Optional[BaseException]:
+        load_failure = self.last_load_failure
+        return load_failure.error if load_failure is not None else None
+
+    def get_last_error_age_in_seconds(self) -> Optional[float]:
+        load_failure = self.last_load_failure
+        if load_failure is None:
+            return None
+        return monotonic() - load_failure.failure_time
+
+    def _get_current_load_failure(self) -> Optional[SingleObjectCacheLoadFailure]:
+        # a load failure is only current if there was no successful load since
+        load_failure = self.last_load_failure
+        entry = self._entry
+        if load_failure is None:
+            return None
+        if entry is not None and entry.last_updated_time >= load_failure.failure_time:
+            return None
+        return load_failure
+
+    def _is_retry_delay_active(self, now: float) -> bool:
+        load_failure = self._get_current_load_failure()
+        return load_failure is not None and now < load_failure.next_retry_time
+
+    def _is_refresh_required(self, entry: SingleObjectCacheEntry[T], now: float) -> bool:
+        if self._is_retry_delay_active(now):
+            return False
+        return self.refresh_policy.is_refresh_required(entry.last_updated_time, now)
+
+    def _on_load_failed(self, error: BaseException) -> None:
+        now = monotonic()
+        previous_load_failure = self._get_current_load_failure()
+        failure_count = (
+            previous_load_failure.failure_count + 1 if previous_load_failure is not None else 1
+        )
+        retry_delay = self.retry_backoff.get_delay_in_seconds(failure_count)
+        self.last_load_failure = SingleObjectCacheLoadFailure(
+            error=error,
+            failure_time=now,
+            failure_count=failure_count,
+            next_retry_time=now + retry_delay
+        )
+        self.metrics.record_load_failure(error)
+        LOGGER.warning(
+            'Failed to load value for cache %r (failure_count=%d), retrying in %.3f seconds: %r',
+            self.name,
+            failure_count,
+            retry_delay,
+            error,
+            exc_info=True
         )
 
-    def get_or_load(self, load_fn: Callable[[], T]) -> T:
-        with self._lock:
-            now = monotonic()
-            result = self._value
-            if result is not None and not self._is_max_age_reached(now):
-                return result
+    def _load(
+        self,
+        load_fn: Callable[[], T],
+        now: float,
+        generation: Optional[int] = None
+    ) -> T:
+        if generation is None:
+            generation = next(self._generation_counter)
+        self.refresh_policy.on_load_started()
+        try:
             result = load_fn()
             assert result is not None
-            self._value = result
-            self._last_updated_time = now
-            return result
+        except Exception as exc:
+            self._on_load_failed(exc)
+            raise
+        self._entry = SingleObjectCacheEntry(
+            value=result,
+            last_updated_time=now,
+            generation=generation
+        )
+        self.metrics.record_load(result, duration_in_seconds=monotonic() - now)
+        return result
+
+    def _is_refreshing(self) -> bool:
+        return self._refresh_generation is not None
+
+    def _refresh(self, load_fn: Callable[[], T], generation: int) -> None:
+        while True:
+            try:
+                self._load(load_fn, now=monotonic(), generation=generation)
+            except Exception:  # pylint: disable=broad-exception-caught
+                LOGGER.info(
+                    'Keeping stale value of cache %r after failed background refresh',
+                    self.name
+                )
+            with self._refresh_lock:
+                if self._pending_refresh_generation is None:
+                    self._refresh_generation = None
+                    return
+                generation = self._pending_refresh_generation
+                self._pending_refresh_generation = None
+                self._refresh_generation = generation
+            LOGGER.info(
+                'Running requested refresh of cache %r, generation=%d',
+                self.name,
+                generation
+            )
+
+    def _start_background_refresh(
+        self,
+        load_fn: Callable[[], T],
+        is_requested: bool = False
+    ) -> int:
+        with self._refresh_lock:
+            if self._refresh_generation is not None:
+                if not is_requested:
+                    return self._refresh_generation
+                # the running refresh may have started before the request,
+                # all requests made in the meantime share a single follow-up refresh
+                if self._pending_refresh_generation is None:
+                    self._pending_refresh_generation = next(self._generation_counter)
+                return self._pending_refresh_generation
+            generation = next(self._generation_counter)
+            self._refresh_generation = generation
+            LOGGER.info('Refreshing cache %r in background, generation=%d', self.name, generation)
+            self._refresh_thread = Thread(
+                target=self._refresh,
+                args=(load_fn, generation),
+                name=f'cache-refresh-{self.name}',
+                daemon=True
+            )
+            self._refresh_thread.start()
+            return generation
+
+    def request_refresh(self, load_fn: Callable[[], T]) -> int:
+        """
+        Reloads the value in the background, while the current value keeps being served.
+        Returns the generation that will contain the reloaded value.
+        """
+        return self._start_background_refresh(load_fn, is_requested=True)
+
+    def _get_or_load_with_lock(
+        self,
+        load_fn: Callable[[], T],
+        expired_entry: Optional[SingleObjectCacheEntry[T]]
+    ) -> T:
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry is not expired_entry:
+                # loaded by another thread while waiting for the lock
+                self.metrics.record_miss()
+                return entry.value
+            if entry is not None and self.refresh_in_background:
+                self._start_background_refresh(load_fn)
+                self.metrics.record_hit()
+                return entry.value
+            self.metrics.record_miss()
+            now = monotonic()
+            if entry is None and self._is_retry_delay_active(now):
+                raise RuntimeError(
+                    'Failed to load value, retrying after delay'
+                ) from self.last_error
+            try:
+                return self._load(load_fn, now=now)
+            except Exception:  # pylint: disable=broad-exception-caught
+                if entry is None:
+                    raise
+                LOGGER.info('Returning stale value of cache %r after failed load', self.name)
+                return entry.value
+
+    def get_or_load(self, load_fn: Callable[[], T]) -> T:
+        entry = self._entry
+        if entry is not None:
+            if (
+                not self._is_refresh_required(entry, monotonic())
+                or (self.refresh_in_background and self._is_refreshing())
+            ):
+                self.metrics.record_hit()
+                return entry.value
+        return self._get_or_load_with_lock(load_fn, expired_entry=entry)
+
+
+class SnapshotFileSingleObjectCache(InMemorySingleObjectCache[T]):
+    """
+    In-memory cache that additionally persists each loaded value to a local snapshot file.
+    When the cache is still empty (e.g. after a restart), a snapshot that is not older than
+    max_snapshot_age_in_seconds is served while the value is reloaded in the background.
+    """
+    def __init__(  # pylint: disable=too-many-positional-arguments
+        self,
+        max_age_in_seconds: float,
+        snapshot_path: Union[str, Path],
+        max_snapshot_age_in_seconds: float,
+        refresh_in_background: bool = False,
+        refresh_policy: Optional[RefreshPolicy] = None,
+        metrics: Optional[SingleObjectCacheMetrics] = None
+    ) -> None:
+        super().__init__(
+            max_age_in_seconds=max_age_in_seconds,
+            refresh_in_background=refresh_in_background,
+            refresh_policy=refresh_policy,
+            metrics=metrics
+        )
+        self.snapshot_path = Path(snapshot_path)
+        self.max_snapshot_age_in_seconds = max_snapshot_age_in_seconds
+        self._is_snapshot_checked = False
+
+    def _save_snapshot(self, value: T) -> None:
+        start_time = monotonic()
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_snapshot_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        with temp_snapshot_path.open('wb') as snapshot_file:
+            pickle.dump(value, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_snapshot_path, self.snapshot_path)
+        end_time = monotonic()
+        LOGGER.info(
+            'Saved cache snapshot: %r, size=%.3fMB, time=%.3f seconds',
+            str(self.snapshot_path),
+            self.snapshot_path.stat().st_size / 1024 / 1024,
+            (end_time - start_time)
+        )
+
+    def _load_and_save_snapshot(self, load_fn: Callable[[], T]) -> T:
+        value = load_fn()
+        try:
+            self._save_snapshot(value)
+        except OSError:
+            LOGGER.exception('Failed to save cache snapshot: %r', str(self.snapshot_path))
+        return value
+
+    def _get_snapshot_age_in_seconds(self) -> Optional[float]:
+        try:
+            return time() - self.snapshot_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _load_snapshot(self) -> Optional[T]:
+        snapshot_age = self._get_snapshot_age_in_seconds()
+        if snapshot_age is None:
+            LOGGER.info('No cache snapshot found: %r', str(self.snapshot_path))
+            return None
+        if snapshot_age > self.max_snapshot_age_in_seconds:
+            LOGGER.info(
+                'Ignoring cache snapshot: %r, age=%.3f seconds',
+                str(self.snapshot_path),
+                snapshot_age
+            )
+            return None
+        start_time = monotonic()
+        try:
+            with self.snapshot_path.open('rb') as snapshot_file:
+                value = pickle.load(snapshot_file)
+        except Exception:  # pylint: disable=broad-exception-caught
+            LOGGER.exception('Failed to load cache snapshot: %r', str(self.snapshot_path))
+            return None
+        end_time = monotonic()
+        LOGGER.info(
+            'Loaded cache snapshot: %r, age=%.3f seconds, time=%.3f seconds',
+            str(self.snapshot_path),
+            snapshot_age,
+            (end_time - start_time)
+        )
+        return value
+
+    def _get_or_load_snapshot(self, load_fn: Callable[[], T]) -> Optional[T]:
+        with self._lock:
+            if self._is_snapshot_checked:
+                return None
+            self._is_snapshot_checked = True
+            if self._entry is not None:
+                return None
+            value = self._load_snapshot()
+            if value is None:
+                return None
+            self.metrics.record_miss()
+            self._entry = SingleObjectCacheEntry(
+                value=value,
+                last_updated_time=monotonic(),
+                generation=next(self._generation_counter)
+            )
+            self._start_background_refresh(load_fn)
+            return value
+
+    def get_or_load(self, load_fn: Callable[[], T]) -> T:
+        def load_and_save_snapshot_fn() -> T:
+            return self._load_and_save_snapshot(load_fn)
+
+        if not self._is_snapshot_checked:
+            value = self._get_or_load_snapshot(load_and_save_snapshot_fn)
+            if value is not None:
+                return value
+        return super().get_or_load(load_and_save_snapshot_fn)
+
+    def request_refresh(self, load_fn: Callable[[], T]) -> int:
+        return super().request_refresh(lambda: self._load_and_save_snapshot(load_fn))
+
+
+SHARED_SNAPSHOT_HEADER_FORMAT = '>4sQ'
+SHARED_SNAPSHOT_MAGIC = b'DHSS'
+SHARED_SNAPSHOT_HEADER_SIZE = struct.calcsize(SHARED_SNAPSHOT_HEADER_FORMAT)
+
+
+class SnapshotCodec(Protocol[T]):
+    def write(self, value: T, snapshot_file: BinaryIO) -> None:
+        pass
+
+    def read(self, snapshot_file: BinaryIO) -> T:
+        pass
+
+
+class PickleSnapshotCodec(SnapshotCodec[T]):
+    # each process reading the snapshot holds its own copy of the value
+    def write(self, value: T, snapshot_file: BinaryIO) -> None:
+        pickle.dump(value, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def read(self, snapshot_file: BinaryIO) -> T:
+        return pickle.load(snapshot_file)
+
+
+# pylint: disable-next=too-many-instance-attributes
+class SharedSnapshotFileSingleObjectCache(InMemorySingleObjectCache[T]):
+    """
+    Cache shared by multiple processes (e.g. uvicorn workers) via a generation-stamped
+    snapshot file. Only the process holding the file lock calls the load function,
+    other processes read the snapshot once a new generation appears.
+    Every poll_interval_in_seconds the generation of the snapshot is checked, the in-memory
+    value is only replaced once the generation changed or expired, or once the refresh policy
+    requires a refresh (e.g. because the source changed). Each process checks the refresh
+    policy itself, the first one to acquire the file lock reloads the value for all of them.
+    The snapshot_codec determines how the value is stored, the process writing the snapshot
+    serves the value read back from it, like the other processes.
+    """
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        max_age_in_seconds: float,
+        snapshot_path: Union[str, Path],
+        poll_interval_in_seconds: float = 10,
+        refresh_in_background: bool = False,
+        refresh_policy: Optional[RefreshPolicy] = None,
+        snapshot_codec: Optional[SnapshotCodec[T]] = None,
+        metrics: Optional[SingleObjectCacheMetrics] = None
+    ) -> None:
+        super().__init__(
+            max_age_in_seconds=max_age_in_seconds,
+            refresh_in_background=refresh_in_background,
+            refresh_policy=refresh_policy,
+            metrics=metrics
+        )
+        self.max_snapshot_age_in_seconds = max_age_in_seconds
+        self.poll_interval_in_seconds = poll_interval_in_seconds
+        self.snapshot_path = Path(snapshot_path)
+        self.lock_path = self.snapshot_path.with_name(self.snapshot_path.name + '.lock')
+        if snapshot_codec is None:
+            snapshot_codec = PickleSnapshotCodec[T]()
+        self.snapshot_codec = snapshot_codec
+        self.snapshot_generation: Optional[int] = None
+        self._last_polled_time: Optional[float] = None
+        self._is_source_refresh_required = False
+
+    @contextmanager
+    def _file_lock(self, blocking: bool) -> Iterator[bool]:
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open('ab') as lock_file:
+            try:
+                fcntl.flock(
+                    lock_file.fileno(),
+                    fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                )
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_snapshot_generation(self) -> Optional[int]:
+        try:
+            with self.snapshot_path.open('rb') as snapshot_file:
+                header = snapshot_file.read(SHARED_SNAPSHOT_HEADER_SIZE)
+        except FileNotFoundError:
+            return None
+        if len(header) < SHARED_SNAPSHOT_HEADER_SIZE:
+            return None
+        magic, generation = struct.unpack(SHARED_SNAPSHOT_HEADER_FORMAT, header)
+        if magic != SHARED_SNAPSHOT_MAGIC:
+            return None
+        return generation
+
+    def _is_generation_expired(self, generation: int) -> bool:
+        return time() - generation / 1_000_000_000 > self.max_snapshot_age_in_seconds
+
+    def _read_snapshot(self) -> T:
+        start_time = monotonic()
+        with self.snapshot_path.open('rb') as snapshot_file:
+            magic, generation = struct.unpack(
+                SHARED_SNAPSHOT_HEADER_FORMAT,
+                snapshot_file.read(SHARED_SNAPSHOT_HEADER_SIZE)
+            )
+            assert magic == SHARED_SNAPSHOT_MAGIC
+            value = self.snapshot_codec.read(snapshot_file)
+        self.snapshot_generation = generation
+        end_time = monotonic()
+        LOGGER.info(
+            'Loaded shared cache snapshot: %r, generation=%d, time=%.3f seconds',
+            str(self.snapshot_path),
+            generation,
+            (end_time - start_time)
+        )
+        return value
+
+    def _write_snapshot(self, value: T, generation: int) -> None:
+        start_time = monotonic()
+        temp_snapshot_path = self.snapshot_path.with_name(
+            f'{self.snapshot_path.name}.{os.getpid()}.tmp'
+        )
+        with temp_snapshot_path.open('wb') as snapshot_file:
+            snapshot_file.write(struct.pack(
+                SHARED_SNAPSHOT_HEADER_FORMAT,
+                SHARED_SNAPSHOT_MAGIC,
+                generation
+            ))
+            self.snapshot_codec.write(value, snapshot_file)
+        os.replace(temp_snapshot_path, self.snapshot_path)
+        self.snapshot_generation = generation
+        end_time = monotonic()
+        LOGGER.info(
+            'Saved shared cache snapshot: %r, generation=%d, size=%.3fMB, time=%.3f seconds',
+            str(self.snapshot_path),
+            generation,
+            self.snapshot_path.stat().st_size / 1024 / 1024,
+            (end_time - start_time)
+        )
+
+    def _is_other_process_loading(self) -> bool:
+        with self._file_lock(blocking=False) as is_locked:
+            return not is_locked
+
+    def _is_snapshot_changed(self) -> bool:
+        generation = self._read_snapshot_generation()
+        if generation is not None and not self._is_generation_expired(generation):
+            return generation != self.snapshot_generation
+        # the current value is kept until the process loading the next generation wrote it
+        return not self._is_other_process_loading()
+
+    def _is_refresh_required(self, entry: SingleObjectCacheEntry[T], now: float) -> bool:
+        # the snapshot generation and the refresh policy are only checked once per poll interval
+        if self._is_retry_delay_active(now):
+            return False
+        last_polled_time = max(entry.last_updated_time, self._last_polled_time or 0)
+        if now - last_polled_time < self.poll_interval_in_seconds:
+            return False
+        self._last_polled_time = now
+        if self._is_snapshot_changed():
+            return True
+        if self.refresh_policy.is_refresh_required(entry.last_updated_time, now):
+            self._is_source_refresh_required = True
+            return not self._is_other_process_loading()
+        return False
+
+    def _is_snapshot_usable(
+        self,
+        generation: Optional[int],
+        is_source_refresh_required: bool
+    ) -> bool:
+        if generation is None or self._is_generation_expired(generation):
+            return False
+        # a generation written by another process since, already reflects the source change
+        return not is_source_refresh_required or generation != self.snapshot_generation
+
+    def _get_current_or_read_snapshot(self, generation: int) -> T:
+        entry = self._entry
+        if entry is not None and generation == self.snapshot_generation:
+            return entry.value
+        return self._read_snapshot()
+
+    def _load_and_write_snapshot(self, load_fn: Callable[[], T]) -> T:
+        generation = time_ns()
+        self._write_snapshot(load_fn(), generation=generation)
+        return self._read_snapshot()
+
+    def _load_shared_value(self, load_fn: Callable[[], T]) -> T:
+        is_source_refresh_required = self._is_source_refresh_required
+        self._is_source_refresh_required = False
+        generation = self._read_snapshot_generation()
+        if self._is_snapshot_usable(generation, is_source_refresh_required):
+            assert generation is not None
+            return self._get_current_or_read_snapshot(generation)
+        entry = self._entry
+        with self._file_lock(blocking=entry is None) as is_locked:
+            if not is_locked:
+                # another process is loading the next generation
+                assert entry is not None
+                return entry.value
+            generation = self._read_snapshot_generation()
+            if self._is_snapshot_usable(generation, is_source_refresh_required):
+                assert generation is not None
+                return self._get_current_or_read_snapshot(generation)
+            return self._load_and_write_snapshot(load_fn)
+
+    def _reload_shared_value(self, load_fn: Callable[[], T]) -> T:
+        with self._file_lock(blocking=True):
+            return self._load_and_write_snapshot(load_fn)
+
+    def get_or_load(self, load_fn: Callable[[], T]) -> T:
+        return super().get_or_load(lambda: self._load_shared_value(load_fn))
+
+    def request_refresh(self, load_fn: Callable[[], T]) -> int:
+        # the new snapshot is picked up by the other processes when they next poll it
+        return super().request_refresh(lambda: self._reload_shared_value(load_fn))
+
+
+K = TypeVar('K')
+K_contra = TypeVar('K_contra', contravariant=True)
+
+
+@dataclass(frozen=True)
+class KeyedCacheEntry(Generic[T]):
+    value: T
+    expiry_time: float
+    size_in_bytes: int
+
+
+class KeyedCache(Protocol[K_contra, T]):
+    def get_or_load(self, key: K_contra, load_fn: Callable[[], T]) -> T:
+        pass
+
+
+class DummyKeyedCache(KeyedCache[K, T]):
+    def get_or_load(self, key: K, load_fn: Callable[[], T]) -> T:
+        return load_fn()
+
+
+# pylint: disable-next=too-many-instance-attributes
+class InMemoryKeyedCache(KeyedCache[K, T]):
+    """
+    Thread-safe LRU cache with a per-entry max age. The number of entries is limited by
+    max_entry_count and optionally their total size by max_size_in_bytes (using estimate_size_fn).
+    Concurrent loads of the same key are coalesced into a single load.
+    """
+    def __init__(  # pylint: disable=too-many-positional-arguments
+        self,
+        max_age_in_seconds: float,
+        max_entry_count: int = 1000,
+        max_size_in_bytes: Optional[int] = None,
+        estimate_size_fn: Optional[Callable[[T], int]] = None
+    ) -> None:
+        assert max_size_in_bytes is None or estimate_size_fn is not None
+        self.max_age_in_seconds = max_age_in_seconds
+        self.max_entry_count = max_entry_count
+        self.max_size_in_bytes = max_size_in_bytes
+        self.estimate_size_fn = estimate_size_fn
+        self.total_size_in_bytes = 0
+        self._lock = Lock()
+        self._entry_by_key: 'OrderedDict[K, KeyedCacheEntry[T]]' = OrderedDict()
+        self._load_lock_by_key: Dict[K, Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._entry_by_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entry_by_key.clear()
+            self.total_size_in_bytes = 0
+
+    def _remove_entry(self, key: K) -> None:
+        entry = self._entry_by_key.pop(key)
+        self.total_size_in_bytes -= entry.size_in_bytes
+
+    def _get_fresh_entry(self, key: K) -> Optional[KeyedCacheEntry[T]]:
+        with self._lock:
+            entry = self._entry_by_key.get(key)
+            if entry is None:
+                return None
+            if monotonic() >= entry.expiry_time:
+                self._remove_entry(key)
+                return None
+            self._entry_by_key.move_to_end(key)
+            return entry
+
+    def _is_over_budget(self) -> bool:
+        if len(self._entry_by_key) > self.max_entry_count:
+            return True
+        return (
+            self.max_size_in_bytes is not None
+            and self.total_size_in_bytes > self.max_size_in_bytes
+        )
+
+    def _put(self, key: K, value: T) -> None:
+        size_in_bytes = self.estimate_size_fn(value) if self.estimate_size_fn is not None else 0
+        if self.max_size_in_bytes is not None and size_in_bytes > self.max_size_in_bytes:
+            LOGGER.debug('Not caching value for key %r exceeding max size', key)
+            return
+        with self._lock:
+            if key in self._entry_by_key:
+                self._remove_entry(key)
+            self._entry_by_key[key] = KeyedCacheEntry(
+                value=value,
+                expiry_time=monotonic() + self.max_age_in_seconds,
+                size_in_bytes=size_in_bytes
+            )
+            self.total_size_in_bytes += size_in_bytes
+            while self._is_over_budget():
+                self._remove_entry(next(iter(self._entry_by_key)))
+
+    def _get_load_lock(self, key: K) -> Lock:
+        with self._lock:
+            return self._load_lock_by_key.setdefault(key, Lock())
+
+    def _release_load_lock(self, key: K, load_lock: Lock) -> None:
+        with self._lock:
+            if self._load_lock_by_key.get(key) is load_lock:
+                del self._load_lock_by_key[key]
+
+    def get_or_load(self, key: K, load_fn: Callable[[], T]) -> T:
+        entry = self._get_fresh_entry(key)
+        if entry is not None:
+            return entry.value
+        load_lock = self._get_load_lock(key)
+        try:
+            with load_lock:
+                # another thread may have loaded the value while we were waiting for the lock
+                entry = self._get_fresh_entry(key)
+                if entry is not None:
+                    return entry.value
+                value = load_fn()
+                self._put(key, value)
+                return value
+        finally:
+            self._release_load_lock(key, load_lock)
+
+
+S = TypeVar('S')
+
+
+class LazyMemoizedMapping(Mapping[K, T]):
+    """
+    Read-only mapping of the keys of source_by_key to values that are created by value_fn
+    from the source value when the key is first accessed. Values are memoized for the lifetime
+    of the mapping, concurrent first accesses of the same key only call value_fn once.
+    """
+    def __init__(
+        self,
+        source_by_key: Mapping[K, S],
+        value_fn: Callable[[S], T]
+    ) -> None:
+        self.source_by_key = source_by_key
+        self.value_fn = value_fn
+        self._value_cache = self._create_value_cache()
+
+    def _create_value_cache(self) -> InMemoryKeyedCache[K, T]:
+        return InMemoryKeyedCache[K, T](
+            max_age_in_seconds=math.inf,
+            max_entry_count=max(1, len(self.source_by_key))
+        )
+
+    def __getstate__(self) -> dict:
+        # memoized values are not persisted (e.g. in cache snapshots)
+        return {'source_by_key': self.source_by_key, 'value_fn': self.value_fn}
+
+    def __setstate__(self, state: dict) -> None:
+        self.source_by_key = state['source_by_key']
+        self.value_fn = state['value_fn']
+        self._value_cache = self._create_value_cache()
+
+    def __getitem__(self, key: K) -> T:
+        source = self.source_by_key[key]
+        return self._value_cache.get_or_load(key, load_fn=lambda: self.value_fn(source))
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.source_by_key)
+
+    def __len__(self) -> int:
+        return len(self.source_by_key)
+
+    @property
+    def memoized_count(self) -> int:
+        return len(self._value_cache)
+
+
+class ContentHashMemoGeneration(Generic[T]):
+    """
+    A generation of a ContentHashMemo, whose values can be created in batches
+    (e.g. while streaming the source values). Values of the previous generation are only
+    replaced once the generation is completed.
+    """
+    def __init__(
+        self,
+        memo: 'ContentHashMemo[T]',
+        previous_value_by_hash: Mapping[str, T],
+        map_fn: Optional[Callable[[Callable[[Any], T], Sequence[Any]], Sequence[T]]] = None
+    ):
+        self.memo = memo
+        self.previous_value_by_hash = previous_value_by_hash
+        self.map_fn = map_fn if map_fn is not None else memo.map_fn
+        self.value_by_hash: Dict[str, T] = {}
+        self.reused_count = 0
+        self.created_count = 0
+
+    def get_values(self, source_values: Sequence[Any]) -> List[T]:
+        source_value_by_missing_hash: Dict[str, Any] = {}
+        source_hashes: List[str] = []
+        for source_value in source_values:
+            source_hash = self.memo.hash_fn(source_value)
+            source_hashes.append(source_hash)
+            if source_hash in self.value_by_hash:
+                continue
+            if source_hash in self.previous_value_by_hash:
+                self.value_by_hash[source_hash] = self.previous_value_by_hash[source_hash]
+            else:
+                source_value_by_missing_hash.setdefault(source_hash, source_value)
+        created_values = self.map_fn(
+            self.memo.value_fn,
+            list(source_value_by_missing_hash.values())
+        )
+        self.value_by_hash.update(zip(source_value_by_missing_hash.keys(), created_values))
+        self.created_count += len(source_value_by_missing_hash)
+        self.reused_count += len(source_hashes) - len(source_value_by_missing_hash)
+        return [self.value_by_hash[source_hash] for source_hash in source_hashes]
+
+    def complete(self) -> None:
+        self.memo.complete_generation(self)
+
+
+class ContentHashMemo(Generic[T]):
+    """
+    Creates the values of a generation of source values via value_fn, reusing the values
+    of the previous generation whose source value has the same content hash.
+    Only the values of the latest completed generation are kept.
+    The values to create are passed to map_fn together, which could e.g. create them in parallel.
+    """
+    def __init__(
+        self,
+        value_fn: Callable[[Any], T],
+        hash_fn: Callable[[Any], str] = get_json_content_hash,
+        map_fn: Callable[[Callable[[Any], T], Sequence[Any]], Sequence[T]] = map_serially
+    ) -> None:
+        self.value_fn = value_fn
+        self.hash_fn = hash_fn
+        self.map_fn = map_fn
+        self.reused_count = 0
+        self.created_count = 0
+        self._value_by_hash: Dict[str, T] = {}
+
+    def __len__(self) -> int:
+        return len(self._value_by_hash)
+
+    def start_next_generation(
+        self,
+        map_fn: Optional[Callable[[Callable[[Any], T], Sequence[Any]], Sequence[T]]] = None
+    ) -> ContentHashMemoGeneration[T]:
+        # map_fn overrides the memo's map_fn for this generation (e.g. to reuse a process pool)
+        return ContentHashMemoGeneration(
+            self,
+            previous_value_by_hash=self._value_by_hash,
+            map_fn=map_fn
+        )
+
+    def complete_generation(self, generation: ContentHashMemoGeneration[T]) -> None:
+        self._value_by_hash = generation.value_by_hash
+        self.reused_count = generation.reused_count
+        self.created_count = generation.created_count
+
+    def get_values_for_next_generation(self, source_values: Sequence[Any]) -> List[T]:
+        generation = self.start_next_generation()
+        values = generation.get_values(source_values)
+        generation.complete()
+        return values
@@ -0,0 +1,136 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+import logging
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+LOAD_DURATION_HISTOGRAM_BUCKETS_IN_SECONDS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300)
+
+
+@dataclass(frozen=True)
+class SingleObjectCacheStats:  # pylint: disable=too-many-instance-attributes
+    name: str
+    hit_count: int
+    miss_count: int
+    load_count: int
+    load_failure_count: int
+    last_load_duration_in_seconds: Optional[float]
+    load_duration_histogram: Mapping[str, int]
+    seconds_since_last_load: Optional[float]
+    estimated_size_in_bytes: Optional[int]
+    last_error: Optional[str]
+    seconds_since_last_error: Optional[float]
+
+
+def get_load_duration_histogram_bucket_labels() -> Sequence[str]:
+    return [
+        str(bucket) for bucket in LOAD_DURATION_HISTOGRAM_BUCKETS_IN_SECONDS
+    ] + ['+Inf']
+
+
+def get_seconds_since(timestamp: Optional[float], now: float) -> Optional[float]:
+    if timestamp is None:
+        return None
+    return now - timestamp
+
+
+class SingleObjectCacheMetrics:  # pylint: disable=too-many-instance-attributes
+    """
+    Records usage and load metrics of a single object cache.
+    The hit and miss counts are not synchronized and may be slightly off under contention,
+    which avoids adding a lock to the read path.
+    """
+    def __init__(
+        self,
+        name: str,
+        estimate_size_fn: Optional[Callable[[Any], int]] = None
+    ) -> None:
+        self.name = name
+        self.estimate_size_fn = estimate_size_fn
+        self.hit_count = 0
+        self.miss_count = 0
+        self.load_count = 0
+        self.load_failure_count = 0
+        self.last_load_duration_in_seconds: Optional[float] = None
+        self.load_duration_bucket_counts: List[int] = (
+            [0] * (len(LOAD_DURATION_HISTOGRAM_BUCKETS_IN_SECONDS) + 1)
+        )
+        self.last_load_time: Optional[float] = None
+        self.estimated_size_in_bytes: Optional[int] = None
+        self.last_error: Optional[BaseException] = None
+        self.last_error_time: Optional[float] = None
+
+    def record_hit(self) -> None:
+        self.hit_count += 1
+
+    def record_miss(self) -> None:
+        self.miss_count += 1
+
+    def _estimate_size_or_none(self, value: Any) -> Optional[int]:
+        if self.estimate_size_fn is None:
+            return None
+        try:
+            return self.estimate_size_fn(value)
+        except Exception:  # pylint: disable=broad-exception-caught
+            LOGGER.warning('Failed to estimate size of cache: %r', self.name, exc_info=True)
+            return None
+
+    def record_load(self, value: Any, duration_in_seconds: float) -> None:
+        self.load_count += 1
+        self.last_load_duration_in_seconds = duration_in_seconds
+        self.load_duration_bucket_counts[
+            bisect_left(LOAD_DURATION_HISTOGRAM_BUCKETS_IN_SECONDS, duration_in_seconds)
+        ] += 1
+        self.last_load_time = monotonic()
+        self.estimated_size_in_bytes = self._estimate_size_or_none(value)
+
+    def record_load_failure(self, error: BaseException) -> None:
+        self.load_failure_count += 1
+        self.last_error = error
+        self.last_error_time = monotonic()
+
+    def get_stats(self) -> SingleObjectCacheStats:
+        now = monotonic()
+        return SingleObjectCacheStats(
+            name=self.name,
+            hit_count=self.hit_count,
+            miss_count=self.miss_count,
+            load_count=self.load_count,
+            load_failure_count=self.load_failure_count,
+            last_load_duration_in_seconds=self.last_load_duration_in_seconds,
+            load_duration_histogram=dict(zip(
+                get_load_duration_histogram_bucket_labels(),
+                self.load_duration_bucket_counts
+            )),
+            seconds_since_last_load=get_seconds_since(self.last_load_time, now),
+            estimated_size_in_bytes=self.estimated_size_in_bytes,
+            last_error=repr(self.last_error) if self.last_error is not None else None,
+            seconds_since_last_error=get_seconds_since(self.last_error_time, now)
+        )
+
+
+class SingleObjectCacheMetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._metrics_by_name: Dict[str, SingleObjectCacheMetrics] = {}
+
+    def create_metrics(
+        self,
+        name: str,
+        estimate_size_fn: Optional[Callable[[Any], int]] = None
+    ) -> SingleObjectCacheMetrics:
+        metrics = SingleObjectCacheMetrics(name=name, estimate_size_fn=estimate_size_fn)
+        with self._lock:
+            assert name not in self._metrics_by_name, f'duplicate cache name: {name}'
+            self._metrics_by_name[name] = metrics
+        return metrics
+
+    def get_stats_list(self) -> Sequence[SingleObjectCacheStats]:
+        with self._lock:
+            metrics_list = list(self._metrics_by_name.values())
+        return [metrics.get_stats() for metrics in metrics_list]
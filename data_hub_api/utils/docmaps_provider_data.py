@@ -0,0 +1,260 @@
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from functools import cached_property, partial
+import mmap
+import pickle
+import struct
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union
+)
+
+from data_hub_api.utils.cache import ContentHashMemo, LazyMemoizedMapping, SnapshotCodec
+from data_hub_api.utils.iterables import iter_batches
+from data_hub_api.utils.manuscript_id_index import ManuscriptIdIndexes
+from data_hub_api.utils.manuscript_timestamp_index import ManuscriptTimestampIndexes
+from data_hub_api.utils.mapped_json import MappedJsonListMapping, get_json_list_items_bytes
+from data_hub_api.utils.parallel import map_serially
+from data_hub_api.utils.quarantine import (
+    QuarantinedQueryResult,
+    get_value_or_quarantined_query_result,
+    get_values_skipping_quarantined_query_results
+)
+
+
+DEFAULT_QUERY_RESULT_BATCH_SIZE = 1000
+
+SNAPSHOT_METADATA_OFFSET_FORMAT = '>Q'
+SNAPSHOT_METADATA_OFFSET_SIZE = struct.calcsize(SNAPSHOT_METADATA_OFFSET_FORMAT)
+
+
+D = TypeVar('D')
+K = TypeVar('K')
+
+
+@dataclass(frozen=True)
+class DocmapsProviderData(Generic[D]):
+    # the docmaps are shared by all requests and must not be modified
+    docmaps_by_manuscript_id: Mapping[str, Sequence[D]]
+    # query results whose docmap failed to generate, in quarantine mode
+    # (in lazy mode, they are added when first requested)
+    quarantined_query_results: List[QuarantinedQueryResult] = field(default_factory=list)
+    manuscript_id_indexes: ManuscriptIdIndexes = field(default_factory=ManuscriptIdIndexes)
+    manuscript_timestamp_indexes: ManuscriptTimestampIndexes = field(
+        default_factory=ManuscriptTimestampIndexes
+    )
+
+    @cached_property
+    def docmaps(self) -> Sequence[D]:
+        # generates all remaining docmaps, if they are generated lazily
+        return [
+            docmap
+            for docmaps in self.docmaps_by_manuscript_id.values()
+            for docmap in docmaps
+        ]
+
+    @cached_property
+    def sorted_manuscript_ids(self) -> Sequence[str]:
+        # the stable order used to paginate the index, fixed for each generation
+        return sorted(self.docmaps_by_manuscript_id.keys())
+
+
+class _DocmapsProviderDataBuilder(Generic[D]):
+    def __init__(self, index_manuscript_ids: bool) -> None:
+        self.index_manuscript_ids = index_manuscript_ids
+        self.quarantined_query_results: List[QuarantinedQueryResult] = []
+        self.manuscript_id_indexes = ManuscriptIdIndexes()
+        self.manuscript_timestamp_indexes = ManuscriptTimestampIndexes()
+        # the docmaps, or the query results in lazy mode
+        self.values_by_manuscript_id: Dict[str, List[Any]] = defaultdict(list)
+
+    def _add_value(self, query_result: dict, value: Any) -> None:
+        if self.index_manuscript_ids:
+            self.manuscript_id_indexes.add_query_result(query_result)
+        self.manuscript_timestamp_indexes.add_query_result(query_result)
+        self.values_by_manuscript_id[query_result['manuscript_id']].append(value)
+
+    def add_query_result(self, query_result: dict) -> None:
+        self._add_value(query_result, query_result)
+
+    def add_docmap(
+        self,
+        query_result: dict,
+        docmap: Union[D, QuarantinedQueryResult]
+    ) -> None:
+        if isinstance(docmap, QuarantinedQueryResult):
+            # quarantined query results may be malformed and are not indexed
+            self.quarantined_query_results.append(docmap)
+            return
+        self._add_value(query_result, docmap)
+
+    def build(
+        self,
+        docmaps_by_manuscript_id: Mapping[str, Sequence[D]]
+    ) -> DocmapsProviderData[D]:
+        return DocmapsProviderData(
+            docmaps_by_manuscript_id=docmaps_by_manuscript_id,
+            quarantined_query_results=self.quarantined_query_results,
+            manuscript_id_indexes=self.manuscript_id_indexes,
+            manuscript_timestamp_indexes=self.manuscript_timestamp_indexes
+        )
+
+    def build_lazy(
+        self,
+        get_docmap_fn: Callable[[dict], D],
+        quarantine_failed_query_results: bool
+    ) -> DocmapsProviderData[D]:
+        return self.build(LazyMemoizedMapping(
+            dict(self.values_by_manuscript_id),
+            value_fn=(
+                partial(
+                    get_values_skipping_quarantined_query_results,
+                    get_docmap_fn,
+                    self.quarantined_query_results
+                )
+                if quarantine_failed_query_results
+                else partial(map_serially, get_docmap_fn)
+            )
+        ))
+
+
+# pylint: disable-next=too-many-locals
+def create_docmaps_provider_data_by_key(
+    query_results: Iterable[dict],
+    is_included_fn_by_key: Mapping[K, Callable[[dict], bool]],
+    get_docmap_fn: Callable[[dict], D],
+    *,
+    lazy_docmaps: bool = False,
+    docmap_memo: Optional[ContentHashMemo[Union[D, QuarantinedQueryResult]]] = None,
+    batch_size: int = DEFAULT_QUERY_RESULT_BATCH_SIZE,
+    quarantine_failed_query_results: bool = False,
+    map_fn: Optional[Callable[[Callable[[Any], Any], Sequence[Any]], Sequence[Any]]] = None,
+    index_manuscript_ids: bool = True
+) -> Mapping[K, DocmapsProviderData[D]]:
+    """
+    Creates the data of each key (e.g. a query result filter) from the query results
+    the key's is_included_fn includes. Each docmap is generated once, even if included by
+    multiple keys. In lazy mode, the query results are kept to generate the docmaps of
+    a manuscript when first requested. get_docmap_fn needs to be a module level function,
+    as the lazy docmaps may be persisted in cache snapshots.
+    """
+    builder_by_key: Dict[K, _DocmapsProviderDataBuilder[D]] = {
+        key: _DocmapsProviderDataBuilder(index_manuscript_ids=index_manuscript_ids)
+        for key in is_included_fn_by_key
+    }
+
+    def iter_included_builders(query_result: dict) -> Iterable[_DocmapsProviderDataBuilder[D]]:
+        for key, is_included_fn in is_included_fn_by_key.items():
+            if is_included_fn(query_result):
+                yield builder_by_key[key]
+
+    if lazy_docmaps:
+        for query_result in query_results:
+            for builder in iter_included_builders(query_result):
+                builder.add_query_result(query_result)
+        return {
+            key: builder.build_lazy(
+                get_docmap_fn,
+                quarantine_failed_query_results=quarantine_failed_query_results
+            )
+            for key, builder in builder_by_key.items()
+        }
+    # only one batch of query results is kept in memory while generating the docmaps
+    docmap_memo_generation = (
+        docmap_memo.start_next_generation(map_fn=map_fn) if docmap_memo is not None else None
+    )
+    for query_result_batch in iter_batches(query_results, batch_size):
+        docmaps: Sequence[Union[D, QuarantinedQueryResult]]
+        if docmap_memo_generation is not None:
+            docmaps = docmap_memo_generation.get_values(query_result_batch)
+        elif quarantine_failed_query_results:
+            docmaps = map_serially(
+                partial(get_value_or_quarantined_query_result, get_docmap_fn),
+                query_result_batch
+            )
+        else:
+            docmaps = map_serially(get_docmap_fn, query_result_batch)
+        for query_result, docmap in zip(query_result_batch, docmaps):
+            for builder in iter_included_builders(query_result):
+                builder.add_docmap(query_result, docmap)
+    if docmap_memo_generation is not None:
+        docmap_memo_generation.complete()
+    return {
+        key: builder.build(dict(builder.values_by_manuscript_id))
+        for key, builder in builder_by_key.items()
+    }
+
+
+def is_always_included(_query_result: dict) -> bool:
+    return True
+
+
+def create_docmaps_provider_data(
+    query_results: Iterable[dict],
+    get_docmap_fn: Callable[[dict], D],
+    *,
+    lazy_docmaps: bool = False,
+    docmap_memo: Optional[ContentHashMemo[Union[D, QuarantinedQueryResult]]] = None,
+    batch_size: int = DEFAULT_QUERY_RESULT_BATCH_SIZE,
+    quarantine_failed_query_results: bool = False,
+    map_fn: Optional[Callable[[Callable[[Any], Any], Sequence[Any]], Sequence[Any]]] = None
+) -> DocmapsProviderData[D]:
+    return create_docmaps_provider_data_by_key(
+        query_results,
+        {None: is_always_included},
+        get_docmap_fn,
+        lazy_docmaps=lazy_docmaps,
+        docmap_memo=docmap_memo,
+        batch_size=batch_size,
+        quarantine_failed_query_results=quarantine_failed_query_results,
+        map_fn=map_fn
+    )[None]
+
+
+class DocmapsProviderDataSnapshotCodec(SnapshotCodec[DocmapsProviderData[Any]]):
+    """
+    Writes the JSON of the docmaps of each manuscript to the snapshot, followed by the pickled
+    remaining data (including the offsets of the JSON of each manuscript).
+    The snapshot is memory mapped when read, the docmaps JSON is therefore shared by all
+    processes reading the snapshot, rather than each process holding a copy of the docmaps.
+    """
+    def write(self, value: DocmapsProviderData[Any], snapshot_file: BinaryIO) -> None:
+        manuscript_ids: List[str] = []
+        offsets = array('Q', [snapshot_file.tell()])
+        # in lazy mode, this generates all of the docmaps
+        for manuscript_id, docmaps in value.docmaps_by_manuscript_id.items():
+            snapshot_file.write(get_json_list_items_bytes(docmaps))
+            manuscript_ids.append(manuscript_id)
+            offsets.append(snapshot_file.tell())
+        metadata_offset = snapshot_file.tell()
+        pickle.dump(
+            (replace(value, docmaps_by_manuscript_id={}), manuscript_ids, offsets),
+            snapshot_file,
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+        snapshot_file.write(struct.pack(SNAPSHOT_METADATA_OFFSET_FORMAT, metadata_offset))
+
+    def read(self, snapshot_file: BinaryIO) -> DocmapsProviderData[Any]:
+        # the mapping stays valid after the file is closed or replaced by the next generation
+        buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        metadata_end = len(buffer) - SNAPSHOT_METADATA_OFFSET_SIZE
+        (metadata_offset,) = struct.unpack(
+            SNAPSHOT_METADATA_OFFSET_FORMAT,
+            buffer[metadata_end:]
+        )
+        data, manuscript_ids, offsets = pickle.loads(buffer[metadata_offset:metadata_end])
+        return replace(
+            data,
+            docmaps_by_manuscript_id=MappedJsonListMapping(buffer, manuscript_ids, offsets)
+        )
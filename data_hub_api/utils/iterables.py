@@ -0,0 +1,25 @@
+from typing import Any, Iterable, Iterator, List, Mapping, TypeVar
+
+
+T = TypeVar('T')
+
+
+def iter_batches(iterable: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    assert batch_size > 0
+    batch: List[T] = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_mappings(value: Any) -> Iterator[Mapping[str, Any]]:
+    # skips malformed values, e.g. of query results which will fail to generate a docmap
+    if not isinstance(value, (list, tuple)):
+        return
+    for item in value:
+        if isinstance(item, Mapping):
+            yield item
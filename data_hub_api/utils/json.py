@@ -1,4 +1,5 @@
 from datetime import date, datetime
+import hashlib
 import json
 from typing import Any, Callable, Optional, Tuple, TypeVar, Union
 import pandas as pd
@@ -20,6 +21,19 @@ def get_json_compatible_value(value):
     return value
 
 
+def get_json_content_hash(value: Any) -> str:
+    """
+    Returns a stable hash of the JSON representation of the value (independent of the key order).
+    Values that are not JSON compatible (e.g. Decimal) are represented by their string value.
+    """
+    json_str = json.dumps(
+        value,
+        sort_keys=True,
+        default=lambda item_value: str(get_json_compatible_value(item_value))
+    )
+    return hashlib.sha256(json_str.encode('utf-8')).hexdigest()
+
+
 def get_recursive_json_compatible_value(value):
     if isinstance(value, dict):
         return {
@@ -0,0 +1,72 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Sequence
+
+from data_hub_api.utils.iterables import iter_mappings
+
+
+def get_normalized_index_key(key: str) -> str:
+    # DOIs are case-insensitive
+    return key.strip().lower()
+
+
+def _add_manuscript_id_to_index(
+    manuscript_ids_by_key: Dict[str, List[str]],
+    key: Any,
+    manuscript_id: str
+) -> None:
+    if not key or not isinstance(key, str):
+        return
+    manuscript_ids = manuscript_ids_by_key.setdefault(get_normalized_index_key(key), [])
+    if manuscript_id not in manuscript_ids:
+        manuscript_ids.append(manuscript_id)
+
+
+@dataclass(frozen=True)
+class ManuscriptIdIndexes:
+    """
+    Indexes the manuscript ids of query results by their eLife DOI, and by the preprint DOI
+    and long manuscript identifier of each of their manuscript versions.
+    The indexes are populated while loading and must not be modified afterwards.
+    """
+    manuscript_ids_by_elife_doi: Dict[str, List[str]] = field(default_factory=dict)
+    manuscript_ids_by_preprint_doi: Dict[str, List[str]] = field(default_factory=dict)
+    manuscript_ids_by_long_manuscript_identifier: Dict[str, List[str]] = field(
+        default_factory=dict
+    )
+
+    def add_query_result(self, query_result: Mapping[str, Any]) -> None:
+        manuscript_id = query_result['manuscript_id']
+        _add_manuscript_id_to_index(
+            self.manuscript_ids_by_elife_doi,
+            query_result.get('elife_doi'),
+            manuscript_id
+        )
+        for manuscript_version in iter_mappings(query_result.get('manuscript_versions')):
+            _add_manuscript_id_to_index(
+                self.manuscript_ids_by_preprint_doi,
+                manuscript_version.get('preprint_doi'),
+                manuscript_id
+            )
+            _add_manuscript_id_to_index(
+                self.manuscript_ids_by_long_manuscript_identifier,
+                manuscript_version.get('long_manuscript_identifier'),
+                manuscript_id
+            )
+
+    def get_manuscript_ids_by_elife_doi(self, elife_doi: str) -> Sequence[str]:
+        return self.manuscript_ids_by_elife_doi.get(get_normalized_index_key(elife_doi), [])
+
+    def get_manuscript_ids_by_preprint_doi(self, preprint_doi: str) -> Sequence[str]:
+        return self.manuscript_ids_by_preprint_doi.get(
+            get_normalized_index_key(preprint_doi),
+            []
+        )
+
+    def get_manuscript_ids_by_long_manuscript_identifier(
+        self,
+        long_manuscript_identifier: str
+    ) -> Sequence[str]:
+        return self.manuscript_ids_by_long_manuscript_identifier.get(
+            get_normalized_index_key(long_manuscript_identifier),
+            []
+        )
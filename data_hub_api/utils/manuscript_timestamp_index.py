@@ -0,0 +1,176 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timezone
+from functools import cached_property
+import math
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple, Union
+
+from data_hub_api.utils.cache import InMemoryKeyedCache
+from data_hub_api.utils.iterables import iter_mappings
+
+
+TimestampOrDate = Union[date, datetime]
+
+
+# the pages of a filtered index share the sorted manuscript ids of the same since values
+MAX_SORTED_MANUSCRIPT_IDS_SINCE_CACHE_ENTRY_COUNT = 10
+
+
+def get_utc_datetime(value: TimestampOrDate) -> datetime:
+    # dates are treated as the start of the day, naive timestamps as UTC
+    if not isinstance(value, datetime):
+        return datetime.combine(value, time(), tzinfo=timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def get_latest_timestamp(values: Iterable[Any]) -> Optional[datetime]:
+    # ignores missing or malformed values
+    timestamps = [get_utc_datetime(value) for value in values if isinstance(value, date)]
+    return max(timestamps) if timestamps else None
+
+
+def iter_published_timestamps(
+    query_result: Mapping[str, Any]
+) -> Iterable[Optional[TimestampOrDate]]:
+    for manuscript_version in iter_mappings(query_result.get('manuscript_versions')):
+        yield manuscript_version.get('rp_publication_timestamp')
+        yield manuscript_version.get('vor_publication_date')
+    for vor_version in iter_mappings(query_result.get('vor_versions')):
+        yield vor_version.get('vor_publication_date')
+
+
+def iter_evaluation_timestamps(evaluations: Any) -> Iterable[Optional[TimestampOrDate]]:
+    for evaluation in iter_mappings(evaluations):
+        yield evaluation.get('annotation_created_timestamp')
+
+
+def iter_updated_timestamps(
+    query_result: Mapping[str, Any]
+) -> Iterable[Optional[TimestampOrDate]]:
+    # the v1 query results are per manuscript version, the others have nested versions
+    yield query_result.get('qc_complete_timestamp')
+    yield from iter_evaluation_timestamps(query_result.get('evaluations'))
+    for manuscript_version in iter_mappings(query_result.get('manuscript_versions')):
+        yield manuscript_version.get('qc_complete_timestamp')
+        yield from iter_evaluation_timestamps(manuscript_version.get('evaluations'))
+    yield from iter_published_timestamps(query_result)
+
+
+def _update_latest_timestamp(
+    timestamp_by_key: Dict[str, datetime],
+    key: str,
+    timestamp: Optional[datetime]
+) -> None:
+    if timestamp is None:
+        return
+    previous_timestamp = timestamp_by_key.get(key)
+    if previous_timestamp is None or timestamp > previous_timestamp:
+        timestamp_by_key[key] = timestamp
+
+
+@dataclass(frozen=True)
+class SortedTimestampIndex:
+    # parallel lists, sorted by timestamp
+    timestamps: Sequence[datetime]
+    keys: Sequence[str]
+
+    @staticmethod
+    def from_timestamp_by_key(timestamp_by_key: Mapping[str, datetime]) -> 'SortedTimestampIndex':
+        sorted_items = sorted(timestamp_by_key.items(), key=lambda item: item[1])
+        return SortedTimestampIndex(
+            timestamps=[timestamp for _, timestamp in sorted_items],
+            keys=[key for key, _ in sorted_items]
+        )
+
+    def get_keys_since(self, since: datetime) -> Sequence[str]:
+        return self.keys[bisect_left(self.timestamps, get_utc_datetime(since)):]
+
+
+@dataclass(frozen=True)
+class ManuscriptTimestampIndexes:
+    """
+    Indexes the manuscript ids by the latest timestamp at which any of their query results were
+    updated (QC complete, evaluated or published) or published (reviewed preprint or VOR).
+    The timestamps are populated while loading and must not be modified afterwards,
+    the sorted indexes are created once per generation when first requested.
+    """
+    updated_timestamp_by_manuscript_id: Dict[str, datetime] = field(default_factory=dict)
+    published_timestamp_by_manuscript_id: Dict[str, datetime] = field(default_factory=dict)
+
+    def add_query_result(self, query_result: Mapping[str, Any]) -> None:
+        manuscript_id = query_result['manuscript_id']
+        _update_latest_timestamp(
+            self.updated_timestamp_by_manuscript_id,
+            manuscript_id,
+            get_latest_timestamp(iter_updated_timestamps(query_result))
+        )
+        _update_latest_timestamp(
+            self.published_timestamp_by_manuscript_id,
+            manuscript_id,
+            get_latest_timestamp(iter_published_timestamps(query_result))
+        )
+
+    @cached_property
+    def updated_timestamp_index(self) -> SortedTimestampIndex:
+        return SortedTimestampIndex.from_timestamp_by_key(self.updated_timestamp_by_manuscript_id)
+
+    @cached_property
+    def published_timestamp_index(self) -> SortedTimestampIndex:
+        return SortedTimestampIndex.from_timestamp_by_key(
+            self.published_timestamp_by_manuscript_id
+        )
+
+    @cached_property
+    def _sorted_manuscript_ids_since_cache(
+        self
+    ) -> InMemoryKeyedCache[Tuple[Optional[datetime], Optional[datetime]], Sequence[str]]:
+        return InMemoryKeyedCache(
+            max_age_in_seconds=math.inf,
+            max_entry_count=MAX_SORTED_MANUSCRIPT_IDS_SINCE_CACHE_ENTRY_COUNT
+        )
+
+    def __getstate__(self) -> dict:
+        # memoized results are not persisted (e.g. in cache snapshots)
+        state = dict(self.__dict__)
+        state.pop('_sorted_manuscript_ids_since_cache', None)
+        return state
+
+    def _get_sorted_manuscript_ids_since(
+        self,
+        updated_since: Optional[datetime],
+        published_since: Optional[datetime]
+    ) -> Sequence[str]:
+        manuscript_ids_since_list = []
+        if updated_since is not None:
+            manuscript_ids_since_list.append(
+                self.updated_timestamp_index.get_keys_since(updated_since)
+            )
+        if published_since is not None:
+            manuscript_ids_since_list.append(
+                self.published_timestamp_index.get_keys_since(published_since)
+            )
+        assert manuscript_ids_since_list
+        return sorted(
+            set(manuscript_ids_since_list[0]).intersection(*manuscript_ids_since_list[1:])
+        )
+
+    def get_sorted_manuscript_ids_since(
+        self,
+        updated_since: Optional[datetime] = None,
+        published_since: Optional[datetime] = None
+    ) -> Sequence[str]:
+        # sorted by manuscript id, to be paginated like the unfiltered index,
+        # memoized so that the following pages are not sorted again
+        updated_since = get_utc_datetime(updated_since) if updated_since is not None else None
+        published_since = (
+            get_utc_datetime(published_since) if published_since is not None else None
+        )
+        return self._sorted_manuscript_ids_since_cache.get_or_load(
+            (updated_since, published_since),
+            load_fn=lambda: self._get_sorted_manuscript_ids_since(
+                updated_since=updated_since,
+                published_since=published_since
+            )
+        )
@@ -0,0 +1,71 @@
+import json
+import mmap
+from typing import Any, Iterable, Iterator, Mapping, Sequence, Union
+
+from fastapi.encoders import jsonable_encoder
+
+
+def get_json_bytes(value: Any) -> bytes:
+    # same serialization as the JSON responses of the API
+    return json.dumps(
+        jsonable_encoder(value),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+
+
+def get_json_list_items_bytes(values: Iterable[Any]) -> bytes:
+    # the comma separated JSON of the values, without the enclosing brackets
+    return b','.join(get_json_bytes(value) for value in values)
+
+
+class MappedJsonListMapping(Mapping[str, Sequence[Any]]):
+    """
+    Read-only mapping of keys to lists of JSON values, stored as JSON in a buffer
+    (e.g. a memory mapped file shared by multiple processes).
+    Only the keys and the offsets of their JSON are held in memory,
+    the values are parsed on each access.
+    """
+    def __init__(
+        self,
+        buffer: Union[bytes, mmap.mmap],
+        keys: Sequence[str],
+        offsets: Sequence[int]
+    ) -> None:
+        # the JSON of the items of the n-th key is between the n-th and the n+1-th offset
+        assert len(offsets) == len(keys) + 1
+        self.buffer = buffer
+        self.keys_in_order = keys
+        self.offsets = offsets
+        self.index_by_key = {key: index for index, key in enumerate(keys)}
+
+    def get_json_list_items_bytes(self, key: str) -> bytes:
+        index = self.index_by_key.get(key)
+        if index is None:
+            return b''
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def __getitem__(self, key: str) -> Sequence[Any]:
+        if key not in self.index_by_key:
+            raise KeyError(key)
+        return json.loads(b'[' + self.get_json_list_items_bytes(key) + b']')
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.index_by_key
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_in_order)
+
+    def __len__(self) -> int:
+        return len(self.keys_in_order)
+
+
+def get_json_list_items_bytes_by_key(
+    values_by_key: Mapping[str, Sequence[Any]],
+    key: str
+) -> bytes:
+    # the JSON of mapped values is returned as is, rather than parsed and serialized again
+    if isinstance(values_by_key, MappedJsonListMapping):
+        return values_by_key.get_json_list_items_bytes(key)
+    return get_json_list_items_bytes(values_by_key.get(key, []))
@@ -0,0 +1,115 @@
+from dataclasses import dataclass, fields, is_dataclass
+import logging
+import random
+import sys
+from typing import Any, Mapping, Optional, Sequence
+
+import objsize
+
+from data_hub_api.utils.cache import LazyMemoizedMapping
+from data_hub_api.utils.mapped_json import MappedJsonListMapping
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+DEFAULT_SIZE_ESTIMATION_SAMPLE_SIZE = 100
+
+BYTES_PER_MB = 1024 * 1024
+
+
+class MemoryBudgetExceededError(RuntimeError):
+    pass
+
+
+def _get_sample(values: Sequence[Any], sample_size: int) -> Sequence[Any]:
+    # seeded, so that the estimate is repeatable for the same values
+    return random.Random(len(values)).sample(values, sample_size)
+
+
+# pylint: disable-next=too-many-return-statements
+def estimate_deep_size(
+    value: Any,
+    sample_size: int = DEFAULT_SIZE_ESTIMATION_SAMPLE_SIZE
+) -> int:
+    """
+    Estimates the deep size of a value by measuring a random sample of the items
+    of large lists, tuples and mappings (including those that are fields of a dataclass
+    or values of a small mapping), rather than walking the whole object graph.
+    Lazy memoized mappings are estimated by their source values, mapped JSON
+    without the mapped buffer (which is shared with other processes).
+    """
+    if is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(
+            estimate_deep_size(getattr(value, field.name), sample_size=sample_size)
+            for field in fields(value)
+        )
+    if isinstance(value, (list, tuple)) and len(value) > sample_size:
+        sample = _get_sample(value, sample_size)
+        return sys.getsizeof(value) + round(
+            objsize.get_deep_size(*sample) * len(value) / sample_size
+        )
+    if isinstance(value, LazyMemoizedMapping):
+        # sampling the mapping itself would create its values
+        return sys.getsizeof(value) + estimate_deep_size(
+            value.source_by_key,
+            sample_size=sample_size
+        )
+    if isinstance(value, MappedJsonListMapping):
+        # sampling the mapping itself would parse its values
+        return sys.getsizeof(value) + objsize.get_deep_size(
+            value.keys_in_order,
+            value.offsets,
+            value.index_by_key
+        )
+    if isinstance(value, Mapping) and len(value) > sample_size:
+        sample_keys = _get_sample(list(value.keys()), sample_size)
+        sample_values = [value[key] for key in sample_keys]
+        return sys.getsizeof(value) + round(
+            objsize.get_deep_size(*sample_keys, *sample_values) * len(value) / sample_size
+        )
+    if isinstance(value, Mapping):
+        # the values of small mappings may be large themselves (e.g. the data by filter)
+        return sys.getsizeof(value) + sum(
+            objsize.get_deep_size(key) + estimate_deep_size(item_value, sample_size=sample_size)
+            for key, item_value in value.items()
+        )
+    return objsize.get_deep_size(value)
+
+
+def log_exact_deep_size_if_debug_enabled(
+    logger: logging.Logger,
+    value: Any,
+    description: str
+) -> None:
+    # walking the whole object graph is slow for large values
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug(
+        'Exact size of %s: %.3fMB',
+        description,
+        objsize.get_deep_size(value) / BYTES_PER_MB
+    )
+
+
+@dataclass(frozen=True)
+class MemoryBudget:
+    name: str
+    max_size_in_bytes: int
+    refuse_if_exceeded: bool = False
+
+    def check_size(self, size_in_bytes: int) -> None:
+        if size_in_bytes <= self.max_size_in_bytes:
+            return
+        message = (
+            f'Estimated size of {self.name} ({size_in_bytes / BYTES_PER_MB:.3f}MB)'
+            f' exceeds memory budget ({self.max_size_in_bytes / BYTES_PER_MB:.3f}MB)'
+        )
+        if self.refuse_if_exceeded:
+            raise MemoryBudgetExceededError(message)
+        LOGGER.warning('%s', message)
+
+
+def check_memory_budget(memory_budget: Optional[MemoryBudget], size_in_bytes: int) -> None:
+    if memory_budget is not None:
+        memory_budget.check_size(size_in_bytes)
@@ -0,0 +1,44 @@
+import base64
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except ValueError as exc:
+        raise InvalidCursorError(f'Invalid cursor: {cursor!r}') from exc
+
+
+@dataclass(frozen=True)
+class KeyPage:
+    keys: Sequence[str]
+    next_cursor: Optional[str] = None
+
+
+def get_key_page(
+    sorted_keys: Sequence[str],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> KeyPage:
+    """
+    Returns the page of keys following the key encoded in the cursor (or the first page).
+    The cursor refers to the last key of the previous page rather than an offset,
+    so that pages stay consistent if the keys change between requests (e.g. on refresh).
+    """
+    assert limit is None or limit > 0
+    start = bisect_right(sorted_keys, decode_cursor(cursor)) if cursor else 0
+    end = len(sorted_keys) if limit is None else min(start + limit, len(sorted_keys))
+    keys = sorted_keys[start:end]
+    if end < len(sorted_keys):
+        return KeyPage(keys=keys, next_cursor=encode_cursor(keys[-1]))
+    return KeyPage(keys=keys)
@@ -0,0 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import logging
+import multiprocessing
+from time import monotonic
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+S = TypeVar('S')
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class ParallelMapConfig:
+    process_count: int = 0
+    chunk_size: int = 100
+    # smaller inputs are mapped serially, as starting the processes would take longer
+    min_parallel_item_count: int = 1000
+
+    def is_parallel_for_item_count(self, item_count: int) -> bool:
+        return self.process_count > 1 and item_count >= self.min_parallel_item_count
+
+
+def map_serially(fn: Callable[[S], T], items: Sequence[S]) -> List[T]:
+    return [fn(item) for item in items]
+
+
+class ProcessPoolMapper:
+    """
+    Maps items in chunks using a pool of worker processes (if enabled by the config).
+    The pool is started when first needed and reused until closed (e.g. for all batches
+    of one load), rather than paying the start up of the worker processes for every map.
+    The items of all maps count towards the min_parallel_item_count, so that small batches
+    of a large load are mapped in parallel as well.
+    fn and the items need to be picklable, e.g. fn needs to be a module level function.
+    """
+    def __init__(self, config: Optional[ParallelMapConfig] = None) -> None:
+        self.config = config
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._item_count = 0
+
+    def __enter__(self) -> 'ProcessPoolMapper':
+        return self
+
+    def __exit__(self, *_args) -> None:
+        self.close()
+
+    def _get_executor(self, config: ParallelMapConfig) -> ProcessPoolExecutor:
+        if self._executor is None:
+            LOGGER.info('Starting process pool, processes=%d', config.process_count)
+            # not forking, as the app process may have other threads running (e.g. cache refreshes)
+            self._executor = ProcessPoolExecutor(
+                max_workers=config.process_count,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _is_parallel(self, config: ParallelMapConfig, item_count: int) -> bool:
+        self._item_count += item_count
+        return (
+            self._executor is not None
+            or config.is_parallel_for_item_count(self._item_count)
+        )
+
+    def map(self, fn: Callable[[S], T], items: Sequence[S]) -> List[T]:
+        config = self.config
+        if config is None or not self._is_parallel(config, len(items)):
+            return map_serially(fn, items)
+        LOGGER.info(
+            'Mapping items in parallel, items=%d, processes=%d, chunk_size=%d',
+            len(items),
+            config.process_count,
+            config.chunk_size
+        )
+        start_time = monotonic()
+        result = list(self._get_executor(config).map(fn, items, chunksize=config.chunk_size))
+        LOGGER.info('Mapped items in parallel, time=%.3f seconds', monotonic() - start_time)
+        return result
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def warn_if_batch_size_limits_parallelism(
+    config: ParallelMapConfig,
+    batch_size: int
+) -> None:
+    # each batch is mapped before the next one, in at most batch_size / chunk_size chunks
+    if config.process_count > 1 and batch_size < config.process_count * config.chunk_size:
+        LOGGER.warning(
+            (
+                'Batch size (%d) is smaller than the process count (%d) times the chunk size'
+                ' (%d), not all processes will be used'
+            ),
+            batch_size,
+            config.process_count,
+            config.chunk_size
+        )
+
+
+def map_in_process_pool(
+    fn: Callable[[S], T],
+    items: Sequence[S],
+    config: Optional[ParallelMapConfig] = None
+) -> List[T]:
+    # uses a new pool, see ProcessPoolMapper to reuse it for multiple maps
+    with ProcessPoolMapper(config) as process_pool_mapper:
+        return process_pool_mapper.map(fn, items)
@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+import logging
+from typing import Any, Callable, List, Sequence, TypeVar, Union
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class QuarantinedQueryResult:
+    manuscript_id: str
+    error: str
+
+    def to_dict(self) -> dict:
+        return {'manuscript_id': self.manuscript_id, 'error': self.error}
+
+
+def get_value_or_quarantined_query_result(
+    value_fn: Callable[[Any], T],
+    query_result: dict
+) -> Union[T, QuarantinedQueryResult]:
+    """
+    Returns the value created by value_fn or, if that fails, the quarantined query result
+    (rather than raising the error, e.g. to skip the query result without failing a whole load).
+    This is a module level function, so that partials of it can be pickled.
+    """
+    try:
+        return value_fn(query_result)
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        manuscript_id = str(query_result.get('manuscript_id'))
+        LOGGER.warning('Quarantined query result, manuscript_id=%r: %r', manuscript_id, exc)
+        return QuarantinedQueryResult(manuscript_id=manuscript_id, error=repr(exc))
+
+
+def get_values_skipping_quarantined_query_results(
+    value_fn: Callable[[Any], T],
+    quarantined_query_results: List[QuarantinedQueryResult],
+    query_results: Sequence[dict]
+) -> Sequence[T]:
+    # used for lazily created values, the quarantined query results are added as they fail
+    values: List[T] = []
+    for query_result in query_results:
+        value = get_value_or_quarantined_query_result(value_fn, query_result)
+        if isinstance(value, QuarantinedQueryResult):
+            quarantined_query_results.append(value)
+        else:
+            values.append(value)
+    return values
@@ -0,0 +1,23 @@
+from typing import Sequence, TypeVar
+
+from fastapi import HTTPException
+
+
+T = TypeVar('T')
+
+
+def get_single_docmap_or_raise_http_exception(
+    docmaps: Sequence[T],
+    identifier_description: str
+) -> T:
+    if not docmaps:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No Docmaps available for requested {identifier_description}"
+        )
+    if len(docmaps) > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Multiple Docmaps available for requested {identifier_description}"
+        )
+    return docmaps[0]
@@ -0,0 +1,262 @@
+from unittest.mock import MagicMock
+from typing import Dict, Optional
+import pytest
+
+from fastapi.testclient import TestClient
+from fastapi import FastAPI
+
+from data_hub_api.admin.api_router import create_admin_router
+from data_hub_api.utils.cache_metrics import SingleObjectCacheMetricsRegistry
+from data_hub_api.utils.quarantine import QuarantinedQueryResult
+
+
+@pytest.fixture(name='cache_metrics_registry')
+def _cache_metrics_registry() -> SingleObjectCacheMetricsRegistry:
+    return SingleObjectCacheMetricsRegistry()
+
+
+ADMIN_API_TOKEN_1 = 'admin_api_token_1'
+
+
+@pytest.fixture(name='refresh_fn_by_name')
+def _refresh_fn_by_name() -> Dict[str, MagicMock]:
+    return {
+        'cache_1': MagicMock(name='refresh_fn_1', return_value=11),
+        'cache_2': MagicMock(name='refresh_fn_2', return_value=21)
+    }
+
+
+def create_test_client(
+    cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+    refresh_fn_by_name: Optional[Dict[str, MagicMock]] = None,
+    admin_api_token: Optional[str] = ADMIN_API_TOKEN_1,
+    quarantined_query_results_fn_by_name: Optional[Dict[str, MagicMock]] = None
+):
+    app = FastAPI()
+    app.include_router(create_admin_router(
+        cache_metrics_registry,
+        refresh_fn_by_name=refresh_fn_by_name,
+        admin_api_token=admin_api_token,
+        quarantined_query_results_fn_by_name=quarantined_query_results_fn_by_name
+    ))
+    client = TestClient(app)
+    return client
+
+
+class TestGetCacheStats:
+    def test_should_return_stats_of_registered_caches(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry
+    ):
+        metrics = cache_metrics_registry.create_metrics(
+            'cache_1',
+            estimate_size_fn=MagicMock(name='estimate_size_fn', return_value=123)
+        )
+        metrics.record_miss()
+        metrics.record_load('value_1', duration_in_seconds=0.2)
+        metrics.record_hit()
+        client = create_test_client(cache_metrics_registry)
+        response = client.get(
+            '/cache/stats',
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert response.status_code == 200
+        cache_stats = response.json()['caches']
+        assert [stats['name'] for stats in cache_stats] == ['cache_1']
+        assert cache_stats[0]['hit_count'] == 1
+        assert cache_stats[0]['miss_count'] == 1
+        assert cache_stats[0]['load_count'] == 1
+        assert cache_stats[0]['load_duration_histogram']['0.5'] == 1
+        assert cache_stats[0]['estimated_size_in_bytes'] == 123
+
+    def test_should_return_401_without_token(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry
+    ):
+        client = create_test_client(cache_metrics_registry)
+        response = client.get('/cache/stats')
+        assert response.status_code == 401
+
+
+class TestRefreshCaches:
+    def test_should_refresh_all_caches_and_return_generations(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+        refresh_fn_by_name: Dict[str, MagicMock]
+    ):
+        client = create_test_client(cache_metrics_registry, refresh_fn_by_name)
+        response = client.post(
+            '/cache/refresh',
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert response.status_code == 202
+        assert response.json() == {
+            'caches': [
+                {'name': 'cache_1', 'generation': 11},
+                {'name': 'cache_2', 'generation': 21}
+            ]
+        }
+
+    def test_should_call_shared_refresh_function_only_once(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry
+    ):
+        refresh_fn = MagicMock(name='refresh_fn', return_value=11)
+        client = create_test_client(
+            cache_metrics_registry,
+            {'cache_1': refresh_fn, 'cache_2': refresh_fn}
+        )
+        response = client.post(
+            '/cache/refresh',
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert response.json() == {
+            'caches': [
+                {'name': 'cache_1', 'generation': 11},
+                {'name': 'cache_2', 'generation': 11}
+            ]
+        }
+        refresh_fn.assert_called_once()
+
+    def test_should_only_refresh_named_cache(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+        refresh_fn_by_name: Dict[str, MagicMock]
+    ):
+        client = create_test_client(cache_metrics_registry, refresh_fn_by_name)
+        response = client.post(
+            '/cache/refresh',
+            params={'name': 'cache_2'},
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert response.status_code == 202
+        assert response.json() == {'caches': [{'name': 'cache_2', 'generation': 21}]}
+        refresh_fn_by_name['cache_1'].assert_not_called()
+
+    def test_should_return_404_for_unknown_cache(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+        refresh_fn_by_name: Dict[str, MagicMock]
+    ):
+        client = create_test_client(cache_metrics_registry, refresh_fn_by_name)
+        response = client.post(
+            '/cache/refresh',
+            params={'name': 'other'},
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert response.status_code == 404
+
+    def test_should_return_401_for_invalid_token(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+        refresh_fn_by_name: Dict[str, MagicMock]
+    ):
+        client = create_test_client(cache_metrics_registry, refresh_fn_by_name)
+        response = client.post(
+            '/cache/refresh',
+            headers={'Authorization': 'Bearer other'}
+        )
+        assert response.status_code == 401
+        refresh_fn_by_name['cache_1'].assert_not_called()
+
+    def test_should_return_401_without_token(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+        refresh_fn_by_name: Dict[str, MagicMock]
+    ):
+        client = create_test_client(cache_metrics_registry, refresh_fn_by_name)
+        response = client.post('/cache/refresh')
+        assert response.status_code == 401
+
+    def test_should_return_403_if_admin_api_token_is_not_configured(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry,
+        refresh_fn_by_name: Dict[str, MagicMock]
+    ):
+        client = create_test_client(
+            cache_metrics_registry,
+            refresh_fn_by_name,
+            admin_api_token=None
+        )
+        response = client.post(
+            '/cache/refresh',
+            headers={'Authorization': 'Bearer '}
+        )
+        assert response.status_code == 403
+
+
+class TestGetQuarantinedQueryResults:
+    def test_should_list_quarantined_query_results_of_providers(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry
+    ):
+        client = create_test_client(
+            cache_metrics_registry,
+            quarantined_query_results_fn_by_name={
+                'provider_1': MagicMock(name='fn_1', return_value=[
+                    QuarantinedQueryResult(manuscript_id='id_1', error='error_1')
+                ]),
+                'provider_2': MagicMock(name='fn_2', return_value=[])
+            }
+        )
+        response = client.get(
+            '/quarantine',
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            'providers': [
+                {
+                    'name': 'provider_1',
+                    'quarantined_count': 1,
+                    'quarantined_query_results': [
+                        {'manuscript_id': 'id_1', 'error': 'error_1'}
+                    ]
+                },
+                {
+                    'name': 'provider_2',
+                    'quarantined_count': 0,
+                    'quarantined_query_results': []
+                }
+            ]
+        }
+
+    def test_should_only_list_named_provider(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry
+    ):
+        client = create_test_client(
+            cache_metrics_registry,
+            quarantined_query_results_fn_by_name={
+                'provider_1': MagicMock(name='fn_1', return_value=[]),
+                'provider_2': MagicMock(name='fn_2', return_value=[])
+            }
+        )
+        response = client.get(
+            '/quarantine',
+            params={'name': 'provider_2'},
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert [provider['name'] for provider in response.json()['providers']] == [
+            'provider_2'
+        ]
+
+    def test_should_return_404_for_unknown_provider(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry
+    ):
+        client = create_test_client(cache_metrics_registry)
+        response = client.get(
+            '/quarantine',
+            params={'name': 'unknown'},
+            headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+        )
+        assert response.status_code == 404
+
+    def test_should_return_401_without_token(
+        self,
+        cache_metrics_registry: SingleObjectCacheMetricsRegistry
+    ):
+        client = create_test_client(cache_metrics_registry)
+        response = client.get('/quarantine')
+        assert response.status_code == 401
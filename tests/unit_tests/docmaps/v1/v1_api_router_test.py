@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from unittest.mock import MagicMock
 import pytest
 
@@ -5,6 +6,7 @@ from fastapi.testclient import TestClient
 from fastapi import FastAPI
 
 from data_hub_api.docmaps.v1.api_router import create_docmaps_router
+from data_hub_api.utils.pagination import InvalidCursorError
 
 PREPRINT_DOI = '10.1101/doi1'
 MANUSCRIPT_ID = 'manuscript_id_1'
@@ -66,3 +68,102 @@ class TestGetEnhancedPreprintsDocmapsIndex:
         )
         assert response.status_code == 200
         assert response.json() == article_docmap_list[0]
+
+
+class TestGetEnhancedPreprintsDocmapsByManuscriptIds:
+    def test_should_return_docmaps_and_missing_manuscript_ids(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_provider_mock.get_docmaps_by_manuscript_ids_map.return_value = {
+            MANUSCRIPT_ID: [{'id': 'docmap_1'}]
+        }
+        client = create_test_client(docmaps_provider_mock)
+        response = client.post(
+            '/v1/by-publisher/elife/get-by-manuscript-ids',
+            json={'manuscript_ids': [MANUSCRIPT_ID, 'unknown']}
+        )
+        docmaps_provider_mock.get_docmaps_by_manuscript_ids_map.assert_called_with(
+            [MANUSCRIPT_ID, 'unknown']
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            'docmaps': [{'id': 'docmap_1'}],
+            'missing_manuscript_ids': ['unknown']
+        }
+
+    def test_should_return_400_if_too_many_manuscript_ids_are_requested(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        app = FastAPI()
+        app.include_router(create_docmaps_router(
+            docmaps_provider_mock,
+            max_bulk_lookup_manuscript_id_count=1
+        ))
+        client = TestClient(app)
+        response = client.post(
+            '/v1/by-publisher/elife/get-by-manuscript-ids',
+            json={'manuscript_ids': [MANUSCRIPT_ID, 'other']}
+        )
+        assert response.status_code == 400
+        docmaps_provider_mock.get_docmaps_by_manuscript_ids_map.assert_not_called()
+
+
+class TestGetEnhancedPreprintsDocmapsIndexPage:
+    def test_should_pass_limit_and_cursor_to_provider(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_index = {'docmaps': [{'id': 'docmap_1'}], 'next_cursor': 'cursor_2'}
+        docmaps_provider_mock.get_docmaps_index.return_value = docmaps_index
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get('/v1/index', params={'limit': 1, 'cursor': 'cursor_1'})
+        docmaps_provider_mock.get_docmaps_index.assert_called_with(
+            limit=1,
+            cursor='cursor_1',
+            updated_since=None
+        )
+        assert response.json() == docmaps_index
+
+    def test_should_not_paginate_by_default(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        client = create_test_client(docmaps_provider_mock)
+        client.get('/v1/index')
+        docmaps_provider_mock.get_docmaps_index.assert_called_with(
+            limit=None,
+            cursor=None,
+            updated_since=None
+        )
+
+    def test_should_pass_timestamp_filters_to_provider(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        client = create_test_client(docmaps_provider_mock)
+        client.get('/v1/index', params={'updated_since': '2022-01-02T03:04:05Z'})
+        docmaps_provider_mock.get_docmaps_index.assert_called_with(
+            limit=None,
+            cursor=None,
+            updated_since=datetime(2022, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        )
+
+    def test_should_return_400_for_invalid_cursor(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_provider_mock.get_docmaps_index.side_effect = InvalidCursorError('invalid')
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get('/v1/index', params={'limit': 1, 'cursor': 'invalid'})
+        assert response.status_code == 400
+
+    def test_should_reject_non_positive_limit(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get('/v1/index', params={'limit': 0})
+        assert response.status_code == 422
+        docmaps_provider_mock.get_docmaps_index.assert_not_called()
@@ -1,3 +1,4 @@
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 from typing import Iterable, cast
 
@@ -9,7 +10,9 @@ from data_hub_api.utils.cache import InMemorySingleObjectCache
 from data_hub_api.docmaps.v1 import provider as provider_module
 from data_hub_api.docmaps.v1.provider import (
     get_docmap_item_for_query_result_item,
-    DocmapsProviderV1
+    DocmapsDataSourceV1,
+    DocmapsProviderV1,
+    DocmapsQueryResultFilter
 )
 from tests.unit_tests.docmaps.v1.v1_test_data import DOCMAPS_QUERY_RESULT_ITEM_1
 
@@ -50,6 +53,152 @@ class TestEnhancedPreprintsDocmapsProviderV1:
             get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
         ]
 
+    def test_should_only_generate_requested_docmaps_in_lazy_mode(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': 'other'},
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps_provider = DocmapsProviderV1(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            lazy_docmaps=True
+        )
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.return_value = {'id': 'docmap_1'}
+            docmaps_provider.get_docmaps_by_manuscript_id(
+                DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+            )
+            docmaps_provider.get_docmaps_by_manuscript_id(
+                DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+            )
+            assert mock.call_count == 1
+            docmaps_index = docmaps_provider.get_docmaps_index()
+            docmaps_provider.get_docmaps_index()
+            assert mock.call_count == 2
+        assert docmaps_index['docmaps'] == [{'id': 'docmap_1'}] * 2
+
+    def test_should_only_generate_docmaps_once_per_cache_generation(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps_provider = DocmapsProviderV1(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.return_value = {'id': 'docmap_1'}
+            docmaps_provider.get_docmaps_index()
+            docmaps_provider.get_docmaps_index()
+            docmaps_provider.get_docmaps_by_manuscript_id(
+                DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+            )
+        assert mock.call_count == 1
+
+    @pytest.mark.parametrize('only_include_evaluated_preprints', [False, True])
+    def test_should_only_return_docmaps_of_requested_manuscript_id(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock,
+        only_include_evaluated_preprints: bool
+    ):
+        query_result = {**DOCMAPS_QUERY_RESULT_ITEM_1, 'has_evaluations': True}
+        iter_dict_from_bq_query_mock.return_value = [
+            {**query_result, 'manuscript_id': 'other'},
+            query_result
+        ]
+        docmaps_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=not only_include_evaluated_preprints,
+            only_include_evaluated_preprints=only_include_evaluated_preprints,
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        docmaps = docmaps_provider.get_docmaps_by_manuscript_id(
+            DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+        )
+        assert docmaps == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, query_result))
+        ]
+        assert not docmaps_provider.get_docmaps_by_manuscript_id('unknown')
+        assert iter_dict_from_bq_query_mock.call_count == 1
+
+    def test_should_return_docmaps_by_manuscript_ids_map_without_unknown_ids(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        query_result = {**DOCMAPS_QUERY_RESULT_ITEM_1, 'has_evaluations': True}
+        iter_dict_from_bq_query_mock.return_value = [query_result]
+        docmaps_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True,
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        manuscript_id = DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+        assert docmaps_provider.get_docmaps_by_manuscript_ids_map(
+            [manuscript_id, 'unknown']
+        ) == {
+            manuscript_id: [
+                get_docmap_item_for_query_result_item(cast(ApiInput, query_result))
+            ]
+        }
+
+    def test_should_paginate_docmaps_index_in_manuscript_id_order(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        query_results = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'has_evaluations': True, 'manuscript_id': manuscript_id}
+            for manuscript_id in ['id_2', 'id_1']
+        ]
+        iter_dict_from_bq_query_mock.return_value = query_results
+        docmaps_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True,
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        first_page = docmaps_provider.get_docmaps_index(limit=1)
+        assert first_page['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, query_results[1]))
+        ]
+        assert docmaps_provider.get_docmaps_index(
+            limit=1,
+            cursor=first_page['next_cursor']
+        ) == {
+            'docmaps': [get_docmap_item_for_query_result_item(cast(ApiInput, query_results[0]))],
+            'next_cursor': None
+        }
+
+    def test_should_filter_docmaps_index_by_updated_since(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        query_results = [
+            {
+                **DOCMAPS_QUERY_RESULT_ITEM_1,
+                'has_evaluations': True,
+                'manuscript_id': 'id_old'
+            },
+            {
+                **DOCMAPS_QUERY_RESULT_ITEM_1,
+                'has_evaluations': True,
+                'manuscript_id': 'id_new',
+                'qc_complete_timestamp': datetime.fromisoformat('2030-01-01T00:00:00+00:00')
+            }
+        ]
+        iter_dict_from_bq_query_mock.return_value = query_results
+        docmaps_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True,
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        assert docmaps_provider.get_docmaps_index(
+            updated_since=datetime.fromisoformat('2029-01-01T00:00:00+00:00')
+        ) == {
+            'docmaps': [get_docmap_item_for_query_result_item(cast(ApiInput, query_results[1]))],
+            'next_cursor': None
+        }
+
     def test_should_add_is_reviewed_preprint_and_is_under_review_type_where_clause_to_query(
         self
     ):
@@ -59,7 +208,7 @@ class TestEnhancedPreprintsDocmapsProviderV1:
             additionally_include_manuscript_ids=[]
         )
         assert provider.docmaps_index_query.rstrip().endswith(
-            'WHERE is_reviewed_preprint_type AND is_or_was_under_review'
+            'WHERE (is_reviewed_preprint_type AND is_or_was_under_review)'
         )
 
     def test_should_add_additional_manuscript_ids_to_query_filter(
@@ -71,7 +220,7 @@ class TestEnhancedPreprintsDocmapsProviderV1:
             additionally_include_manuscript_ids=ADDITIONAL_MANUSCRIPT_IDS
         )
         assert provider.docmaps_index_query.rstrip().endswith(
-            f'OR result.manuscript_id IN {ADDITIONAL_MANUSCRIPT_IDS}'
+            f'OR result.manuscript_id IN {ADDITIONAL_MANUSCRIPT_IDS})'
         )
 
     def test_should_add_has_evaluatons_where_clause_to_query(
@@ -81,7 +230,7 @@ class TestEnhancedPreprintsDocmapsProviderV1:
             only_include_reviewed_preprint_type=False,
             only_include_evaluated_preprints=True
         )
-        assert provider.docmaps_index_query.rstrip().endswith('WHERE has_evaluations')
+        assert provider.docmaps_index_query.rstrip().endswith('WHERE (has_evaluations)')
 
     def test_should_allow_both_reviewed_prerint_type_and_evaluated_preprints_filter(
         self
@@ -91,3 +240,173 @@ class TestEnhancedPreprintsDocmapsProviderV1:
                 only_include_reviewed_preprint_type=True,
                 only_include_evaluated_preprints=True
             )
+
+
+class TestDocmapsQueryResultFilter:
+    def test_should_include_reviewed_preprint_under_review(self):
+        query_result_filter = DocmapsQueryResultFilter(only_include_reviewed_preprint_type=True)
+        assert query_result_filter.is_included({
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'is_reviewed_preprint_type': True,
+            'is_or_was_under_review': True
+        })
+        assert not query_result_filter.is_included({
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'is_reviewed_preprint_type': True,
+            'is_or_was_under_review': False
+        })
+
+    def test_should_include_additional_manuscript_ids(self):
+        query_result_filter = DocmapsQueryResultFilter(
+            only_include_reviewed_preprint_type=True,
+            additionally_include_manuscript_ids=(DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id'],)
+        )
+        assert query_result_filter.is_included({
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'is_reviewed_preprint_type': False
+        })
+        assert query_result_filter.get_sql_condition() == (
+            '(is_reviewed_preprint_type AND is_or_was_under_review)'
+            f" OR result.manuscript_id IN ('{DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']}')"
+        )
+
+    def test_should_only_include_evaluated_preprints(self):
+        query_result_filter = DocmapsQueryResultFilter(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True
+        )
+        assert query_result_filter.is_included({
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'has_evaluations': True
+        })
+        assert not query_result_filter.is_included({
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'has_evaluations': False
+        })
+
+
+class TestDocmapsDataSourceV1:
+    def test_should_query_superset_of_all_provider_filters(self):
+        data_source = DocmapsDataSourceV1()
+        DocmapsProviderV1(
+            only_include_reviewed_preprint_type=True,
+            additionally_include_manuscript_ids=ADDITIONAL_MANUSCRIPT_IDS,
+            data_source=data_source
+        )
+        DocmapsProviderV1(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True,
+            data_source=data_source
+        )
+        assert data_source.docmaps_index_query.rstrip().endswith(
+            '\nWHERE ((is_reviewed_preprint_type AND is_or_was_under_review)'
+            f' OR result.manuscript_id IN {ADDITIONAL_MANUSCRIPT_IDS})'
+            '\nOR (has_evaluations)'
+        )
+
+    def test_should_load_query_results_once_for_providers_sharing_data_source(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        reviewed_query_result = {
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'manuscript_id': 'reviewed_1',
+            'has_evaluations': False
+        }
+        evaluated_query_result = {
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'manuscript_id': 'evaluated_1',
+            'is_reviewed_preprint_type': False,
+            'has_evaluations': True
+        }
+        iter_dict_from_bq_query_mock.return_value = [
+            reviewed_query_result,
+            evaluated_query_result
+        ]
+        data_source = DocmapsDataSourceV1(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        enhanced_preprints_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=True,
+            data_source=data_source
+        )
+        public_reviews_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True,
+            data_source=data_source
+        )
+        assert enhanced_preprints_provider.get_docmaps_index()['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, reviewed_query_result))
+        ]
+        assert public_reviews_provider.get_docmaps_index()['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, evaluated_query_result))
+        ]
+        assert iter_dict_from_bq_query_mock.call_count == 1
+
+    def test_should_generate_docmaps_of_query_results_shared_by_providers_once(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'has_evaluations': True}
+        ]
+        data_source = DocmapsDataSourceV1(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        enhanced_preprints_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=True,
+            data_source=data_source
+        )
+        public_reviews_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True,
+            data_source=data_source
+        )
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.return_value = {'id': 'docmap_1'}
+            assert enhanced_preprints_provider.get_docmaps_index()['docmaps'] == [
+                {'id': 'docmap_1'}
+            ]
+            assert public_reviews_provider.get_docmaps_index()['docmaps'] == [
+                {'id': 'docmap_1'}
+            ]
+        assert mock.call_count == 1
+
+    def test_should_skip_and_list_quarantined_query_results_by_provider(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        invalid_query_result = {
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'manuscript_id': 'invalid',
+            'has_evaluations': True,
+            'evaluations': [None]
+        }
+        del invalid_query_result['qc_complete_timestamp']
+        iter_dict_from_bq_query_mock.return_value = [
+            invalid_query_result,
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        data_source = DocmapsDataSourceV1(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            quarantine_failed_query_results=True
+        )
+        enhanced_preprints_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=True,
+            data_source=data_source
+        )
+        public_reviews_provider = DocmapsProviderV1(
+            only_include_reviewed_preprint_type=False,
+            only_include_evaluated_preprints=True,
+            data_source=data_source
+        )
+        assert enhanced_preprints_provider.get_docmaps_index()['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+        ]
+        assert [
+            quarantined_query_result.manuscript_id
+            for quarantined_query_result
+            in enhanced_preprints_provider.get_quarantined_query_results()
+        ] == ['invalid']
+        assert not public_reviews_provider.get_docmaps_index()['docmaps']
+        assert len(public_reviews_provider.get_quarantined_query_results()) == 1
@@ -55,6 +55,9 @@ LICENSE_1 = 'license_1'
 
 DOCMAPS_QUERY_RESULT_ITEM_1: dict = {
     'manuscript_id': 'manuscript_id_1',
+    'is_reviewed_preprint_type': True,
+    'is_or_was_under_review': True,
+    'has_evaluations': False,
     'qc_complete_timestamp': datetime.fromisoformat('2022-01-01T01:02:03+00:00'),
     'under_review_timestamp': datetime.fromisoformat('2022-02-01T01:02:03+00:00'),
     'publisher_json': '{"id": "publisher_1"}',
@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+import json
 from unittest.mock import MagicMock
 import pytest
 
@@ -5,6 +7,7 @@ from fastapi.testclient import TestClient
 from fastapi import FastAPI
 
 from data_hub_api.docmaps.v2.api_router import create_docmaps_router
+from data_hub_api.utils.pagination import InvalidCursorError
 
 PREPRINT_DOI = '10.1101/doi1'
 MANUSCRIPT_ID = 'manuscript_id_1'
@@ -12,7 +15,9 @@ MANUSCRIPT_ID = 'manuscript_id_1'
 
 @pytest.fixture(name='docmaps_provider_mock')
 def _docmaps_provider_mock() -> MagicMock:
-    return MagicMock(name='docmaps_provider_mock')
+    docmaps_provider_mock = MagicMock(name='docmaps_provider_mock')
+    docmaps_provider_mock.get_docmaps_index_json_bytes.return_value = b'{"docmaps":[]}'
+    return docmaps_provider_mock
 
 
 def create_test_client(docmaps_provider_mock: MagicMock):
@@ -28,7 +33,9 @@ class TestGetEnhancedPreprintsDocmapsIndex:
         docmaps_provider_mock: MagicMock
     ):
         docmaps_index = [{'docmaps': [{'id': 'docmap_1'}, {'id': 'docmap_2'}]}]
-        docmaps_provider_mock.get_docmaps_index.return_value = docmaps_index
+        docmaps_provider_mock.get_docmaps_index_json_bytes.return_value = (
+            json.dumps(docmaps_index).encode('utf-8')
+        )
         client = create_test_client(docmaps_provider_mock)
         response = client.get('/v2/index')
         assert response.json() == docmaps_index
@@ -66,3 +73,166 @@ class TestGetEnhancedPreprintsDocmapsIndex:
         )
         assert response.status_code == 200
         assert response.json() == article_docmap_list[0]
+
+
+class TestGetEnhancedPreprintsDocmapsBySecondaryIdentifiers:
+    @pytest.mark.parametrize('path, provider_method_name, params', [
+        ('get-by-elife-doi', 'get_docmaps_by_elife_doi', {'elife_doi': 'elife_doi_1'}),
+        ('get-by-preprint-doi', 'get_docmaps_by_preprint_doi', {'preprint_doi': PREPRINT_DOI}),
+        (
+            'get-by-long-manuscript-identifier',
+            'get_docmaps_by_long_manuscript_identifier',
+            {'long_manuscript_identifier': 'long_manuscript_identifier_1'}
+        )
+    ])
+    def test_should_return_docmap_from_provider(
+        self,
+        docmaps_provider_mock: MagicMock,
+        path: str,
+        provider_method_name: str,
+        params: dict
+    ):
+        provider_method_mock = getattr(docmaps_provider_mock, provider_method_name)
+        provider_method_mock.return_value = [{'id': 'docmap_1'}]
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get(f'/v2/by-publisher/elife/{path}', params=params)
+        provider_method_mock.assert_called_with(*params.values())
+        assert response.status_code == 200
+        assert response.json() == {'id': 'docmap_1'}
+
+    def test_should_return_404_if_no_docmap_matches(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_provider_mock.get_docmaps_by_preprint_doi.return_value = []
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get(
+            '/v2/by-publisher/elife/get-by-preprint-doi',
+            params={'preprint_doi': PREPRINT_DOI}
+        )
+        assert response.status_code == 404
+        assert response.json() == {
+            'detail': 'No Docmaps available for requested preprint DOI'
+        }
+
+    def test_should_return_409_if_multiple_docmaps_match(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_provider_mock.get_docmaps_by_preprint_doi.return_value = [
+            {'id': 'docmap_1'},
+            {'id': 'docmap_2'}
+        ]
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get(
+            '/v2/by-publisher/elife/get-by-preprint-doi',
+            params={'preprint_doi': PREPRINT_DOI}
+        )
+        assert response.status_code == 409
+
+
+class TestGetEnhancedPreprintsDocmapsByManuscriptIds:
+    def test_should_return_docmaps_and_missing_manuscript_ids(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_provider_mock.get_docmaps_by_manuscript_ids_map.return_value = {
+            MANUSCRIPT_ID: [{'id': 'docmap_1'}]
+        }
+        client = create_test_client(docmaps_provider_mock)
+        response = client.post(
+            '/v2/by-publisher/elife/get-by-manuscript-ids',
+            json={'manuscript_ids': [MANUSCRIPT_ID, 'unknown']}
+        )
+        docmaps_provider_mock.get_docmaps_by_manuscript_ids_map.assert_called_with(
+            [MANUSCRIPT_ID, 'unknown']
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            'docmaps': [{'id': 'docmap_1'}],
+            'missing_manuscript_ids': ['unknown']
+        }
+
+    def test_should_return_400_if_too_many_manuscript_ids_are_requested(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        app = FastAPI()
+        app.include_router(create_docmaps_router(
+            docmaps_provider_mock,
+            max_bulk_lookup_manuscript_id_count=1
+        ))
+        client = TestClient(app)
+        response = client.post(
+            '/v2/by-publisher/elife/get-by-manuscript-ids',
+            json={'manuscript_ids': [MANUSCRIPT_ID, 'other']}
+        )
+        assert response.status_code == 400
+        docmaps_provider_mock.get_docmaps_by_manuscript_ids_map.assert_not_called()
+
+
+class TestGetEnhancedPreprintsDocmapsIndexPage:
+    def test_should_pass_limit_and_cursor_to_provider(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_index = {'docmaps': [{'id': 'docmap_1'}], 'next_cursor': 'cursor_2'}
+        docmaps_provider_mock.get_docmaps_index_json_bytes.return_value = (
+            json.dumps(docmaps_index).encode('utf-8')
+        )
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get('/v2/index', params={'limit': 1, 'cursor': 'cursor_1'})
+        docmaps_provider_mock.get_docmaps_index_json_bytes.assert_called_with(
+            limit=1,
+            cursor='cursor_1',
+            updated_since=None, published_since=None
+        )
+        assert response.json() == docmaps_index
+
+    def test_should_not_paginate_by_default(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        client = create_test_client(docmaps_provider_mock)
+        client.get('/v2/index')
+        docmaps_provider_mock.get_docmaps_index_json_bytes.assert_called_with(
+            limit=None,
+            cursor=None,
+            updated_since=None, published_since=None
+        )
+
+    def test_should_pass_timestamp_filters_to_provider(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        client = create_test_client(docmaps_provider_mock)
+        client.get('/v2/index', params={
+            'updated_since': '2022-01-02T03:04:05Z',
+            'published_since': '2022-01-01'
+        })
+        docmaps_provider_mock.get_docmaps_index_json_bytes.assert_called_with(
+            limit=None,
+            cursor=None,
+            updated_since=datetime(2022, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            published_since=datetime(2022, 1, 1)
+        )
+
+    def test_should_return_400_for_invalid_cursor(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        docmaps_provider_mock.get_docmaps_index_json_bytes.side_effect = (
+            InvalidCursorError('invalid')
+        )
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get('/v2/index', params={'limit': 1, 'cursor': 'invalid'})
+        assert response.status_code == 400
+
+    def test_should_reject_non_positive_limit(
+        self,
+        docmaps_provider_mock: MagicMock
+    ):
+        client = create_test_client(docmaps_provider_mock)
+        response = client.get('/v2/index', params={'limit': 0})
+        assert response.status_code == 422
+        docmaps_provider_mock.get_docmaps_index_json_bytes.assert_not_called()
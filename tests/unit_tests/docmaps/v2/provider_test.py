@@ -1,16 +1,39 @@
+from datetime import datetime
+import json
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from unittest.mock import patch, MagicMock
-from typing import Iterable, cast
+from time import perf_counter
+from typing import Any, Iterable, List, cast
+import logging
 
 import pytest
+from fastapi.encoders import jsonable_encoder
+
 from data_hub_api.docmaps.v2.api_input_typing import ApiInput
 
-from data_hub_api.utils.cache import InMemorySingleObjectCache
+from data_hub_api.utils.cache import InMemorySingleObjectCache, SharedSnapshotFileSingleObjectCache
+from data_hub_api.utils.docmaps_provider_data import DocmapsProviderDataSnapshotCodec
+from data_hub_api.utils.memory import MemoryBudget, MemoryBudgetExceededError
+from data_hub_api.utils import parallel as parallel_module
+from data_hub_api.utils.parallel import ParallelMapConfig
 from data_hub_api.docmaps.v2 import provider as provider_module
 from data_hub_api.docmaps.v2.provider import (
     get_docmap_item_for_query_result_item,
-    DocmapsProvider
+    DocmapsProvider,
+    DocmapsProviderData
+)
+from tests.unit_tests.docmaps.v2.test_data import (
+    DOCMAPS_QUERY_RESULT_ITEM_1,
+    DOI_1,
+    ELIFE_DOI_1,
+    LONG_MANUSCRIPT_ID_1,
+    MANUSCRIPT_VERSION_1
 )
-from tests.unit_tests.docmaps.v2.test_data import DOCMAPS_QUERY_RESULT_ITEM_1
+from tests.unit_tests.utils.cache_test import wait_for_background_refresh
+
+
+LOGGER = logging.getLogger(__name__)
 
 
 @pytest.fixture(name='iter_dict_from_bq_query_mock', autouse=True)
@@ -48,3 +71,423 @@ class TestEnhancedPreprintsDocmapsProvider:
         assert docmaps_index['docmaps'] == [
             get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
         ]
+
+    def test_should_only_generate_requested_docmaps_in_lazy_mode(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': 'other'},
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            lazy_docmaps=True
+        )
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.return_value = {'id': 'docmap_1'}
+            docmaps_provider.get_docmaps_by_manuscript_id(
+                DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+            )
+            docmaps_provider.get_docmaps_by_manuscript_id(
+                DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+            )
+            assert mock.call_count == 1
+            docmaps_index = docmaps_provider.get_docmaps_index()
+            docmaps_provider.get_docmaps_index()
+            assert mock.call_count == 2
+        assert docmaps_index['docmaps'] == [{'id': 'docmap_1'}] * 2
+
+    def test_should_only_generate_docmaps_once_per_cache_generation(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.return_value = {'id': 'docmap_1'}
+            docmaps_provider.get_docmaps_index()
+            docmaps_provider.get_docmaps_index()
+            docmaps_provider.get_docmaps_by_manuscript_id(
+                DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+            )
+        assert mock.call_count == 1
+
+    def test_should_only_return_docmaps_of_requested_manuscript_id(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': 'other'},
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps = DocmapsProvider().get_docmaps_by_manuscript_id(
+            DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+        )
+        assert docmaps == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+        ]
+
+    def test_should_return_empty_list_for_unknown_manuscript_id(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        assert not DocmapsProvider().get_docmaps_by_manuscript_id('unknown')
+
+    @pytest.mark.parametrize('manuscript_count', [10_000, 100_000])
+    def test_should_measure_manuscript_id_lookup_latency(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock,
+        manuscript_count: int
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            {'manuscript_id': str(index)}
+            for index in range(manuscript_count)
+        ]
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=60)
+        )
+        lookup_count = 1000
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.return_value = {'id': 'docmap_1'}
+            docmaps_provider.preload()
+            start_time = perf_counter()
+            results = [
+                docmaps_provider.get_docmaps_by_manuscript_id(
+                    str(index * manuscript_count // lookup_count)
+                )
+                for index in range(lookup_count)
+            ]
+            duration = perf_counter() - start_time
+        LOGGER.info(
+            'Lookup benchmark: manuscripts=%d, lookups=%d, time=%.3f us per lookup',
+            manuscript_count,
+            lookup_count,
+            duration / lookup_count * 1_000_000
+        )
+        assert [len(docmaps) for docmaps in results] == [1] * lookup_count
+        assert mock.call_count == manuscript_count
+
+    def test_should_refuse_query_results_exceeding_memory_budget(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps_provider = DocmapsProvider(
+            memory_budget=MemoryBudget(
+                name='docmaps',
+                max_size_in_bytes=1,
+                refuse_if_exceeded=True
+            )
+        )
+        with pytest.raises(MemoryBudgetExceededError):
+            docmaps_provider.get_docmaps_index()
+
+    def test_should_reload_query_results_on_refresh(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        query_results_cache = InMemorySingleObjectCache[DocmapsProviderData](
+            max_age_in_seconds=10
+        )
+        docmaps_provider = DocmapsProvider(query_results_cache=query_results_cache)
+        docmaps_provider.get_docmaps_index()
+        generation = docmaps_provider.refresh()
+        wait_for_background_refresh(query_results_cache)
+        assert iter_dict_from_bq_query_mock.call_count == 2
+        assert query_results_cache.generation == generation
+
+    def test_should_only_regenerate_docmaps_of_changed_query_results_on_refresh(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        changed_query_result = {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': 'other'}
+        iter_dict_from_bq_query_mock.return_value = [
+            DOCMAPS_QUERY_RESULT_ITEM_1,
+            changed_query_result
+        ]
+        query_results_cache = InMemorySingleObjectCache[DocmapsProviderData](
+            max_age_in_seconds=10
+        )
+        docmaps_provider = DocmapsProvider(query_results_cache=query_results_cache)
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.side_effect = lambda query_result: {'id': query_result['manuscript_id']}
+            docmaps_provider.get_docmaps_index()
+            iter_dict_from_bq_query_mock.return_value = [
+                DOCMAPS_QUERY_RESULT_ITEM_1,
+                {**changed_query_result, 'elife_doi': 'changed'}
+            ]
+            docmaps_provider.refresh()
+            wait_for_background_refresh(query_results_cache)
+            docmaps_index = docmaps_provider.get_docmaps_index()
+        assert mock.call_count == 3
+        assert docmaps_index['docmaps'] == [
+            {'id': DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']},
+            {'id': 'other'}
+        ]
+
+    def test_should_generate_same_docmaps_using_process_pool(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        query_results = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': str(index)}
+            for index in range(5)
+        ]
+        iter_dict_from_bq_query_mock.return_value = query_results
+        docmaps_index = DocmapsProvider(
+            parallel_map_config=ParallelMapConfig(
+                process_count=2,
+                chunk_size=2,
+                min_parallel_item_count=1
+            )
+        ).get_docmaps_index()
+        assert docmaps_index['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, query_result))
+            for query_result in query_results
+        ]
+
+    def test_should_share_process_pool_between_batches_of_load(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        query_results = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': str(index)}
+            for index in range(4)
+        ]
+        iter_dict_from_bq_query_mock.return_value = query_results
+        with patch.object(
+            parallel_module,
+            'ProcessPoolExecutor',
+            wraps=ProcessPoolExecutor
+        ) as process_pool_executor_mock:
+            docmaps_index = DocmapsProvider(
+                parallel_map_config=ParallelMapConfig(
+                    process_count=2,
+                    chunk_size=1,
+                    min_parallel_item_count=1
+                ),
+                query_result_batch_size=2
+            ).get_docmaps_index()
+        assert len(docmaps_index['docmaps']) == 4
+        assert process_pool_executor_mock.call_count == 1
+
+    def test_should_generate_docmaps_while_streaming_query_results(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        events = []
+
+        def iter_query_results():
+            for manuscript_id in ['1', '2']:
+                events.append(f'row_{manuscript_id}')
+                yield {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': manuscript_id}
+
+        iter_dict_from_bq_query_mock.return_value = iter_query_results()
+        docmaps_provider = DocmapsProvider(query_result_batch_size=1)
+        with patch.object(provider_module, 'get_docmap_item_for_query_result_item') as mock:
+            mock.side_effect = lambda query_result: events.append(
+                f'docmap_{query_result["manuscript_id"]}'
+            )
+            docmaps_provider.preload()
+        assert events == ['row_1', 'docmap_1', 'row_2', 'docmap_2']
+
+    @pytest.mark.parametrize('lazy_docmaps', [False, True])
+    @pytest.mark.parametrize('invalid_manuscript_versions', [None, [None], 'invalid'])
+    def test_should_skip_and_list_quarantined_query_results(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock,
+        lazy_docmaps: bool,
+        invalid_manuscript_versions: Any
+    ):
+        invalid_query_result = {
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'manuscript_id': 'invalid',
+            'manuscript_versions': invalid_manuscript_versions
+        }
+        iter_dict_from_bq_query_mock.return_value = [
+            invalid_query_result,
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            lazy_docmaps=lazy_docmaps,
+            quarantine_failed_query_results=True
+        )
+        docmaps_index = docmaps_provider.get_docmaps_index()
+        assert docmaps_index['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+        ]
+        assert [
+            quarantined_query_result.manuscript_id
+            for quarantined_query_result in docmaps_provider.get_quarantined_query_results()
+        ] == ['invalid']
+
+    def test_should_fail_load_for_invalid_query_result_without_quarantine(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        invalid_query_result = {**DOCMAPS_QUERY_RESULT_ITEM_1}
+        del invalid_query_result['manuscript_versions']
+        iter_dict_from_bq_query_mock.return_value = [invalid_query_result]
+        with pytest.raises(KeyError):
+            DocmapsProvider().get_docmaps_index()
+
+    @pytest.mark.parametrize('lazy_docmaps', [False, True])
+    def test_should_return_docmaps_by_secondary_identifiers(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock,
+        lazy_docmaps: bool
+    ):
+        iter_dict_from_bq_query_mock.return_value = [DOCMAPS_QUERY_RESULT_ITEM_1]
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            lazy_docmaps=lazy_docmaps
+        )
+        expected_docmaps = [
+            get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+        ]
+        assert docmaps_provider.get_docmaps_by_elife_doi(ELIFE_DOI_1) == expected_docmaps
+        assert docmaps_provider.get_docmaps_by_preprint_doi(DOI_1) == expected_docmaps
+        assert docmaps_provider.get_docmaps_by_long_manuscript_identifier(
+            LONG_MANUSCRIPT_ID_1
+        ) == expected_docmaps
+        assert not docmaps_provider.get_docmaps_by_preprint_doi('unknown')
+        assert iter_dict_from_bq_query_mock.call_count == 1
+
+    def test_should_return_docmaps_by_manuscript_ids_map_without_unknown_ids(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [DOCMAPS_QUERY_RESULT_ITEM_1]
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        manuscript_id = DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+        assert docmaps_provider.get_docmaps_by_manuscript_ids_map(
+            [manuscript_id, 'unknown']
+        ) == {
+            manuscript_id: [
+                get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+            ]
+        }
+
+    @pytest.mark.parametrize('lazy_docmaps', [False, True])
+    def test_should_paginate_docmaps_index_in_manuscript_id_order(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock,
+        lazy_docmaps: bool
+    ):
+        query_results = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': manuscript_id}
+            for manuscript_id in ['id_3', 'id_1', 'id_2']
+        ]
+        iter_dict_from_bq_query_mock.return_value = query_results
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            lazy_docmaps=lazy_docmaps
+        )
+        first_page = docmaps_provider.get_docmaps_index(limit=2)
+        assert first_page['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, query_results[1])),
+            get_docmap_item_for_query_result_item(cast(ApiInput, query_results[2]))
+        ]
+        last_page = docmaps_provider.get_docmaps_index(
+            limit=2,
+            cursor=first_page['next_cursor']
+        )
+        assert last_page == {
+            'docmaps': [get_docmap_item_for_query_result_item(cast(ApiInput, query_results[0]))],
+            'next_cursor': None
+        }
+
+    def test_should_not_paginate_docmaps_index_by_default(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [DOCMAPS_QUERY_RESULT_ITEM_1]
+        docmaps_provider = DocmapsProvider()
+        assert docmaps_provider.get_docmaps_index() == {
+            'docmaps': [
+                get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+            ]
+        }
+
+    @pytest.mark.parametrize('lazy_docmaps', [False, True])
+    def test_should_filter_docmaps_index_by_updated_and_published_since(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock,
+        lazy_docmaps: bool
+    ):
+        old_query_result = {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': 'id_old'}
+        new_query_result = {
+            **DOCMAPS_QUERY_RESULT_ITEM_1,
+            'manuscript_id': 'id_new',
+            'manuscript_versions': [{
+                **MANUSCRIPT_VERSION_1,
+                'rp_publication_timestamp': datetime.fromisoformat('2030-01-01T00:00:00+00:00')
+            }]
+        }
+        iter_dict_from_bq_query_mock.return_value = [new_query_result, old_query_result]
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            lazy_docmaps=lazy_docmaps
+        )
+        expected_docmaps_index = {
+            'docmaps': [get_docmap_item_for_query_result_item(cast(ApiInput, new_query_result))],
+            'next_cursor': None
+        }
+        since = datetime.fromisoformat('2029-01-01T00:00:00+00:00')
+        assert docmaps_provider.get_docmaps_index(updated_since=since) == expected_docmaps_index
+        assert docmaps_provider.get_docmaps_index(
+            published_since=since
+        ) == expected_docmaps_index
+        assert docmaps_provider.get_docmaps_index(
+            limit=1,
+            updated_since=datetime.fromisoformat('2000-01-01T00:00:00+00:00')
+        )['next_cursor']
+
+    @pytest.mark.parametrize('use_shared_snapshot', [False, True])
+    def test_should_return_docmaps_index_json_bytes(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock,
+        tmp_path: Path,
+        use_shared_snapshot: bool
+    ):
+        query_results = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': manuscript_id}
+            for manuscript_id in ['id_3', 'id_1', 'id_2']
+        ]
+        iter_dict_from_bq_query_mock.return_value = query_results
+        docmaps_provider = DocmapsProvider(
+            query_results_cache=(
+                SharedSnapshotFileSingleObjectCache(
+                    max_age_in_seconds=10,
+                    snapshot_path=tmp_path / 'docmaps.snapshot',
+                    snapshot_codec=DocmapsProviderDataSnapshotCodec()
+                )
+                if use_shared_snapshot
+                else InMemorySingleObjectCache(max_age_in_seconds=10)
+            )
+        )
+        kwargs_list: List[dict] = [
+            {},
+            {'limit': 2},
+            {'limit': 2, 'updated_since': datetime(2000, 1, 1)}
+        ]
+        for kwargs in kwargs_list:
+            assert json.loads(
+                docmaps_provider.get_docmaps_index_json_bytes(**kwargs)
+            ) == jsonable_encoder(docmaps_provider.get_docmaps_index(**kwargs))
@@ -1,3 +1,4 @@
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 from typing import Iterable, cast
 
@@ -15,7 +16,9 @@ from data_hub_api.kotahi_docmaps.v1.provider import (
 from tests.unit_tests.kotahi_docmaps.v1.test_data import (
     DOCMAPS_QUERY_RESULT_ITEM_1,
     DOCMAPS_QUERY_RESULT_ITEM_WITH_EVALUATION_EMAILS_1,
+    DOI_1,
     ELIFE_ASSESSMENT_1,
+    ELIFE_DOI_1,
     LONG_MANUSCRIPT_ID_1
 )
 
@@ -86,3 +89,134 @@ class TestEnhancedPreprintsDocmapsProvider:
         )
         result = DocmapsProvider().get_evaluation_text_by_evaluation_id(evaluation_id)
         assert result == ELIFE_ASSESSMENT_1.strip()
+
+    def test_should_skip_and_list_quarantined_query_results(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        invalid_query_result = {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': 'invalid'}
+        del invalid_query_result['publisher_json']
+        iter_dict_from_bq_query_mock.return_value = [
+            invalid_query_result,
+            DOCMAPS_QUERY_RESULT_ITEM_1
+        ]
+        docmaps_provider = DocmapsProvider(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            quarantine_failed_query_results=True
+        )
+        assert docmaps_provider.get_docmaps_index()['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+        ]
+        assert [
+            quarantined_query_result.manuscript_id
+            for quarantined_query_result in docmaps_provider.get_quarantined_query_results()
+        ] == ['invalid']
+
+    def test_should_skip_and_list_structurally_invalid_query_results(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [
+            {
+                **DOCMAPS_QUERY_RESULT_ITEM_1,
+                'manuscript_id': 'invalid',
+                'manuscript_versions': None
+            },
+            DOCMAPS_QUERY_RESULT_ITEM_WITH_EVALUATION_EMAILS_1
+        ]
+        docmaps_provider = DocmapsProvider(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10),
+            quarantine_failed_query_results=True
+        )
+        assert len(docmaps_provider.get_docmaps_index()['docmaps']) == 1
+        assert [
+            quarantined_query_result.manuscript_id
+            for quarantined_query_result in docmaps_provider.get_quarantined_query_results()
+        ] == ['invalid']
+        evaluation_id = generate_evaluation_id(
+            LONG_MANUSCRIPT_ID_1,
+            DOCMAP_EVALUATION_TYPE_FOR_EVALUATION_SUMMARY,
+            1
+        )
+        assert docmaps_provider.get_evaluation_text_by_evaluation_id(evaluation_id) == (
+            ELIFE_ASSESSMENT_1.strip()
+        )
+
+    def test_should_return_docmaps_by_secondary_identifiers(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [DOCMAPS_QUERY_RESULT_ITEM_1]
+        docmaps_provider = DocmapsProvider(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        expected_docmaps = [
+            get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+        ]
+        assert docmaps_provider.get_docmaps_by_elife_doi(ELIFE_DOI_1) == expected_docmaps
+        assert docmaps_provider.get_docmaps_by_preprint_doi(DOI_1) == expected_docmaps
+        assert docmaps_provider.get_docmaps_by_long_manuscript_identifier(
+            LONG_MANUSCRIPT_ID_1
+        ) == expected_docmaps
+        assert not docmaps_provider.get_docmaps_by_elife_doi('unknown')
+
+    def test_should_return_docmaps_by_manuscript_ids_map_without_unknown_ids(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [DOCMAPS_QUERY_RESULT_ITEM_1]
+        docmaps_provider = DocmapsProvider(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        manuscript_id = DOCMAPS_QUERY_RESULT_ITEM_1['manuscript_id']
+        assert docmaps_provider.get_docmaps_by_manuscript_ids_map(
+            [manuscript_id, 'unknown']
+        ) == {
+            manuscript_id: [
+                get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+            ]
+        }
+
+    def test_should_paginate_docmaps_index_in_manuscript_id_order(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        query_results = [
+            {**DOCMAPS_QUERY_RESULT_ITEM_1, 'manuscript_id': manuscript_id}
+            for manuscript_id in ['id_2', 'id_1']
+        ]
+        iter_dict_from_bq_query_mock.return_value = query_results
+        docmaps_provider = DocmapsProvider(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        first_page = docmaps_provider.get_docmaps_index(limit=1)
+        assert first_page['docmaps'] == [
+            get_docmap_item_for_query_result_item(cast(ApiInput, query_results[1]))
+        ]
+        assert docmaps_provider.get_docmaps_index(
+            limit=1,
+            cursor=first_page['next_cursor']
+        ) == {
+            'docmaps': [get_docmap_item_for_query_result_item(cast(ApiInput, query_results[0]))],
+            'next_cursor': None
+        }
+
+    def test_should_filter_docmaps_index_by_updated_since(
+        self,
+        iter_dict_from_bq_query_mock: MagicMock
+    ):
+        iter_dict_from_bq_query_mock.return_value = [DOCMAPS_QUERY_RESULT_ITEM_1]
+        docmaps_provider = DocmapsProvider(
+            data_cache=InMemorySingleObjectCache(max_age_in_seconds=10)
+        )
+        assert docmaps_provider.get_docmaps_index(
+            updated_since=datetime.fromisoformat('2000-01-01T00:00:00+00:00')
+        ) == {
+            'docmaps': [
+                get_docmap_item_for_query_result_item(cast(ApiInput, DOCMAPS_QUERY_RESULT_ITEM_1))
+            ],
+            'next_cursor': None
+        }
+        assert docmaps_provider.get_docmaps_index(
+            updated_since=datetime.fromisoformat('2030-01-01T00:00:00+00:00')
+        ) == {'docmaps': [], 'next_cursor': None}
@@ -1,3 +1,4 @@
+from threading import Event
 from unittest.mock import ANY, call, patch, MagicMock
 from typing import Iterable, Sequence
 
@@ -7,12 +8,21 @@ from fastapi.testclient import TestClient
 
 from data_hub_api import main as main_module
 from data_hub_api.config import ADDITIONAL_MANUSCRIPT_IDS
-from data_hub_api.main import create_app
+from data_hub_api.main import create_app, create_single_object_cache, warm_up_caches
+from data_hub_api.docmaps.v2 import provider as docmaps_v2_provider_module
+from data_hub_api.utils.cache import (
+    InMemorySingleObjectCache,
+    SharedSnapshotFileSingleObjectCache,
+    SnapshotFileSingleObjectCache
+)
+from data_hub_api.utils.cache_metrics import SingleObjectCacheMetricsRegistry
 
 
 PREPRINT_DOI = '10.1101/doi1'
 MANUSCRIPT_ID = 'manuscript_id_1'
 
+ADMIN_API_TOKEN_1 = 'admin_api_token_1'
+
 
 @pytest.fixture(name='enhanced_preprints_docmaps_provider_class_mock', autouse=True)
 def _enhanced_preprints_docmaps_provider_class_mock() -> Iterable[MagicMock]:
@@ -43,6 +53,86 @@ def _public_reviews_docmaps_provider_mock(
     return docmaps_provider_mock_list[1]
 
 
+class TestCreateSingleObjectCache:
+    def test_should_create_in_memory_cache_by_default(self):
+        with patch.object(main_module, 'CACHE_SNAPSHOT_DIR', None):
+            cache = create_single_object_cache('cache_1')
+        assert type(cache) is InMemorySingleObjectCache  # pylint: disable=unidiomatic-typecheck
+
+    def test_should_record_metrics_of_in_memory_cache(self):
+        cache_metrics_registry = SingleObjectCacheMetricsRegistry()
+        with patch.object(main_module, 'CACHE_SNAPSHOT_DIR', None):
+            cache = create_single_object_cache(
+                'cache_1',
+                cache_metrics_registry=cache_metrics_registry
+            )
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        stats = cache_metrics_registry.get_stats_list()[0]
+        assert stats.name == 'cache_1'
+        assert stats.load_count == 1
+        assert stats.hit_count == 1
+
+    def test_should_create_snapshot_file_cache_if_snapshot_dir_is_configured(self):
+        with patch.object(main_module, 'CACHE_SNAPSHOT_DIR', '/path/to/snapshots'):
+            cache = create_single_object_cache('cache_1')
+        assert isinstance(cache, SnapshotFileSingleObjectCache)
+        assert str(cache.snapshot_path) == '/path/to/snapshots/cache_1.pickle'
+
+    def test_should_create_shared_snapshot_file_cache_if_shared_snapshot_dir_is_configured(self):
+        with patch.object(main_module, 'SHARED_CACHE_SNAPSHOT_DIR', '/path/to/shared'):
+            cache = create_single_object_cache('cache_1')
+        assert isinstance(cache, SharedSnapshotFileSingleObjectCache)
+        assert str(cache.snapshot_path) == '/path/to/shared/cache_1.snapshot'
+
+
+class TestWarmUpCaches:
+    def test_should_call_all_preload_functions(self):
+        preload_fn_by_name = {
+            'cache_1': MagicMock(name='preload_fn_1'),
+            'cache_2': MagicMock(name='preload_fn_2')
+        }
+        result = warm_up_caches(preload_fn_by_name, timeout_in_seconds=5)
+        assert result is True
+        for preload_fn in preload_fn_by_name.values():
+            preload_fn.assert_called_once()
+
+    def test_should_return_false_if_any_preload_function_failed(self):
+        preload_fn_by_name = {
+            'cache_1': MagicMock(name='preload_fn_1'),
+            'cache_2': MagicMock(name='preload_fn_2', side_effect=RuntimeError('failed'))
+        }
+        assert warm_up_caches(preload_fn_by_name, timeout_in_seconds=5) is False
+
+    def test_should_return_false_if_timeout_is_reached(self):
+        continue_event = Event()
+        try:
+            result = warm_up_caches(
+                {'cache_1': lambda: continue_event.wait(timeout=5)},
+                timeout_in_seconds=0.01
+            )
+        finally:
+            continue_event.set()
+        assert result is False
+
+
+class TestLifespan:
+    def test_should_preload_all_providers_on_startup(
+        self,
+        docmaps_provider_mock_list: Sequence[MagicMock]
+    ):
+        with patch.object(main_module, 'DocmapsProvider') as docmaps_provider_class_mock:
+            with patch.object(main_module, 'KotahiDocmapsProvider') as kotahi_provider_class_mock:
+                with TestClient(create_app()):
+                    pass
+        for provider_mock in [
+            *docmaps_provider_mock_list,
+            docmaps_provider_class_mock.return_value,
+            kotahi_provider_class_mock.return_value
+        ]:
+            provider_mock.preload.assert_called_once()
+
+
 def test_read_main():
     client = TestClient(create_app())
     response = client.get("/")
@@ -115,13 +205,32 @@ class TestGetEnhancedPreprintsDocmapsIndex:
                     only_include_reviewed_preprint_type=True,
                     only_include_evaluated_preprints=False,
                     additionally_include_manuscript_ids=ADDITIONAL_MANUSCRIPT_IDS,
-                    query_results_cache=ANY
+                    data_source=ANY
                 ),
                 call(
                     only_include_reviewed_preprint_type=False,
                     only_include_evaluated_preprints=True,
-                    query_results_cache=ANY
+                    data_source=ANY
                 )
             ],
             any_order=False
         )
+
+
+class TestGetCacheStats:
+    def test_should_update_cache_stats_after_request(self):
+        with patch.object(main_module, 'get_bq_table_last_modified_time'):
+            with patch.object(docmaps_v2_provider_module, 'iter_dict_from_bq_query') as mock:
+                mock.return_value = []
+                with patch.object(main_module, 'ADMIN_API_TOKEN', ADMIN_API_TOKEN_1):
+                    client = TestClient(create_app())
+                client.get('/enhanced-preprints/docmaps/v2/index')
+                client.get('/enhanced-preprints/docmaps/v2/index')
+                response = client.get(
+                    '/admin/cache/stats',
+                    headers={'Authorization': f'Bearer {ADMIN_API_TOKEN_1}'}
+                )
+        stats_by_name = {stats['name']: stats for stats in response.json()['caches']}
+        stats = stats_by_name['enhanced_preprints_docmaps_v2']
+        assert stats['load_count'] == 1
+        assert stats['hit_count'] + stats['miss_count'] >= 2
@@ -1,3 +1,4 @@
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 from typing import Iterable
 
@@ -6,7 +7,10 @@ import pytest
 from google.cloud.bigquery.table import Row
 
 from data_hub_api.utils import bigquery as bigquery_module
-from data_hub_api.utils.bigquery import iter_dict_from_bq_query
+from data_hub_api.utils.bigquery import (
+    get_bq_table_last_modified_time,
+    iter_dict_from_bq_query
+)
 
 
 @pytest.fixture(name="bigquery_mock")
@@ -34,3 +38,15 @@ class TestIterDictFromBqQuery:
             "key1": "value1",
             "key2": "value2"
         }]
+
+
+class TestGetBqTableLastModifiedTime:
+    def test_should_return_modified_time_of_table(self, bq_client_mock: MagicMock):
+        modified = datetime.fromisoformat('2024-01-02T03:04:05+00:00')
+        bq_client_mock.return_value.get_table.return_value.modified = modified
+        result = get_bq_table_last_modified_time(
+            project_name='project1',
+            table_id='project1.dataset1.table1'
+        )
+        bq_client_mock.return_value.get_table.assert_called_with('project1.dataset1.table1')
+        assert result == modified
@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from data_hub_api.utils.bulk_lookup import (
+    get_bulk_lookup_response_or_raise_http_exception
+)
+
+
+class TestGetBulkLookupResponseOrRaiseHttpException:
+    def test_should_return_docmaps_and_missing_manuscript_ids_in_requested_order(self):
+        response = get_bulk_lookup_response_or_raise_http_exception(
+            ['id_2', 'id_missing', 'id_1'],
+            docmaps_by_manuscript_ids_fn=lambda _: {
+                'id_1': [{'id': 'docmap_1'}],
+                'id_2': [{'id': 'docmap_2'}]
+            }
+        )
+        assert response == {
+            'docmaps': [{'id': 'docmap_2'}, {'id': 'docmap_1'}],
+            'missing_manuscript_ids': ['id_missing']
+        }
+
+    def test_should_look_up_duplicate_manuscript_ids_once(self):
+        docmaps_by_manuscript_ids_fn = MagicMock(name='docmaps_by_manuscript_ids_fn')
+        docmaps_by_manuscript_ids_fn.return_value = {'id_1': [{'id': 'docmap_1'}]}
+        response = get_bulk_lookup_response_or_raise_http_exception(
+            ['id_1', 'id_1'],
+            docmaps_by_manuscript_ids_fn=docmaps_by_manuscript_ids_fn
+        )
+        docmaps_by_manuscript_ids_fn.assert_called_once_with(['id_1'])
+        assert response['docmaps'] == [{'id': 'docmap_1'}]
+
+    def test_should_raise_http_exception_if_too_many_manuscript_ids_are_requested(self):
+        docmaps_by_manuscript_ids_fn = MagicMock(name='docmaps_by_manuscript_ids_fn')
+        with pytest.raises(HTTPException) as exc_info:
+            get_bulk_lookup_response_or_raise_http_exception(
+                ['id_1', 'id_2', 'id_3'],
+                docmaps_by_manuscript_ids_fn=docmaps_by_manuscript_ids_fn,
+                max_manuscript_id_count=2
+            )
+        assert exc_info.value.status_code == 400
+        docmaps_by_manuscript_ids_fn.assert_not_called()
@@ -0,0 +1,69 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from data_hub_api.utils.cache_metrics import (
+    SingleObjectCacheMetrics,
+    SingleObjectCacheMetricsRegistry
+)
+
+
+class TestSingleObjectCacheMetrics:
+    def test_should_count_hits_and_misses(self):
+        metrics = SingleObjectCacheMetrics('cache_1')
+        metrics.record_hit()
+        metrics.record_hit()
+        metrics.record_miss()
+        stats = metrics.get_stats()
+        assert stats.hit_count == 2
+        assert stats.miss_count == 1
+
+    def test_should_record_load_duration_histogram(self):
+        metrics = SingleObjectCacheMetrics('cache_1')
+        metrics.record_load('value_1', duration_in_seconds=0.05)
+        metrics.record_load('value_1', duration_in_seconds=3)
+        metrics.record_load('value_1', duration_in_seconds=1000)
+        stats = metrics.get_stats()
+        assert stats.load_count == 3
+        assert stats.last_load_duration_in_seconds == 1000
+        assert stats.load_duration_histogram['0.1'] == 1
+        assert stats.load_duration_histogram['5'] == 1
+        assert stats.load_duration_histogram['+Inf'] == 1
+        assert sum(stats.load_duration_histogram.values()) == 3
+
+    def test_should_estimate_size_of_loaded_value(self):
+        estimate_size_fn = MagicMock(name='estimate_size_fn', return_value=123)
+        metrics = SingleObjectCacheMetrics('cache_1', estimate_size_fn=estimate_size_fn)
+        metrics.record_load('value_1', duration_in_seconds=1)
+        estimate_size_fn.assert_called_with('value_1')
+        assert metrics.get_stats().estimated_size_in_bytes == 123
+
+    def test_should_ignore_failure_to_estimate_size(self):
+        metrics = SingleObjectCacheMetrics(
+            'cache_1',
+            estimate_size_fn=MagicMock(name='estimate_size_fn', side_effect=RuntimeError())
+        )
+        metrics.record_load('value_1', duration_in_seconds=1)
+        assert metrics.get_stats().estimated_size_in_bytes is None
+
+    def test_should_record_last_error(self):
+        metrics = SingleObjectCacheMetrics('cache_1')
+        metrics.record_load_failure(RuntimeError('load failed'))
+        stats = metrics.get_stats()
+        assert stats.load_failure_count == 1
+        assert stats.last_error == repr(RuntimeError('load failed'))
+        assert stats.seconds_since_last_error is not None
+
+
+class TestSingleObjectCacheMetricsRegistry:
+    def test_should_return_stats_of_all_created_metrics(self):
+        registry = SingleObjectCacheMetricsRegistry()
+        registry.create_metrics('cache_1')
+        registry.create_metrics('cache_2')
+        assert [stats.name for stats in registry.get_stats_list()] == ['cache_1', 'cache_2']
+
+    def test_should_not_allow_duplicate_names(self):
+        registry = SingleObjectCacheMetricsRegistry()
+        registry.create_metrics('cache_1')
+        with pytest.raises(AssertionError):
+            registry.create_metrics('cache_1')
@@ -1,12 +1,43 @@
+from datetime import datetime, timedelta
+import logging
+import os
+import pickle
+from pathlib import Path
+import struct
+from threading import Barrier, Event, Thread
+from time import perf_counter
 from unittest.mock import MagicMock, patch
-from typing import Iterable
+import random
+from typing import BinaryIO, Callable, Iterable, List, Sequence
 
 import pytest
 
 import data_hub_api.utils.cache as cache_module
 from data_hub_api.utils.cache import (
-    InMemorySingleObjectCache
+    ContentHashMemo,
+    ExponentialBackoff,
+    InMemoryKeyedCache,
+    InMemorySingleObjectCache,
+    LazyMemoizedMapping,
+    MaxAgeRefreshPolicy,
+    RefreshPolicy,
+    SourceLastModifiedRefreshPolicy,
+    SharedSnapshotFileSingleObjectCache,
+    SnapshotFileSingleObjectCache
 )
+from data_hub_api.utils.cache_metrics import SingleObjectCacheMetrics
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+LAST_MODIFIED_TIME_1 = datetime.fromisoformat('2024-01-02T03:04:05+00:00')
+
+
+def wait_for_background_refresh(cache: InMemorySingleObjectCache):
+    refresh_thread = cache._refresh_thread  # pylint: disable=protected-access
+    assert refresh_thread is not None
+    refresh_thread.join(timeout=5)
 
 
 @pytest.fixture(name='monotonic_mock')
@@ -42,3 +73,894 @@ class TestInMemorySingleObjectCache:
         result = cache.get_or_load(load_fn=load_fn)
         assert result == 'value_2'
         assert load_fn.call_count == 2
+
+    def test_should_return_stale_value_while_refreshing_in_background(
+        self,
+        monotonic_mock: MagicMock
+    ):
+        cache = InMemorySingleObjectCache[str](
+            max_age_in_seconds=60,
+            refresh_in_background=True
+        )
+        load_started_event = Event()
+        load_continue_event = Event()
+
+        def blocking_load_fn() -> str:
+            load_started_event.set()
+            load_continue_event.wait(timeout=5)
+            return 'value_2'
+
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        monotonic_mock.return_value = 200
+        result = cache.get_or_load(load_fn=blocking_load_fn)
+        assert result == 'value_1'
+        assert load_started_event.wait(timeout=5)
+        assert cache.get_or_load(load_fn=blocking_load_fn) == 'value_1'
+        load_continue_event.set()
+        wait_for_background_refresh(cache)
+        assert cache.get_or_load(load_fn=blocking_load_fn) == 'value_2'
+
+    def test_should_only_start_one_background_refresh_at_a_time(
+        self,
+        monotonic_mock: MagicMock
+    ):
+        cache = InMemorySingleObjectCache[str](
+            max_age_in_seconds=60,
+            refresh_in_background=True
+        )
+        load_continue_event = Event()
+        load_fn = MagicMock(name='load_fn')
+        load_fn.side_effect = lambda: load_continue_event.wait(timeout=5) and 'value_2'
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        monotonic_mock.return_value = 200
+        for _ in range(5):
+            assert cache.get_or_load(load_fn=load_fn) == 'value_1'
+        load_continue_event.set()
+        wait_for_background_refresh(cache)
+        assert load_fn.call_count == 1
+
+    def test_should_load_synchronously_if_cache_is_empty(self):
+        cache = InMemorySingleObjectCache[str](
+            max_age_in_seconds=60,
+            refresh_in_background=True
+        )
+        assert cache.get_or_load(load_fn=lambda: 'value_1') == 'value_1'
+
+    def test_should_keep_stale_value_if_background_refresh_fails(
+        self,
+        monotonic_mock: MagicMock
+    ):
+        cache = InMemorySingleObjectCache[str](
+            max_age_in_seconds=60,
+            refresh_in_background=True
+        )
+        load_fn = MagicMock(name='load_fn')
+        load_fn.side_effect = RuntimeError('load failed')
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        monotonic_mock.return_value = 200
+        cache.get_or_load(load_fn=load_fn)
+        wait_for_background_refresh(cache)
+        assert cache.get_or_load(load_fn=load_fn) == 'value_1'
+
+    def test_should_not_acquire_lock_if_value_is_fresh(self):
+        cache = InMemorySingleObjectCache[str](max_age_in_seconds=60)
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        lock_mock = MagicMock(name='lock')
+        cache._lock = lock_mock  # pylint: disable=protected-access
+        assert cache.get_or_load(load_fn=lambda: 'value_2') == 'value_1'
+        lock_mock.__enter__.assert_not_called()
+
+    def test_should_load_only_once_under_contention(self):
+        cache = InMemorySingleObjectCache[str](max_age_in_seconds=60)
+        load_fn = MagicMock(name='load_fn')
+        load_fn.return_value = 'value_1'
+        thread_count = 32
+        iteration_count = 1000
+        barrier = Barrier(thread_count)
+        results: List[str] = []
+
+        def run():
+            barrier.wait()
+            thread_results = [
+                cache.get_or_load(load_fn=load_fn)
+                for _ in range(iteration_count)
+            ]
+            results.extend(thread_results)
+
+        start_time = perf_counter()
+        threads = [Thread(target=run) for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = perf_counter() - start_time
+        LOGGER.info(
+            'Contention benchmark: threads=%d, calls=%d, time=%.3f seconds (%.3f us per call)',
+            thread_count,
+            len(results),
+            duration,
+            duration / len(results) * 1_000_000
+        )
+        assert load_fn.call_count == 1
+        assert results == ['value_1'] * (thread_count * iteration_count)
+
+    def test_should_return_stale_value_if_reload_failed(self, monotonic_mock: MagicMock):
+        cache = InMemorySingleObjectCache[str](max_age_in_seconds=60)
+        error = RuntimeError('load failed')
+        load_fn = MagicMock(name='load_fn', side_effect=['value_1', error])
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=load_fn)
+        monotonic_mock.return_value = 200
+        assert cache.get_or_load(load_fn=load_fn) == 'value_1'
+        assert cache.last_error == error
+        monotonic_mock.return_value = 205
+        assert cache.get_last_error_age_in_seconds() == 5
+
+    def test_should_not_retry_failed_reload_before_retry_delay(
+        self,
+        monotonic_mock: MagicMock
+    ):
+        cache = InMemorySingleObjectCache[str](
+            max_age_in_seconds=60,
+            retry_backoff=ExponentialBackoff(min_delay_in_seconds=10)
+        )
+        load_fn = MagicMock(name='load_fn', side_effect=[
+            'value_1', RuntimeError('load failed'), 'value_2'
+        ])
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=load_fn)
+        monotonic_mock.return_value = 200
+        cache.get_or_load(load_fn=load_fn)
+        monotonic_mock.return_value = 204
+        assert cache.get_or_load(load_fn=load_fn) == 'value_1'
+        assert load_fn.call_count == 2
+        monotonic_mock.return_value = 211
+        assert cache.get_or_load(load_fn=load_fn) == 'value_2'
+        assert load_fn.call_count == 3
+
+    def test_should_raise_error_if_there_was_no_successful_load(
+        self,
+        monotonic_mock: MagicMock
+    ):
+        cache = InMemorySingleObjectCache[str](
+            max_age_in_seconds=60,
+            retry_backoff=ExponentialBackoff(min_delay_in_seconds=10)
+        )
+        error = RuntimeError('load failed')
+        load_fn = MagicMock(name='load_fn', side_effect=[error, 'value_1'])
+        monotonic_mock.return_value = 100
+        with pytest.raises(RuntimeError) as exc_info:
+            cache.get_or_load(load_fn=load_fn)
+        assert exc_info.value == error
+        monotonic_mock.return_value = 101
+        with pytest.raises(RuntimeError) as exc_info:
+            cache.get_or_load(load_fn=load_fn)
+        assert exc_info.value.__cause__ == error
+        assert load_fn.call_count == 1
+        monotonic_mock.return_value = 111
+        assert cache.get_or_load(load_fn=load_fn) == 'value_1'
+
+    def test_should_serve_current_value_until_requested_refresh_completed(self):
+        cache = InMemorySingleObjectCache[str](max_age_in_seconds=60)
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        assert cache.generation == 1
+        load_started_event = Event()
+        load_continue_event = Event()
+
+        def blocking_load_fn() -> str:
+            load_started_event.set()
+            load_continue_event.wait(timeout=5)
+            return 'value_2'
+
+        generation = cache.request_refresh(load_fn=blocking_load_fn)
+        assert generation == 2
+        load_started_event.wait(timeout=5)
+        assert cache.get_or_load(load_fn=lambda: 'other') == 'value_1'
+        load_continue_event.set()
+        wait_for_background_refresh(cache)
+        assert cache.get_or_load(load_fn=lambda: 'other') == 'value_2'
+        assert cache.generation == 2
+
+    def test_should_coalesce_refresh_requests_made_during_refresh(self):
+        cache = InMemorySingleObjectCache[str](max_age_in_seconds=60)
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        load_started_event = Event()
+        load_continue_event = Event()
+        load_fn = MagicMock(name='load_fn', return_value='value_3')
+
+        def blocking_load_fn() -> str:
+            load_started_event.set()
+            load_continue_event.wait(timeout=5)
+            return load_fn()
+
+        first_generation = cache.request_refresh(load_fn=blocking_load_fn)
+        load_started_event.wait(timeout=5)
+        generations = [cache.request_refresh(load_fn=blocking_load_fn) for _ in range(3)]
+        assert generations == [first_generation + 1] * 3
+        load_continue_event.set()
+        wait_for_background_refresh(cache)
+        assert load_fn.call_count == 2
+        assert cache.generation == first_generation + 1
+        assert cache.get_or_load(load_fn=lambda: 'other') == 'value_3'
+
+    def test_should_record_hits_misses_and_loads_in_metrics(self):
+        metrics = SingleObjectCacheMetrics('cache_1')
+        cache = InMemorySingleObjectCache[str](max_age_in_seconds=60, metrics=metrics)
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        stats = metrics.get_stats()
+        assert cache.name == 'cache_1'
+        assert stats.miss_count == 1
+        assert stats.hit_count == 2
+        assert stats.load_count == 1
+
+    def test_should_record_load_failure_in_metrics(self):
+        metrics = SingleObjectCacheMetrics('cache_1')
+        cache = InMemorySingleObjectCache[str](max_age_in_seconds=60, metrics=metrics)
+        load_fn = MagicMock(name='load_fn', side_effect=RuntimeError('load failed'))
+        with pytest.raises(RuntimeError):
+            cache.get_or_load(load_fn=load_fn)
+        assert metrics.get_stats().load_failure_count == 1
+
+
+class TestExponentialBackoff:
+    def test_should_double_delay_for_each_failure_up_to_max_delay(self):
+        backoff = ExponentialBackoff(min_delay_in_seconds=1, max_delay_in_seconds=10)
+        for failure_count, expected_max_delay in [(1, 1), (2, 2), (3, 4), (4, 8), (5, 10)]:
+            delay = backoff.get_delay_in_seconds(failure_count)
+            assert expected_max_delay / 2 <= delay <= expected_max_delay
+
+
+def simulate_peak_concurrent_loads(
+    refresh_policies: Sequence[RefreshPolicy],
+    load_duration_in_seconds: int,
+    simulated_duration_in_seconds: int
+) -> int:
+    # simulates independent caches (e.g. of multiple providers and worker processes),
+    # all loaded at startup and then checked every second,
+    # returns the peak number of concurrent reloads after the startup load
+    last_updated_time_list = [0] * len(refresh_policies)
+    load_end_time_list = [load_duration_in_seconds] * len(refresh_policies)
+    for refresh_policy in refresh_policies:
+        refresh_policy.on_load_started()
+    peak_concurrent_loads = 0
+    for now in range(load_duration_in_seconds, simulated_duration_in_seconds):
+        for index, refresh_policy in enumerate(refresh_policies):
+            if load_end_time_list[index] > now:
+                continue
+            if refresh_policy.is_refresh_required(last_updated_time_list[index], now):
+                refresh_policy.on_load_started()
+                last_updated_time_list[index] = now
+                load_end_time_list[index] = now + load_duration_in_seconds
+        concurrent_loads = sum(
+            1 for load_end_time in load_end_time_list if load_end_time > now
+        )
+        peak_concurrent_loads = max(peak_concurrent_loads, concurrent_loads)
+    return peak_concurrent_loads
+
+
+class TestMaxAgeRefreshPolicy:
+    def test_should_require_refresh_after_max_age(self):
+        policy = MaxAgeRefreshPolicy(max_age_in_seconds=60)
+        policy.on_load_started()
+        assert policy.is_refresh_required(last_updated_time=100, now=160) is False
+        assert policy.is_refresh_required(last_updated_time=100, now=161) is True
+
+    def test_should_add_initial_offset_to_first_max_age_only(self):
+        policy = MaxAgeRefreshPolicy(max_age_in_seconds=60, initial_offset_in_seconds=30)
+        policy.on_load_started()
+        assert policy.is_refresh_required(last_updated_time=100, now=190) is False
+        assert policy.is_refresh_required(last_updated_time=100, now=191) is True
+        policy.on_load_started()
+        assert policy.is_refresh_required(last_updated_time=200, now=261) is True
+
+    def test_should_add_random_jitter_to_max_age(self):
+        policy = MaxAgeRefreshPolicy(max_age_in_seconds=60, max_jitter_in_seconds=30)
+        with patch.object(cache_module.random, 'uniform', return_value=20) as uniform_mock:
+            policy.on_load_started()
+        uniform_mock.assert_called_with(0, 30)
+        assert policy.is_refresh_required(last_updated_time=100, now=180) is False
+        assert policy.is_refresh_required(last_updated_time=100, now=181) is True
+
+    def test_should_reduce_peak_concurrent_loads_across_workers(self):
+        worker_count = 20
+        stagger_interval = 300
+
+        def create_refresh_policies(
+            create_refresh_policy: Callable[[int], RefreshPolicy]
+        ) -> Sequence[RefreshPolicy]:
+            return [
+                create_refresh_policy(provider_index)
+                for _ in range(worker_count)
+                for provider_index in range(4)
+            ]
+
+        random.seed(1)
+        peak_concurrent_loads_without_jitter = simulate_peak_concurrent_loads(
+            create_refresh_policies(lambda _: MaxAgeRefreshPolicy(max_age_in_seconds=3600)),
+            load_duration_in_seconds=60,
+            simulated_duration_in_seconds=4 * 3600
+        )
+        peak_concurrent_loads_with_jitter = simulate_peak_concurrent_loads(
+            create_refresh_policies(lambda provider_index: MaxAgeRefreshPolicy(
+                max_age_in_seconds=3600,
+                max_jitter_in_seconds=300,
+                initial_offset_in_seconds=provider_index * stagger_interval
+            )),
+            load_duration_in_seconds=60,
+            simulated_duration_in_seconds=4 * 3600
+        )
+        LOGGER.info(
+            'Peak concurrent loads (after startup) of %d caches: without jitter=%d, with jitter=%d',
+            worker_count * 4,
+            peak_concurrent_loads_without_jitter,
+            peak_concurrent_loads_with_jitter
+        )
+        assert peak_concurrent_loads_without_jitter == worker_count * 4
+        assert peak_concurrent_loads_with_jitter <= worker_count * 4 / 4
+
+
+class TestSourceLastModifiedRefreshPolicy:
+    def test_should_not_poll_source_before_min_refresh_interval(self):
+        get_last_modified_time_fn = MagicMock(name='get_last_modified_time_fn')
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=get_last_modified_time_fn,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100
+        )
+        assert policy.is_refresh_required(last_updated_time=100, now=105) is False
+        get_last_modified_time_fn.assert_not_called()
+
+    def test_should_require_refresh_after_max_refresh_interval(self):
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=lambda: LAST_MODIFIED_TIME_1,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100
+        )
+        policy.on_load_started()
+        assert policy.is_refresh_required(last_updated_time=100, now=201) is True
+
+    def test_should_not_require_refresh_if_source_not_modified(self):
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=lambda: LAST_MODIFIED_TIME_1,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100
+        )
+        policy.on_load_started()
+        assert policy.is_refresh_required(last_updated_time=100, now=150) is False
+
+    def test_should_require_refresh_if_source_was_modified(self):
+        get_last_modified_time_fn = MagicMock(name='get_last_modified_time_fn')
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=get_last_modified_time_fn,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100
+        )
+        get_last_modified_time_fn.return_value = LAST_MODIFIED_TIME_1
+        policy.on_load_started()
+        get_last_modified_time_fn.return_value = LAST_MODIFIED_TIME_1 + timedelta(minutes=1)
+        assert policy.is_refresh_required(last_updated_time=100, now=150) is True
+
+    def test_should_poll_source_at_most_once_per_min_refresh_interval(self):
+        get_last_modified_time_fn = MagicMock(name='get_last_modified_time_fn')
+        get_last_modified_time_fn.return_value = LAST_MODIFIED_TIME_1
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=get_last_modified_time_fn,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100
+        )
+        policy.on_load_started()
+        get_last_modified_time_fn.reset_mock()
+        policy.is_refresh_required(last_updated_time=100, now=150)
+        policy.is_refresh_required(last_updated_time=100, now=155)
+        policy.is_refresh_required(last_updated_time=100, now=161)
+        assert get_last_modified_time_fn.call_count == 2
+
+    def test_should_not_require_refresh_if_polling_source_failed(self):
+        get_last_modified_time_fn = MagicMock(name='get_last_modified_time_fn')
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=get_last_modified_time_fn,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100
+        )
+        get_last_modified_time_fn.return_value = LAST_MODIFIED_TIME_1
+        policy.on_load_started()
+        get_last_modified_time_fn.side_effect = RuntimeError('failed')
+        assert policy.is_refresh_required(last_updated_time=100, now=150) is False
+
+    def test_should_add_initial_offset_to_first_max_refresh_interval_only(self):
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=lambda: LAST_MODIFIED_TIME_1,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100,
+            initial_offset_in_seconds=30
+        )
+        policy.on_load_started()
+        assert policy.is_refresh_required(last_updated_time=100, now=230) is False
+        assert policy.is_refresh_required(last_updated_time=100, now=231) is True
+        policy.on_load_started()
+        assert policy.is_refresh_required(last_updated_time=300, now=401) is True
+
+    def test_should_add_random_jitter_to_refresh_and_poll_intervals(self):
+        get_last_modified_time_fn = MagicMock(name='get_last_modified_time_fn')
+        get_last_modified_time_fn.return_value = LAST_MODIFIED_TIME_1
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=get_last_modified_time_fn,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100,
+            max_jitter_in_seconds=30
+        )
+        with patch.object(cache_module.random, 'uniform', return_value=20) as uniform_mock:
+            policy.on_load_started()
+            uniform_mock.assert_called_with(0, 30)
+            get_last_modified_time_fn.reset_mock()
+            assert policy.is_refresh_required(last_updated_time=100, now=129) is False
+            get_last_modified_time_fn.assert_not_called()
+            assert policy.is_refresh_required(last_updated_time=100, now=130) is False
+            assert policy.is_refresh_required(last_updated_time=100, now=159) is False
+            assert get_last_modified_time_fn.call_count == 1
+            assert policy.is_refresh_required(last_updated_time=100, now=220) is False
+            assert policy.is_refresh_required(last_updated_time=100, now=221) is True
+
+    def test_should_poll_source_in_background(self):
+        get_last_modified_time_fn = MagicMock(name='get_last_modified_time_fn')
+        policy = SourceLastModifiedRefreshPolicy(
+            get_last_modified_time_fn=get_last_modified_time_fn,
+            min_refresh_interval_in_seconds=10,
+            max_refresh_interval_in_seconds=100,
+            poll_in_background=True
+        )
+        get_last_modified_time_fn.return_value = LAST_MODIFIED_TIME_1
+        policy.on_load_started()
+        poll_started_event = Event()
+        poll_release_event = Event()
+
+        def get_modified_last_modified_time() -> datetime:
+            poll_started_event.set()
+            assert poll_release_event.wait(timeout=5)
+            return LAST_MODIFIED_TIME_1 + timedelta(minutes=1)
+
+        get_last_modified_time_fn.side_effect = get_modified_last_modified_time
+        assert policy.is_refresh_required(last_updated_time=100, now=150) is False
+        assert poll_started_event.wait(timeout=5)
+        assert policy.is_refresh_required(last_updated_time=100, now=151) is False
+        poll_release_event.set()
+        poll_thread = policy._poll_thread  # pylint: disable=protected-access
+        assert poll_thread is not None
+        poll_thread.join(timeout=5)
+        assert policy.is_refresh_required(last_updated_time=100, now=152) is True
+        assert get_last_modified_time_fn.call_count == 2
+
+    def test_should_reload_cache_once_source_was_modified(self, monotonic_mock: MagicMock):
+        last_modified_time_list = [LAST_MODIFIED_TIME_1]
+        cache = InMemorySingleObjectCache[str](
+            max_age_in_seconds=100,
+            refresh_policy=SourceLastModifiedRefreshPolicy(
+                get_last_modified_time_fn=lambda: last_modified_time_list[-1],
+                min_refresh_interval_in_seconds=10,
+                max_refresh_interval_in_seconds=100
+            )
+        )
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        monotonic_mock.return_value = 150
+        assert cache.get_or_load(load_fn=lambda: 'value_2') == 'value_1'
+        last_modified_time_list.append(LAST_MODIFIED_TIME_1 + timedelta(minutes=1))
+        monotonic_mock.return_value = 160
+        assert cache.get_or_load(load_fn=lambda: 'value_2') == 'value_2'
+
+
+class TestSnapshotFileSingleObjectCache:
+    def test_should_load_value_and_save_snapshot(self, tmp_path: Path):
+        snapshot_path = tmp_path / 'cache.pickle'
+        cache = SnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            max_snapshot_age_in_seconds=60
+        )
+        assert cache.get_or_load(load_fn=lambda: 'value_1') == 'value_1'
+        assert snapshot_path.exists()
+
+    def test_should_serve_snapshot_and_refresh_in_background(self, tmp_path: Path):
+        snapshot_path = tmp_path / 'cache.pickle'
+        SnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            max_snapshot_age_in_seconds=60
+        ).get_or_load(load_fn=lambda: 'value_1')
+        cache = SnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            max_snapshot_age_in_seconds=60
+        )
+        load_continue_event = Event()
+        load_fn = MagicMock(name='load_fn')
+        load_fn.side_effect = lambda: load_continue_event.wait(timeout=5) and 'value_2'
+        assert cache.get_or_load(load_fn=load_fn) == 'value_1'
+        load_continue_event.set()
+        wait_for_background_refresh(cache)
+        assert cache.get_or_load(load_fn=load_fn) == 'value_2'
+        assert load_fn.call_count == 1
+
+    def test_should_ignore_snapshot_exceeding_max_snapshot_age(self, tmp_path: Path):
+        snapshot_path = tmp_path / 'cache.pickle'
+        SnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            max_snapshot_age_in_seconds=60
+        ).get_or_load(load_fn=lambda: 'value_1')
+        snapshot_mtime = snapshot_path.stat().st_mtime - 120
+        os.utime(snapshot_path, (snapshot_mtime, snapshot_mtime))
+        cache = SnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            max_snapshot_age_in_seconds=60
+        )
+        assert cache.get_or_load(load_fn=lambda: 'value_2') == 'value_2'
+
+    def test_should_ignore_invalid_snapshot(self, tmp_path: Path):
+        snapshot_path = tmp_path / 'cache.pickle'
+        snapshot_path.write_bytes(b'invalid')
+        cache = SnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            max_snapshot_age_in_seconds=60
+        )
+        assert cache.get_or_load(load_fn=lambda: 'value_1') == 'value_1'
+
+
+class UpperCaseSnapshotCodec:
+    def write(self, value: str, snapshot_file: BinaryIO) -> None:
+        value_bytes = value.upper().encode('utf-8')
+        snapshot_file.write(struct.pack('>I', len(value_bytes)) + value_bytes)
+
+    def read(self, snapshot_file: BinaryIO) -> str:
+        (length,) = struct.unpack('>I', snapshot_file.read(4))
+        return snapshot_file.read(length).decode('utf-8')
+
+
+class TestSharedSnapshotFileSingleObjectCache:
+    def test_should_load_value_once_across_caches_sharing_snapshot(self, tmp_path: Path):
+        snapshot_path = tmp_path / 'cache.snapshot'
+        load_fn = MagicMock(name='load_fn')
+        load_fn.return_value = 'value_1'
+        caches = [
+            SharedSnapshotFileSingleObjectCache[str](
+                max_age_in_seconds=60,
+                snapshot_path=snapshot_path
+            )
+            for _ in range(3)
+        ]
+        results = [cache.get_or_load(load_fn=load_fn) for cache in caches]
+        assert results == ['value_1'] * 3
+        assert load_fn.call_count == 1
+        assert len({cache.snapshot_generation for cache in caches}) == 1
+
+    def test_should_pick_up_new_generation_written_by_other_cache(
+        self,
+        tmp_path: Path,
+        monotonic_mock: MagicMock
+    ):
+        snapshot_path = tmp_path / 'cache.snapshot'
+        writer_cache = SharedSnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            poll_interval_in_seconds=10
+        )
+        reader_cache = SharedSnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            poll_interval_in_seconds=10
+        )
+        monotonic_mock.return_value = 100
+        writer_cache.get_or_load(load_fn=lambda: 'value_1')
+        assert reader_cache.get_or_load(load_fn=lambda: 'other') == 'value_1'
+        snapshot_path.unlink()
+        monotonic_mock.return_value = 200
+        assert writer_cache.get_or_load(load_fn=lambda: 'value_2') == 'value_2'
+        assert reader_cache.get_or_load(load_fn=lambda: 'other') == 'value_2'
+        assert reader_cache.snapshot_generation == writer_cache.snapshot_generation
+
+    def test_should_not_reload_value_while_snapshot_is_unchanged(
+        self,
+        tmp_path: Path,
+        monotonic_mock: MagicMock
+    ):
+        cache = SharedSnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=tmp_path / 'cache.snapshot',
+            poll_interval_in_seconds=10
+        )
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        generation = cache.generation
+        for now in [111, 122, 133]:
+            monotonic_mock.return_value = now
+            assert cache.get_or_load(load_fn=lambda: 'other') == 'value_1'
+        assert cache.generation == generation
+        assert cache.metrics.load_count == 1
+
+    def test_should_reload_shared_snapshot_on_requested_refresh(self, tmp_path: Path):
+        caches = [
+            SharedSnapshotFileSingleObjectCache[str](
+                max_age_in_seconds=60,
+                snapshot_path=tmp_path / 'cache.snapshot',
+                poll_interval_in_seconds=0
+            )
+            for _ in range(2)
+        ]
+        caches[0].get_or_load(load_fn=lambda: 'value_1')
+        caches[0].request_refresh(load_fn=lambda: 'value_2')
+        wait_for_background_refresh(caches[0])
+        assert caches[0].get_or_load(load_fn=lambda: 'other') == 'value_2'
+        assert caches[1].get_or_load(load_fn=lambda: 'other') == 'value_2'
+
+    def test_should_keep_serving_current_value_while_other_cache_is_loading(
+        self,
+        tmp_path: Path,
+        monotonic_mock: MagicMock
+    ):
+        snapshot_path = tmp_path / 'cache.snapshot'
+        cache = SharedSnapshotFileSingleObjectCache[str](
+            max_age_in_seconds=60,
+            snapshot_path=snapshot_path,
+            poll_interval_in_seconds=10
+        )
+        monotonic_mock.return_value = 100
+        cache.get_or_load(load_fn=lambda: 'value_1')
+        snapshot_path.unlink()
+        monotonic_mock.return_value = 200
+        load_fn = MagicMock(name='load_fn')
+        with cache._file_lock(blocking=True):  # pylint: disable=protected-access
+            assert cache.get_or_load(load_fn=load_fn) == 'value_1'
+        load_fn.assert_not_called()
+
+    def test_should_write_and_read_snapshot_using_snapshot_codec(self, tmp_path: Path):
+        caches = [
+            SharedSnapshotFileSingleObjectCache[str](
+                max_age_in_seconds=60,
+                snapshot_path=tmp_path / 'cache.snapshot',
+                snapshot_codec=UpperCaseSnapshotCodec()
+            )
+            for _ in range(2)
+        ]
+        # the process writing the snapshot serves the value read back from it as well
+        assert caches[0].get_or_load(load_fn=lambda: 'value_1') == 'VALUE_1'
+        assert caches[1].get_or_load(load_fn=lambda: 'other') == 'VALUE_1'
+
+    def test_should_reload_snapshot_if_required_by_refresh_policy(
+        self,
+        tmp_path: Path,
+        monotonic_mock: MagicMock
+    ):
+        snapshot_path = tmp_path / 'cache.snapshot'
+        refresh_policy = MagicMock(name='refresh_policy')
+        refresh_policy.is_refresh_required.return_value = False
+        caches = [
+            SharedSnapshotFileSingleObjectCache[str](
+                max_age_in_seconds=600,
+                snapshot_path=snapshot_path,
+                poll_interval_in_seconds=10,
+                refresh_policy=refresh_policy
+            )
+            for _ in range(2)
+        ]
+        monotonic_mock.return_value = 100
+        assert caches[0].get_or_load(load_fn=lambda: 'value_1') == 'value_1'
+        assert caches[1].get_or_load(load_fn=lambda: 'other') == 'value_1'
+        monotonic_mock.return_value = 200
+        refresh_policy.is_refresh_required.return_value = True
+        assert caches[0].get_or_load(load_fn=lambda: 'value_2') == 'value_2'
+        # the other cache picks up the reloaded snapshot, rather than loading it again
+        load_fn = MagicMock(name='load_fn')
+        assert caches[1].get_or_load(load_fn=load_fn) == 'value_2'
+        load_fn.assert_not_called()
+        assert caches[1].snapshot_generation == caches[0].snapshot_generation
+
+
+class TestInMemoryKeyedCache:
+    def test_should_get_loaded_value_by_key(self):
+        cache = InMemoryKeyedCache[str, str](max_age_in_seconds=10)
+        assert cache.get_or_load('key_1', load_fn=lambda: 'value_1') == 'value_1'
+        assert cache.get_or_load('key_2', load_fn=lambda: 'value_2') == 'value_2'
+        assert cache.get_or_load('key_1', load_fn=lambda: 'other') == 'value_1'
+
+    def test_should_reload_entry_if_max_age_reached(self, monotonic_mock: MagicMock):
+        cache = InMemoryKeyedCache[str, str](max_age_in_seconds=10)
+        monotonic_mock.return_value = 100
+        cache.get_or_load('key_1', load_fn=lambda: 'value_1')
+        monotonic_mock.return_value = 109
+        assert cache.get_or_load('key_1', load_fn=lambda: 'value_2') == 'value_1'
+        monotonic_mock.return_value = 110
+        assert cache.get_or_load('key_1', load_fn=lambda: 'value_2') == 'value_2'
+
+    def test_should_evict_least_recently_used_entry_above_max_entry_count(self):
+        cache = InMemoryKeyedCache[str, str](max_age_in_seconds=10, max_entry_count=2)
+        cache.get_or_load('key_1', load_fn=lambda: 'value_1')
+        cache.get_or_load('key_2', load_fn=lambda: 'value_2')
+        cache.get_or_load('key_1', load_fn=lambda: 'other')
+        cache.get_or_load('key_3', load_fn=lambda: 'value_3')
+        assert len(cache) == 2
+        assert cache.get_or_load('key_1', load_fn=lambda: 'other') == 'value_1'
+        assert cache.get_or_load('key_2', load_fn=lambda: 'other') == 'other'
+
+    def test_should_evict_entries_above_max_size_in_bytes(self):
+        cache = InMemoryKeyedCache[str, str](
+            max_age_in_seconds=10,
+            max_size_in_bytes=10,
+            estimate_size_fn=len
+        )
+        cache.get_or_load('key_1', load_fn=lambda: '12345')
+        cache.get_or_load('key_2', load_fn=lambda: '12345')
+        cache.get_or_load('key_3', load_fn=lambda: '123')
+        assert cache.total_size_in_bytes == 8
+        assert cache.get_or_load('key_1', load_fn=lambda: 'other') == 'other'
+
+    def test_should_not_cache_value_exceeding_max_size_in_bytes(self):
+        cache = InMemoryKeyedCache[str, str](
+            max_age_in_seconds=10,
+            max_size_in_bytes=3,
+            estimate_size_fn=len
+        )
+        assert cache.get_or_load('key_1', load_fn=lambda: '12345') == '12345'
+        assert len(cache) == 0
+
+    def test_should_not_cache_failed_load(self):
+        cache = InMemoryKeyedCache[str, str](max_age_in_seconds=10)
+        load_fn = MagicMock(name='load_fn', side_effect=[RuntimeError('load failed'), 'value_1'])
+        with pytest.raises(RuntimeError):
+            cache.get_or_load('key_1', load_fn=load_fn)
+        assert cache.get_or_load('key_1', load_fn=load_fn) == 'value_1'
+
+    def test_should_load_each_key_only_once_under_contention(self):
+        cache = InMemoryKeyedCache[str, str](max_age_in_seconds=10)
+        thread_count = 8
+        barrier = Barrier(thread_count)
+        load_fn_by_key = {
+            key: MagicMock(name=f'load_fn_{key}', return_value=f'value_{key}')
+            for key in ['1', '2']
+        }
+        results: List[str] = []
+
+        def run(key: str):
+            barrier.wait()
+            results.append(cache.get_or_load(key, load_fn=load_fn_by_key[key]))
+
+        threads = [Thread(target=run, args=(str(1 + i % 2),)) for i in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert load_fn_by_key['1'].call_count == 1
+        assert load_fn_by_key['2'].call_count == 1
+        assert sorted(results) == ['value_1'] * 4 + ['value_2'] * 4
+
+    def test_should_measure_hit_path_overhead(self):
+        cache = InMemoryKeyedCache[int, str](max_age_in_seconds=60, max_entry_count=1000)
+        value_by_key = {key: f'value_{key}' for key in range(1000)}
+        for key, value in value_by_key.items():
+            cache.get_or_load(key, load_fn=lambda value=value: value)
+        iteration_count = 100_000
+        start_time = perf_counter()
+        for i in range(iteration_count):
+            value_by_key.get(i % 1000)
+        dict_duration = perf_counter() - start_time
+        start_time = perf_counter()
+        for i in range(iteration_count):
+            cache.get_or_load(i % 1000, load_fn=str)
+        cache_duration = perf_counter() - start_time
+        LOGGER.info(
+            'Keyed cache hit benchmark: calls=%d, cache=%.3f us per call, dict=%.3f us per call',
+            iteration_count,
+            cache_duration / iteration_count * 1_000_000,
+            dict_duration / iteration_count * 1_000_000
+        )
+        assert len(cache) == 1000
+
+
+class TestLazyMemoizedMapping:
+    def test_should_create_value_on_first_access_only(self):
+        value_fn = MagicMock(name='value_fn', side_effect=lambda source: f'value_{source}')
+        mapping = LazyMemoizedMapping({'key_1': 'source_1', 'key_2': 'source_2'}, value_fn)
+        assert mapping['key_1'] == 'value_source_1'
+        assert mapping['key_1'] == 'value_source_1'
+        value_fn.assert_called_once_with('source_1')
+        assert mapping.memoized_count == 1
+
+    def test_should_behave_like_mapping_of_source_keys(self):
+        mapping = LazyMemoizedMapping({'key_1': 'source_1'}, str.upper)
+        assert list(mapping) == ['key_1']
+        assert len(mapping) == 1
+        assert mapping.get('key_1') == 'SOURCE_1'
+        assert mapping.get('other') is None
+        assert dict(mapping) == {'key_1': 'SOURCE_1'}
+
+    def test_should_create_value_once_under_contention(self):
+        thread_count = 8
+        barrier = Barrier(thread_count)
+        value_fn = MagicMock(name='value_fn', return_value='value_1')
+        mapping = LazyMemoizedMapping({'key_1': 'source_1'}, value_fn)
+        results: List[str] = []
+
+        def run():
+            barrier.wait()
+            results.append(mapping['key_1'])
+
+        threads = [Thread(target=run) for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert value_fn.call_count == 1
+        assert results == ['value_1'] * thread_count
+
+    def test_should_not_pickle_memoized_values(self):
+        mapping = LazyMemoizedMapping({'key_1': 'source_1'}, str.upper)
+        assert mapping['key_1'] == 'SOURCE_1'
+        unpickled_mapping = pickle.loads(pickle.dumps(mapping))
+        assert unpickled_mapping.memoized_count == 0
+        assert unpickled_mapping['key_1'] == 'SOURCE_1'
+
+
+class TestContentHashMemo:
+    def test_should_create_values_of_first_generation(self):
+        memo = ContentHashMemo[str](value_fn=lambda source: source['value'].upper())
+        assert memo.get_values_for_next_generation([{'value': 'a'}, {'value': 'b'}]) == [
+            'A', 'B'
+        ]
+        assert memo.created_count == 2
+        assert memo.reused_count == 0
+
+    def test_should_reuse_values_of_unchanged_source_values(self):
+        value_fn = MagicMock(name='value_fn', side_effect=lambda source: [source['value']])
+        memo = ContentHashMemo[List[str]](value_fn=value_fn)
+        first_values = memo.get_values_for_next_generation([{'value': 'a'}, {'value': 'b'}])
+        second_values = memo.get_values_for_next_generation([{'value': 'a'}, {'value': 'c'}])
+        assert second_values == [['a'], ['c']]
+        assert second_values[0] is first_values[0]
+        assert value_fn.call_count == 3
+        assert memo.created_count == 1
+        assert memo.reused_count == 1
+
+    def test_should_only_keep_values_of_latest_generation(self):
+        value_fn = MagicMock(name='value_fn', side_effect=lambda source: source['value'])
+        memo = ContentHashMemo[str](value_fn=value_fn)
+        memo.get_values_for_next_generation([{'value': 'a'}])
+        memo.get_values_for_next_generation([{'value': 'b'}])
+        memo.get_values_for_next_generation([{'value': 'a'}])
+        assert len(memo) == 1
+        assert value_fn.call_count == 3
+
+    def test_should_create_value_of_duplicate_source_values_once(self):
+        value_fn = MagicMock(name='value_fn', side_effect=lambda source: source['value'])
+        memo = ContentHashMemo[str](value_fn=value_fn)
+        assert memo.get_values_for_next_generation([{'value': 'a'}, {'value': 'a'}]) == [
+            'a', 'a'
+        ]
+        assert value_fn.call_count == 1
+
+    def test_should_pass_values_to_create_to_map_fn_together(self):
+        map_fn = MagicMock(name='map_fn', side_effect=lambda fn, items: [fn(i) for i in items])
+        memo = ContentHashMemo[str](value_fn=lambda source: source['value'], map_fn=map_fn)
+        memo.get_values_for_next_generation([{'value': 'a'}])
+        assert memo.get_values_for_next_generation([{'value': 'a'}, {'value': 'b'}]) == [
+            'a', 'b'
+        ]
+        assert map_fn.call_args.args[1] == [{'value': 'b'}]
+
+    def test_should_create_values_of_generation_in_batches(self):
+        value_fn = MagicMock(name='value_fn', side_effect=lambda source: source['value'])
+        memo = ContentHashMemo[str](value_fn=value_fn)
+        memo.get_values_for_next_generation([{'value': 'a'}])
+        generation = memo.start_next_generation()
+        assert generation.get_values([{'value': 'a'}]) == ['a']
+        assert generation.get_values([{'value': 'b'}, {'value': 'a'}]) == ['b', 'a']
+        assert len(memo) == 1
+        generation.complete()
+        assert len(memo) == 2
+        assert memo.reused_count == 2
+        assert memo.created_count == 1
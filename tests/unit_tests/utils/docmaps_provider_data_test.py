@@ -0,0 +1,146 @@
+from pathlib import Path
+import pickle
+
+from data_hub_api.utils.cache import ContentHashMemo
+from data_hub_api.utils.docmaps_provider_data import (
+    DocmapsProviderData,
+    DocmapsProviderDataSnapshotCodec,
+    create_docmaps_provider_data,
+    create_docmaps_provider_data_by_key
+)
+from data_hub_api.utils.mapped_json import MappedJsonListMapping
+from data_hub_api.utils.quarantine import QuarantinedQueryResult
+
+
+QUERY_RESULT_1 = {'manuscript_id': 'id_1', 'doi': 'doi_1', 'is_included': True}
+QUERY_RESULT_2 = {'manuscript_id': 'id_2', 'doi': 'doi_2', 'is_included': False}
+INVALID_QUERY_RESULT = {'manuscript_id': 'invalid'}
+
+
+def get_docmap_for_query_result(query_result: dict) -> dict:
+    return {'id': query_result['manuscript_id'], 'doi': query_result['doi']}
+
+
+def is_included(query_result: dict) -> bool:
+    return query_result['is_included']
+
+
+class TestCreateDocmapsProviderData:
+    def test_should_create_docmaps_by_manuscript_id(self):
+        data = create_docmaps_provider_data(
+            [QUERY_RESULT_1, QUERY_RESULT_2],
+            get_docmap_for_query_result,
+            batch_size=1
+        )
+        assert data.docmaps_by_manuscript_id == {
+            'id_1': [get_docmap_for_query_result(QUERY_RESULT_1)],
+            'id_2': [get_docmap_for_query_result(QUERY_RESULT_2)]
+        }
+        assert data.sorted_manuscript_ids == ['id_1', 'id_2']
+
+    def test_should_quarantine_failed_query_results_without_indexing_them(self):
+        data = create_docmaps_provider_data(
+            [INVALID_QUERY_RESULT, QUERY_RESULT_1],
+            get_docmap_for_query_result,
+            quarantine_failed_query_results=True
+        )
+        assert list(data.docmaps_by_manuscript_id.keys()) == ['id_1']
+        assert [
+            quarantined_query_result.manuscript_id
+            for quarantined_query_result in data.quarantined_query_results
+        ] == ['invalid']
+        assert 'invalid' not in data.manuscript_timestamp_indexes.updated_timestamp_by_manuscript_id
+
+    def test_should_generate_docmaps_lazily_and_pickle_them(self):
+        data = create_docmaps_provider_data(
+            [QUERY_RESULT_1, INVALID_QUERY_RESULT],
+            get_docmap_for_query_result,
+            lazy_docmaps=True,
+            quarantine_failed_query_results=True
+        )
+        unpickled_data = pickle.loads(pickle.dumps(data))
+        assert unpickled_data.docmaps_by_manuscript_id['id_1'] == [
+            get_docmap_for_query_result(QUERY_RESULT_1)
+        ]
+        assert not data.docmaps_by_manuscript_id['invalid']
+        assert len(data.quarantined_query_results) == 1
+
+    def test_should_reuse_docmaps_of_memo(self):
+        docmap_memo = ContentHashMemo[dict](value_fn=get_docmap_for_query_result)
+        create_docmaps_provider_data(
+            [QUERY_RESULT_1],
+            get_docmap_for_query_result,
+            docmap_memo=docmap_memo
+        )
+        data = create_docmaps_provider_data(
+            [QUERY_RESULT_1, QUERY_RESULT_2],
+            get_docmap_for_query_result,
+            docmap_memo=docmap_memo
+        )
+        assert len(data.docmaps) == 2
+        assert docmap_memo.reused_count == 1
+
+
+class TestCreateDocmapsProviderDataByKey:
+    def test_should_only_include_query_results_included_by_key(self):
+        data_by_key = create_docmaps_provider_data_by_key(
+            [QUERY_RESULT_1, QUERY_RESULT_2],
+            {'all': lambda _: True, 'included': is_included},
+            get_docmap_for_query_result
+        )
+        assert data_by_key['all'].sorted_manuscript_ids == ['id_1', 'id_2']
+        assert data_by_key['included'].sorted_manuscript_ids == ['id_1']
+
+    def test_should_list_quarantined_query_results_of_including_keys_only(self):
+        data_by_key = create_docmaps_provider_data_by_key(
+            [INVALID_QUERY_RESULT],
+            {'all': lambda _: True, 'none': lambda _: False},
+            get_docmap_for_query_result,
+            quarantine_failed_query_results=True
+        )
+        assert isinstance(data_by_key['all'].quarantined_query_results[0], QuarantinedQueryResult)
+        assert not data_by_key['none'].quarantined_query_results
+
+
+def write_and_read_snapshot(data: DocmapsProviderData, snapshot_path: Path) -> DocmapsProviderData:
+    codec = DocmapsProviderDataSnapshotCodec()
+    with snapshot_path.open('wb') as snapshot_file:
+        snapshot_file.write(b'header')
+        codec.write(data, snapshot_file)
+    with snapshot_path.open('rb') as snapshot_file:
+        snapshot_file.read(len(b'header'))
+        return codec.read(snapshot_file)
+
+
+class TestDocmapsProviderDataSnapshotCodec:
+    def test_should_read_docmaps_as_mapped_json(self, tmp_path: Path):
+        data = create_docmaps_provider_data(
+            [QUERY_RESULT_1, QUERY_RESULT_2],
+            get_docmap_for_query_result
+        )
+        read_data = write_and_read_snapshot(data, tmp_path / 'snapshot')
+        assert isinstance(read_data.docmaps_by_manuscript_id, MappedJsonListMapping)
+        assert dict(read_data.docmaps_by_manuscript_id) == dict(data.docmaps_by_manuscript_id)
+        assert read_data.docmaps == data.docmaps
+        assert read_data.sorted_manuscript_ids == data.sorted_manuscript_ids
+        assert read_data.manuscript_id_indexes == data.manuscript_id_indexes
+
+    def test_should_generate_lazy_docmaps_and_keep_quarantined_query_results(
+        self,
+        tmp_path: Path
+    ):
+        data = create_docmaps_provider_data(
+            [QUERY_RESULT_1, INVALID_QUERY_RESULT],
+            get_docmap_for_query_result,
+            lazy_docmaps=True,
+            quarantine_failed_query_results=True
+        )
+        read_data = write_and_read_snapshot(data, tmp_path / 'snapshot')
+        assert dict(read_data.docmaps_by_manuscript_id) == {
+            'id_1': [get_docmap_for_query_result(QUERY_RESULT_1)],
+            'invalid': []
+        }
+        assert [
+            quarantined_query_result.manuscript_id
+            for quarantined_query_result in read_data.quarantined_query_results
+        ] == ['invalid']
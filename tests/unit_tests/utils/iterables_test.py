@@ -0,0 +1,30 @@
+from data_hub_api.utils.iterables import iter_batches, iter_mappings
+
+
+class TestIterBatches:
+    def test_should_return_no_batches_for_empty_iterable(self):
+        assert not list(iter_batches([], batch_size=2))
+
+    def test_should_return_batches_with_smaller_last_batch(self):
+        assert list(iter_batches(iter([1, 2, 3, 4, 5]), batch_size=2)) == [[1, 2], [3, 4], [5]]
+
+    def test_should_only_consume_items_of_next_batch(self):
+        consumed_items = []
+
+        def iter_items():
+            for item in [1, 2, 3]:
+                consumed_items.append(item)
+                yield item
+
+        batches = iter_batches(iter_items(), batch_size=1)
+        assert next(batches) == [1]
+        assert consumed_items == [1]
+
+
+class TestIterMappings:
+    def test_should_return_mappings_of_list(self):
+        assert list(iter_mappings([{'key': 1}, {'key': 2}])) == [{'key': 1}, {'key': 2}]
+
+    def test_should_skip_malformed_values(self):
+        assert not list(iter_mappings(None))
+        assert list(iter_mappings([None, 'value', {'key': 1}])) == [{'key': 1}]
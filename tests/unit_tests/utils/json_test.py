@@ -5,6 +5,7 @@ import numpy as np
 
 from data_hub_api.utils.json import (
     get_json_compatible_value,
+    get_json_content_hash,
     get_recursive_json_compatible_value,
     get_recursively_transformed_object,
     parse_json_if_string_or_return_value,
@@ -18,6 +19,10 @@ DATETIME_STR_1 = datetime.fromisoformat('2021-02-03T04:05:06+00:00').isoformat()
 
 DATE_STR_1 = date.fromisoformat('2021-02-03').isoformat()
 
+DATETIME_1 = datetime.fromisoformat('2021-02-03T04:05:06+00:00')
+
+DATE_1 = date.fromisoformat('2021-02-03')
+
 
 class TestIsNoneValue:
     def test_should_return_true_for_a_none_value(self):
@@ -65,6 +70,18 @@ class TestGetJsonCompatibleValue:
         assert get_json_compatible_value(date.fromisoformat(DATE_STR_1)) == DATE_STR_1
 
 
+class TestGetJsonContentHash:
+    def test_should_return_same_hash_independent_of_key_order(self):
+        assert get_json_content_hash({'a': 1, 'b': [DATETIME_1]}) == get_json_content_hash(
+            {'b': [DATETIME_1], 'a': 1}
+        )
+
+    def test_should_return_different_hash_for_changed_nested_value(self):
+        assert get_json_content_hash({'a': {'b': DATE_1}}) != get_json_content_hash(
+            {'a': {'b': date.fromisoformat('2021-02-04')}}
+        )
+
+
 class TestGetRecursiveJsonCompatibleValue:
     def test_should_format_datetime_within_a_dict(self):
         assert get_recursive_json_compatible_value(
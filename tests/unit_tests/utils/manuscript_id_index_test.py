@@ -0,0 +1,62 @@
+from data_hub_api.utils.manuscript_id_index import ManuscriptIdIndexes
+
+
+QUERY_RESULT_1 = {
+    'manuscript_id': 'manuscript_id_1',
+    'elife_doi': '10.7554/eLife.12345',
+    'manuscript_versions': [
+        {'preprint_doi': '10.1101/doi1', 'long_manuscript_identifier': 'eLife-RP-RA-1'},
+        {'preprint_doi': '10.1101/doi1', 'long_manuscript_identifier': 'eLife-RP-RA-1-R1'}
+    ]
+}
+
+
+class TestManuscriptIdIndexes:
+    def test_should_index_manuscript_id_by_elife_doi_ignoring_case(self):
+        indexes = ManuscriptIdIndexes()
+        indexes.add_query_result(QUERY_RESULT_1)
+        assert indexes.get_manuscript_ids_by_elife_doi('10.7554/elife.12345') == [
+            'manuscript_id_1'
+        ]
+
+    def test_should_index_manuscript_id_by_preprint_doi_once(self):
+        indexes = ManuscriptIdIndexes()
+        indexes.add_query_result(QUERY_RESULT_1)
+        assert indexes.get_manuscript_ids_by_preprint_doi('10.1101/doi1') == [
+            'manuscript_id_1'
+        ]
+
+    def test_should_index_manuscript_id_by_long_manuscript_identifier_of_each_version(self):
+        indexes = ManuscriptIdIndexes()
+        indexes.add_query_result(QUERY_RESULT_1)
+        assert indexes.get_manuscript_ids_by_long_manuscript_identifier(
+            'eLife-RP-RA-1-R1'
+        ) == ['manuscript_id_1']
+
+    def test_should_return_all_manuscript_ids_sharing_preprint_doi(self):
+        indexes = ManuscriptIdIndexes()
+        indexes.add_query_result(QUERY_RESULT_1)
+        indexes.add_query_result({**QUERY_RESULT_1, 'manuscript_id': 'manuscript_id_2'})
+        assert indexes.get_manuscript_ids_by_preprint_doi('10.1101/doi1') == [
+            'manuscript_id_1', 'manuscript_id_2'
+        ]
+
+    def test_should_return_empty_list_for_unknown_key_or_missing_values(self):
+        indexes = ManuscriptIdIndexes()
+        indexes.add_query_result({
+            'manuscript_id': 'manuscript_id_1',
+            'elife_doi': None,
+            'manuscript_versions': None
+        })
+        assert not indexes.get_manuscript_ids_by_elife_doi('unknown')
+        assert not indexes.manuscript_ids_by_elife_doi
+
+    def test_should_skip_malformed_manuscript_versions_and_keys(self):
+        indexes = ManuscriptIdIndexes()
+        indexes.add_query_result({
+            'manuscript_id': 'manuscript_id_1',
+            'elife_doi': 123,
+            'manuscript_versions': [None, {'preprint_doi': '10.1101/doi1'}]
+        })
+        assert not indexes.manuscript_ids_by_elife_doi
+        assert indexes.get_manuscript_ids_by_preprint_doi('10.1101/doi1') == ['manuscript_id_1']
@@ -0,0 +1,130 @@
+from datetime import date, datetime, timezone
+import pickle
+
+from data_hub_api.utils.manuscript_timestamp_index import (
+    ManuscriptTimestampIndexes,
+    SortedTimestampIndex,
+    get_utc_datetime
+)
+
+
+TIMESTAMP_1 = datetime.fromisoformat('2022-01-01T01:02:03+00:00')
+TIMESTAMP_2 = datetime.fromisoformat('2022-02-01T01:02:03+00:00')
+TIMESTAMP_3 = datetime.fromisoformat('2022-03-01T01:02:03+00:00')
+
+
+class TestGetUtcDatetime:
+    def test_should_convert_date_to_start_of_day_in_utc(self):
+        assert get_utc_datetime(date(2022, 1, 2)) == datetime(2022, 1, 2, tzinfo=timezone.utc)
+
+    def test_should_treat_naive_timestamp_as_utc(self):
+        assert get_utc_datetime(datetime(2022, 1, 2, 3)) == datetime(
+            2022, 1, 2, 3, tzinfo=timezone.utc
+        )
+
+
+class TestSortedTimestampIndex:
+    def test_should_return_keys_with_timestamp_since_inclusive(self):
+        timestamp_index = SortedTimestampIndex.from_timestamp_by_key({
+            'key_3': TIMESTAMP_3,
+            'key_1': TIMESTAMP_1,
+            'key_2': TIMESTAMP_2
+        })
+        assert timestamp_index.get_keys_since(TIMESTAMP_2) == ['key_2', 'key_3']
+
+    def test_should_return_no_keys_after_latest_timestamp(self):
+        timestamp_index = SortedTimestampIndex.from_timestamp_by_key({'key_1': TIMESTAMP_1})
+        assert not timestamp_index.get_keys_since(TIMESTAMP_2)
+
+
+class TestManuscriptTimestampIndexes:
+    def test_should_index_latest_updated_timestamp_of_nested_versions_and_evaluations(self):
+        indexes = ManuscriptTimestampIndexes()
+        indexes.add_query_result({
+            'manuscript_id': 'manuscript_id_1',
+            'manuscript_versions': [{
+                'qc_complete_timestamp': TIMESTAMP_1,
+                'evaluations': [{'annotation_created_timestamp': TIMESTAMP_2}],
+                'rp_publication_timestamp': None
+            }]
+        })
+        assert indexes.updated_timestamp_by_manuscript_id == {'manuscript_id_1': TIMESTAMP_2}
+        assert not indexes.published_timestamp_by_manuscript_id
+
+    def test_should_index_latest_timestamp_of_flat_query_results_by_manuscript_id(self):
+        indexes = ManuscriptTimestampIndexes()
+        indexes.add_query_result({
+            'manuscript_id': 'manuscript_id_1',
+            'qc_complete_timestamp': TIMESTAMP_2
+        })
+        indexes.add_query_result({
+            'manuscript_id': 'manuscript_id_1',
+            'qc_complete_timestamp': TIMESTAMP_1
+        })
+        assert indexes.updated_timestamp_by_manuscript_id == {'manuscript_id_1': TIMESTAMP_2}
+
+    def test_should_index_published_timestamp_including_vor_publication_date(self):
+        indexes = ManuscriptTimestampIndexes()
+        indexes.add_query_result({
+            'manuscript_id': 'manuscript_id_1',
+            'manuscript_versions': [{'rp_publication_timestamp': TIMESTAMP_1}],
+            'vor_versions': [{'vor_publication_date': date(2022, 2, 2)}]
+        })
+        expected_timestamp = datetime(2022, 2, 2, tzinfo=timezone.utc)
+        assert indexes.published_timestamp_by_manuscript_id == {
+            'manuscript_id_1': expected_timestamp
+        }
+        assert indexes.updated_timestamp_by_manuscript_id == {
+            'manuscript_id_1': expected_timestamp
+        }
+
+    def test_should_skip_malformed_values(self):
+        indexes = ManuscriptTimestampIndexes()
+        indexes.add_query_result({
+            'manuscript_id': 'manuscript_id_1',
+            'qc_complete_timestamp': 'invalid',
+            'evaluations': None,
+            'manuscript_versions': [None, {'qc_complete_timestamp': TIMESTAMP_1}],
+            'vor_versions': [None]
+        })
+        assert indexes.updated_timestamp_by_manuscript_id == {'manuscript_id_1': TIMESTAMP_1}
+
+    def test_should_return_sorted_manuscript_ids_matching_all_filters(self):
+        indexes = ManuscriptTimestampIndexes()
+        for manuscript_id, qc_complete_timestamp, rp_publication_timestamp in [
+            ('id_3', TIMESTAMP_3, TIMESTAMP_3),
+            ('id_2', TIMESTAMP_2, TIMESTAMP_2),
+            ('id_1', TIMESTAMP_3, None)
+        ]:
+            indexes.add_query_result({
+                'manuscript_id': manuscript_id,
+                'manuscript_versions': [{
+                    'qc_complete_timestamp': qc_complete_timestamp,
+                    'rp_publication_timestamp': rp_publication_timestamp
+                }]
+            })
+        assert indexes.get_sorted_manuscript_ids_since(updated_since=TIMESTAMP_2) == [
+            'id_1', 'id_2', 'id_3'
+        ]
+        assert indexes.get_sorted_manuscript_ids_since(
+            updated_since=TIMESTAMP_3,
+            published_since=TIMESTAMP_2
+        ) == ['id_3']
+
+    def test_should_memoize_sorted_manuscript_ids_for_the_following_pages(self):
+        indexes = ManuscriptTimestampIndexes()
+        indexes.add_query_result({'manuscript_id': 'id_1', 'qc_complete_timestamp': TIMESTAMP_2})
+        sorted_manuscript_ids = indexes.get_sorted_manuscript_ids_since(updated_since=TIMESTAMP_1)
+        assert indexes.get_sorted_manuscript_ids_since(
+            updated_since=TIMESTAMP_1.replace(tzinfo=None)
+        ) is sorted_manuscript_ids
+
+    def test_should_not_pickle_memoized_sorted_manuscript_ids(self):
+        indexes = ManuscriptTimestampIndexes()
+        indexes.add_query_result({'manuscript_id': 'id_1', 'qc_complete_timestamp': TIMESTAMP_2})
+        indexes.get_sorted_manuscript_ids_since(updated_since=TIMESTAMP_1)
+        unpickled_indexes = pickle.loads(pickle.dumps(indexes))
+        assert '_sorted_manuscript_ids_since_cache' not in vars(unpickled_indexes)
+        assert unpickled_indexes.get_sorted_manuscript_ids_since(
+            updated_since=TIMESTAMP_1
+        ) == ['id_1']
@@ -0,0 +1,60 @@
+from datetime import date
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from data_hub_api.utils.mapped_json import (
+    MappedJsonListMapping,
+    get_json_bytes,
+    get_json_list_items_bytes,
+    get_json_list_items_bytes_by_key
+)
+
+
+VALUES_BY_KEY = {
+    'key_1': [{'id': 'value_1'}, {'id': 'value_2'}],
+    'key_2': [{'id': 'value_3', 'title': 'Ünïcode'}]
+}
+
+
+def create_mapped_json_list_mapping(values_by_key: dict) -> MappedJsonListMapping:
+    buffer = b'header'
+    offsets = [len(buffer)]
+    for values in values_by_key.values():
+        buffer += get_json_list_items_bytes(values)
+        offsets.append(len(buffer))
+    return MappedJsonListMapping(buffer, list(values_by_key.keys()), offsets)
+
+
+class TestGetJsonBytes:
+    def test_should_serialize_like_json_response_of_api(self):
+        value = {'id': 'value_1', 'title': 'Ünïcode', 'date': date(2024, 1, 2)}
+        assert get_json_bytes(value) == JSONResponse(content=jsonable_encoder(value)).body
+
+
+class TestMappedJsonListMapping:
+    def test_should_behave_like_mapping_of_values(self):
+        mapping = create_mapped_json_list_mapping(VALUES_BY_KEY)
+        assert dict(mapping) == VALUES_BY_KEY
+        assert list(mapping) == ['key_1', 'key_2']
+        assert len(mapping) == 2
+        assert 'key_1' in mapping
+        assert 'unknown' not in mapping
+        assert mapping.get('unknown') is None
+
+    def test_should_return_json_bytes_of_values(self):
+        mapping = create_mapped_json_list_mapping(VALUES_BY_KEY)
+        assert json.loads(
+            b'[' + mapping.get_json_list_items_bytes('key_1') + b']'
+        ) == VALUES_BY_KEY['key_1']
+        assert mapping.get_json_list_items_bytes('unknown') == b''
+
+
+class TestGetJsonListItemsBytesByKey:
+    def test_should_return_same_json_bytes_for_mapped_and_other_mappings(self):
+        mapping = create_mapped_json_list_mapping(VALUES_BY_KEY)
+        for key in ['key_1', 'key_2', 'unknown']:
+            assert get_json_list_items_bytes_by_key(
+                mapping, key
+            ) == get_json_list_items_bytes_by_key(VALUES_BY_KEY, key)
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+import logging
+import sys
+from typing import Mapping, Sequence
+from unittest.mock import MagicMock, patch
+
+import objsize
+import pytest
+
+from data_hub_api.utils import memory as memory_module
+from data_hub_api.utils.cache import LazyMemoizedMapping
+from data_hub_api.utils.mapped_json import MappedJsonListMapping
+from data_hub_api.utils.memory import (
+    MemoryBudget,
+    MemoryBudgetExceededError,
+    estimate_deep_size,
+    log_exact_deep_size_if_debug_enabled
+)
+
+
+@dataclass(frozen=True)
+class DataclassWithCollections:
+    items: Sequence[dict]
+    item_by_id: Mapping[str, dict]
+
+
+def create_item(index: int) -> dict:
+    return {'id': f'id_{index}', 'text': 'text ' * (index % 10)}
+
+
+def get_exact_dict_size(value: dict) -> int:
+    # including the keys, which are not followed by objsize
+    return sys.getsizeof(value) + objsize.get_deep_size(*value.keys(), *value.values())
+
+
+class TestEstimateDeepSize:
+    def test_should_return_exact_size_of_small_value(self):
+        value = [create_item(index) for index in range(10)]
+        assert estimate_deep_size(value, sample_size=100) == objsize.get_deep_size(value)
+
+    def test_should_estimate_size_of_large_list(self):
+        value = [create_item(index) for index in range(10000)]
+        exact_size = objsize.get_deep_size(value)
+        assert estimate_deep_size(value, sample_size=100) == pytest.approx(exact_size, rel=0.1)
+
+    def test_should_estimate_size_of_large_dict(self):
+        value = {f'id_{index}': create_item(index) for index in range(10000)}
+        exact_size = get_exact_dict_size(value)
+        assert estimate_deep_size(value, sample_size=100) == pytest.approx(exact_size, rel=0.1)
+
+    def test_should_estimate_size_of_dataclass_fields(self):
+        items = [create_item(index) for index in range(10000)]
+        value = DataclassWithCollections(
+            items=items,
+            item_by_id={item['id']: create_item(index) for index, item in enumerate(items)}
+        )
+        exact_size = objsize.get_deep_size(value.items) + get_exact_dict_size(value.item_by_id)
+        assert estimate_deep_size(value, sample_size=100) == pytest.approx(exact_size, rel=0.1)
+
+    def test_should_estimate_size_of_large_values_of_small_dict(self):
+        value = {
+            'key_1': [create_item(index) for index in range(10000)],
+            'key_2': [create_item(index) for index in range(10000)]
+        }
+        exact_size = objsize.get_deep_size(value)
+        with patch.object(
+            memory_module.objsize,
+            'get_deep_size',
+            wraps=objsize.get_deep_size
+        ) as get_deep_size_mock:
+            estimated_size = estimate_deep_size(value, sample_size=100)
+        assert estimated_size == pytest.approx(exact_size, rel=0.1)
+        # the large values are sampled rather than walked entirely
+        measured_values = [
+            arg for call_args in get_deep_size_mock.call_args_list for arg in call_args.args
+        ]
+        assert not any(
+            measured_value is value or measured_value is value['key_1']
+            for measured_value in measured_values
+        )
+
+    def test_should_estimate_size_of_lazy_memoized_mapping_by_sampling_source_values(self):
+        source_by_key = {f'id_{index}': create_item(index) for index in range(10000)}
+        value_fn = MagicMock(name='value_fn')
+        value = LazyMemoizedMapping(source_by_key, value_fn=value_fn)
+        exact_size = get_exact_dict_size(source_by_key)
+        with patch.object(
+            memory_module.objsize,
+            'get_deep_size',
+            wraps=objsize.get_deep_size
+        ) as get_deep_size_mock:
+            estimated_size = estimate_deep_size(value, sample_size=100)
+        assert estimated_size == pytest.approx(exact_size, rel=0.1)
+        value_fn.assert_not_called()
+        measured_values = [
+            arg for call_args in get_deep_size_mock.call_args_list for arg in call_args.args
+        ]
+        assert not any(
+            measured_value is value or measured_value is source_by_key
+            for measured_value in measured_values
+        )
+
+    def test_should_estimate_size_of_mapped_json_list_mapping_without_buffer(self):
+        keys = [f'id_{index}' for index in range(1000)]
+        buffer = b'x' * 1_000_000
+        value = MappedJsonListMapping(buffer, keys, list(range(len(keys) + 1)))
+        assert estimate_deep_size(value) < len(buffer)
+
+    def test_should_only_measure_sampled_items(self):
+        value = [create_item(index) for index in range(10000)]
+        with patch.object(memory_module.objsize, 'get_deep_size') as get_deep_size_mock:
+            get_deep_size_mock.return_value = 100
+            estimate_deep_size(value, sample_size=100)
+        assert len(get_deep_size_mock.call_args.args) == 100
+
+
+class TestLogExactDeepSizeIfDebugEnabled:
+    def test_should_not_calculate_exact_size_if_debug_is_disabled(self):
+        logger = MagicMock(name='logger')
+        logger.isEnabledFor.return_value = False
+        with patch.object(memory_module.objsize, 'get_deep_size') as get_deep_size_mock:
+            log_exact_deep_size_if_debug_enabled(logger, ['value'], 'value')
+        get_deep_size_mock.assert_not_called()
+        logger.isEnabledFor.assert_called_with(logging.DEBUG)
+
+    def test_should_log_exact_size_if_debug_is_enabled(self):
+        logger = MagicMock(name='logger')
+        logger.isEnabledFor.return_value = True
+        log_exact_deep_size_if_debug_enabled(logger, ['value'], 'value')
+        logger.debug.assert_called_once()
+
+
+class TestMemoryBudget:
+    def test_should_accept_size_within_budget(self):
+        MemoryBudget(name='cache_1', max_size_in_bytes=100, refuse_if_exceeded=True).check_size(100)
+
+    def test_should_log_warning_if_size_exceeds_budget(self, caplog: pytest.LogCaptureFixture):
+        MemoryBudget(name='cache_1', max_size_in_bytes=100).check_size(101)
+        assert 'exceeds memory budget' in caplog.text
+
+    def test_should_raise_error_if_size_exceeds_budget_and_refusing(self):
+        memory_budget = MemoryBudget(name='cache_1', max_size_in_bytes=100, refuse_if_exceeded=True)
+        with pytest.raises(MemoryBudgetExceededError):
+            memory_budget.check_size(101)
@@ -0,0 +1,49 @@
+import pytest
+
+from data_hub_api.utils.pagination import (
+    InvalidCursorError,
+    KeyPage,
+    decode_cursor,
+    encode_cursor,
+    get_key_page
+)
+
+
+SORTED_KEYS = ['key_1', 'key_2', 'key_3']
+
+
+class TestEncodeCursor:
+    def test_should_decode_encoded_cursor(self):
+        assert decode_cursor(encode_cursor('key/1')) == 'key/1'
+
+    def test_should_raise_invalid_cursor_error_for_invalid_cursor(self):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor('not-base64!')
+
+
+class TestGetKeyPage:
+    def test_should_return_all_keys_without_limit_or_cursor(self):
+        assert get_key_page(SORTED_KEYS) == KeyPage(keys=SORTED_KEYS)
+
+    def test_should_return_first_page_with_next_cursor(self):
+        assert get_key_page(SORTED_KEYS, limit=2) == KeyPage(
+            keys=['key_1', 'key_2'],
+            next_cursor=encode_cursor('key_2')
+        )
+
+    def test_should_return_last_page_without_next_cursor(self):
+        assert get_key_page(SORTED_KEYS, limit=2, cursor=encode_cursor('key_2')) == KeyPage(
+            keys=['key_3']
+        )
+
+    def test_should_return_remaining_keys_for_cursor_without_limit(self):
+        assert get_key_page(SORTED_KEYS, cursor=encode_cursor('key_1')) == KeyPage(
+            keys=['key_2', 'key_3']
+        )
+
+    def test_should_continue_after_cursor_key_removed_from_keys(self):
+        assert get_key_page(
+            ['key_1', 'key_3'],
+            limit=2,
+            cursor=encode_cursor('key_2')
+        ) == KeyPage(keys=['key_3'])
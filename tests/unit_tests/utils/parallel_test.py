@@ -0,0 +1,128 @@
+import logging
+from time import perf_counter
+from unittest.mock import patch
+
+import pytest
+
+from data_hub_api.utils import parallel as parallel_module
+from data_hub_api.utils.parallel import (
+    ParallelMapConfig,
+    ProcessPoolMapper,
+    map_in_process_pool,
+    warn_if_batch_size_limits_parallelism
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_squared_value(value: int) -> int:
+    return value * value
+
+
+def get_cpu_bound_value(value: int) -> int:
+    return sum(index * value for index in range(5_000))
+
+
+class TestParallelMapConfig:
+    def test_should_not_be_parallel_for_single_process(self):
+        config = ParallelMapConfig(process_count=1, min_parallel_item_count=1)
+        assert not config.is_parallel_for_item_count(100)
+
+    def test_should_not_be_parallel_for_small_item_count(self):
+        config = ParallelMapConfig(process_count=2, min_parallel_item_count=10)
+        assert not config.is_parallel_for_item_count(9)
+        assert config.is_parallel_for_item_count(10)
+
+
+class TestProcessPoolMapper:
+    def test_should_reuse_process_pool_for_multiple_maps_until_closed(self):
+        config = ParallelMapConfig(process_count=2, chunk_size=3, min_parallel_item_count=1)
+        with ProcessPoolMapper(config) as process_pool_mapper:
+            assert process_pool_mapper.map(get_squared_value, [1, 2]) == [1, 4]
+            executor = process_pool_mapper._executor  # pylint: disable=protected-access
+            assert process_pool_mapper.map(get_squared_value, [3]) == [9]
+            assert process_pool_mapper._executor is executor  # pylint: disable=protected-access
+        assert process_pool_mapper._executor is None  # pylint: disable=protected-access
+
+    def test_should_count_items_of_all_maps_towards_min_parallel_item_count(self):
+        config = ParallelMapConfig(process_count=2, chunk_size=3, min_parallel_item_count=5)
+        with ProcessPoolMapper(config) as process_pool_mapper:
+            assert process_pool_mapper.map(get_squared_value, [1, 2, 3]) == [1, 4, 9]
+            assert process_pool_mapper._executor is None  # pylint: disable=protected-access
+            assert process_pool_mapper.map(get_squared_value, [4, 5, 6]) == [16, 25, 36]
+            executor = process_pool_mapper._executor  # pylint: disable=protected-access
+            assert executor is not None
+            # once started, the pool is used for the following small maps too
+            with patch.object(
+                executor,
+                'map',
+                wraps=executor.map
+            ) as executor_map_mock:
+                assert process_pool_mapper.map(get_squared_value, [7]) == [49]
+            executor_map_mock.assert_called()
+
+    def test_should_not_start_process_pool_for_serial_maps(self):
+        with ProcessPoolMapper() as process_pool_mapper:
+            assert process_pool_mapper.map(get_squared_value, [1, 2]) == [1, 4]
+            assert process_pool_mapper._executor is None  # pylint: disable=protected-access
+
+
+class TestWarnIfBatchSizeLimitsParallelism:
+    def test_should_warn_if_batch_size_is_smaller_than_all_process_chunks(self):
+        with patch.object(parallel_module, 'LOGGER') as logger_mock:
+            warn_if_batch_size_limits_parallelism(
+                ParallelMapConfig(process_count=4, chunk_size=100),
+                batch_size=200
+            )
+        logger_mock.warning.assert_called()
+
+    def test_should_not_warn_if_batch_size_is_large_enough(self):
+        with patch.object(parallel_module, 'LOGGER') as logger_mock:
+            warn_if_batch_size_limits_parallelism(
+                ParallelMapConfig(process_count=4, chunk_size=100),
+                batch_size=400
+            )
+        logger_mock.warning.assert_not_called()
+
+
+class TestMapInProcessPool:
+    def test_should_map_serially_without_config(self):
+        assert map_in_process_pool(get_squared_value, [1, 2, 3]) == [1, 4, 9]
+
+    def test_should_map_serially_with_lambda_for_small_item_count(self):
+        assert map_in_process_pool(
+            lambda value: value + 1,
+            [1, 2, 3],
+            config=ParallelMapConfig(process_count=2, min_parallel_item_count=4)
+        ) == [2, 3, 4]
+
+    def test_should_map_in_order_using_processes(self):
+        items = list(range(10))
+        assert map_in_process_pool(
+            get_squared_value,
+            items,
+            config=ParallelMapConfig(process_count=2, chunk_size=3, min_parallel_item_count=1)
+        ) == [get_squared_value(item) for item in items]
+
+    @pytest.mark.parametrize('process_count', [1, 2, 4])
+    def test_should_measure_scaling_with_process_count(self, process_count: int):
+        items = list(range(2000))
+        start_time = perf_counter()
+        result = map_in_process_pool(
+            get_cpu_bound_value,
+            items,
+            config=ParallelMapConfig(
+                process_count=process_count,
+                chunk_size=100,
+                min_parallel_item_count=1
+            )
+        )
+        duration = perf_counter() - start_time
+        LOGGER.info(
+            'Parallel map benchmark: items=%d, processes=%d, time=%.3f seconds',
+            len(items),
+            process_count,
+            duration
+        )
+        assert result == [get_cpu_bound_value(item) for item in items]
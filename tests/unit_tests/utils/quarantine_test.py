@@ -0,0 +1,37 @@
+from unittest.mock import MagicMock
+
+from data_hub_api.utils.quarantine import (
+    QuarantinedQueryResult,
+    get_value_or_quarantined_query_result,
+    get_values_skipping_quarantined_query_results
+)
+
+
+class TestGetValueOrQuarantinedQueryResult:
+    def test_should_return_value(self):
+        assert get_value_or_quarantined_query_result(
+            lambda query_result: query_result['value'],
+            {'manuscript_id': 'id_1', 'value': 'value_1'}
+        ) == 'value_1'
+
+    def test_should_return_quarantined_query_result_with_error(self):
+        value_fn = MagicMock(name='value_fn', side_effect=KeyError('invalid'))
+        assert get_value_or_quarantined_query_result(
+            value_fn,
+            {'manuscript_id': 'id_1'}
+        ) == QuarantinedQueryResult(manuscript_id='id_1', error="KeyError('invalid')")
+
+
+class TestGetValuesSkippingQuarantinedQueryResults:
+    def test_should_skip_and_add_quarantined_query_results(self):
+        quarantined_query_results: list = []
+        values = get_values_skipping_quarantined_query_results(
+            lambda query_result: query_result['value'],
+            quarantined_query_results,
+            [{'manuscript_id': 'id_1', 'value': 'value_1'}, {'manuscript_id': 'id_2'}]
+        )
+        assert values == ['value_1']
+        assert [
+            quarantined_query_result.manuscript_id
+            for quarantined_query_result in quarantined_query_results
+        ] == ['id_2']
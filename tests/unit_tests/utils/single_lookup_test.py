@@ -0,0 +1,25 @@
+import pytest
+from fastapi import HTTPException
+
+from data_hub_api.utils.single_lookup import get_single_docmap_or_raise_http_exception
+
+
+class TestGetSingleDocmapOrRaiseHttpException:
+    def test_should_return_single_docmap(self):
+        assert get_single_docmap_or_raise_http_exception(
+            [{'id': 'docmap_1'}],
+            identifier_description='eLife DOI'
+        ) == {'id': 'docmap_1'}
+
+    def test_should_raise_404_if_there_are_no_docmaps(self):
+        with pytest.raises(HTTPException) as exc_info:
+            get_single_docmap_or_raise_http_exception([], identifier_description='eLife DOI')
+        assert exc_info.value.status_code == 404
+
+    def test_should_raise_409_if_there_are_multiple_docmaps(self):
+        with pytest.raises(HTTPException) as exc_info:
+            get_single_docmap_or_raise_http_exception(
+                [{'id': 'docmap_1'}, {'id': 'docmap_2'}],
+                identifier_description='eLife DOI'
+            )
+        assert exc_info.value.status_code == 409